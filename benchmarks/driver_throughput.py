@@ -0,0 +1,119 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""驱动后端吞吐基准：比较各驱动在 SDK 连接池上的借出 + 查询吞吐。
+
+直接连接指定的 MySQL（不经过 SSM），每个驱动使用相同的 ConnectionPool 配置，
+多个线程循环执行 借出 -> SELECT 1 -> 归还。未安装的驱动会被跳过。
+
+用法::
+
+    python benchmarks/driver_throughput.py --host 127.0.0.1 --user root --password secret \\
+        --threads 8 --seconds 10
+"""
+
+import argparse
+import functools
+import os
+import sys
+import threading
+import time
+
+from ssm_rotation_sdk.drivers import driver_names, get_driver
+from ssm_rotation_sdk.pool import ConnectionPool
+
+
+def run_driver(driver, conn_params, threads, seconds, pool_size, query):
+    pool = ConnectionPool(
+        connect=functools.partial(driver.connect, conn_params),
+        pool_size=pool_size,
+        pool_name="bench_%s" % driver.name,
+        driver=driver,
+    )
+    pool.fill(deadline=time.time() + 30)
+    stop = threading.Event()
+    counts = [0] * threads
+    errors = []
+
+    def loop(slot):
+        done = 0
+        while not stop.is_set():
+            try:
+                conn = pool.get_connection()
+            except Exception as exc:
+                errors.append(exc)
+                return
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                cursor.fetchall()
+                cursor.close()
+            finally:
+                conn.close()
+            done += 1
+        counts[slot] = done
+
+    workers = [threading.Thread(target=loop, args=(slot,)) for slot in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    pool.close()
+    if errors:
+        raise errors[0]
+    return sum(counts) / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.environ.get("MYSQL_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("MYSQL_PORT", "3306")))
+    parser.add_argument("--user", default=os.environ.get("MYSQL_USER", "root"))
+    parser.add_argument("--password", default=os.environ.get("MYSQL_PASSWORD", ""))
+    parser.add_argument("--database", default=os.environ.get("MYSQL_DATABASE"))
+    parser.add_argument("--drivers", default=",".join(driver_names()),
+                        help="逗号分隔的驱动名称，默认全部已注册驱动")
+    parser.add_argument("--threads", type=int, default=8, help="并发线程数")
+    parser.add_argument("--pool-size", type=int, default=None, help="连接池大小，默认与线程数相同")
+    parser.add_argument("--seconds", type=float, default=5.0, help="每个驱动的运行时长（秒）")
+    parser.add_argument("--query", default="SELECT 1")
+    args = parser.parse_args(argv)
+
+    conn_params = {"host": args.host, "port": args.port, "user": args.user, "password": args.password}
+    if args.database:
+        conn_params["database"] = args.database
+
+    print("%-22s %14s" % ("driver", "ops_per_sec"))
+    for name in args.drivers.split(","):
+        name = name.strip()
+        driver = get_driver(name)
+        try:
+            driver.module
+        except ImportError:
+            print("%-22s %14s" % (name, "not installed"))
+            continue
+        ops = run_driver(driver, conn_params, args.threads, args.seconds,
+                         args.pool_size or args.threads, args.query)
+        print("%-22s %14.0f" % (name, ops))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
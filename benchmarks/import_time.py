@@ -0,0 +1,76 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""导入耗时基准：每个场景在全新解释器中执行，统计多次运行的中位数。
+
+用法::
+
+    python benchmarks/import_time.py --runs 20 --max-ms 50
+
+指定 --max-ms 时，若 ``import ssm_rotation_sdk`` 的中位耗时超过该值则以非零状态退出，
+可在 CI 中用于防止启动耗时回退。
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = [
+    ("import ssm_rotation_sdk", "import ssm_rotation_sdk"),
+    ("SsmAccount", "from ssm_rotation_sdk import SsmAccount"),
+    ("DynamicSecretRotationDb", "from ssm_rotation_sdk import DynamicSecretRotationDb"),
+]
+
+# 在子进程中测量导入耗时（不含解释器自身启动时间）
+_TIMER = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "{statement}\n"
+    "print((time.perf_counter() - start) * 1000.0)\n"
+)
+
+
+def measure(statement, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", _TIMER.format(statement=statement)])
+        samples.append(float(output.decode().strip()))
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="每个场景的运行次数")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="import ssm_rotation_sdk 中位耗时上限（毫秒）")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print("%-26s %10s %10s %10s" % ("scenario", "median_ms", "min_ms", "max_ms"))
+    for name, statement in SCENARIOS:
+        samples = measure(statement, args.runs)
+        results[name] = statistics.median(samples)
+        print("%-26s %10.2f %10.2f %10.2f" % (name, results[name], min(samples), max(samples)))
+
+    if args.max_ms is not None and results["import ssm_rotation_sdk"] > args.max_ms:
+        print("import ssm_rotation_sdk exceeded %.1f ms" % args.max_ms, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
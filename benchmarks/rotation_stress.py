@@ -0,0 +1,207 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""轮转压力基准：多线程持续借出 + 执行查询的同时反复轮转凭据，统计吞吐与错误。
+
+不访问 SSM 与数据库：注册内存中的桩驱动，并以递增的账号模拟 SSM 返回的新版本凭据，
+由独立线程按 --rotate-interval 触发与监听线程相同的刷新流程。用于在自由线程版 CPython
+（如 python3.13t）上验证借出吞吐随线程数（核数）扩展，且轮转期间没有竞争导致的错误或连接泄漏。
+
+用法::
+
+    python3.13t benchmarks/rotation_stress.py --threads 1,2,4,8,16 --seconds 3 --stripes 4
+"""
+
+import argparse
+import itertools
+import sys
+import threading
+import time
+from unittest import mock
+
+from ssm_rotation_sdk import Config, DbAccount, DbConfig, DynamicSecretRotationDb, SsmAccount
+from ssm_rotation_sdk.drivers import Driver, register_driver
+
+DRIVER_NAME = "bench-stub"
+
+
+class _StubCursor:
+    description = (("user",),)
+    rowcount = -1
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        if self.conn.closed:
+            raise _StubError("connection is closed")
+
+    def fetchall(self):
+        return [(self.conn.user,)]
+
+    def close(self):
+        return None
+
+
+class _StubConnection:
+    def __init__(self, user):
+        self.user = user
+        self.closed = False
+
+    def ping(self):
+        if self.closed:
+            raise _StubError("connection is closed")
+
+    def cursor(self, **kwargs):
+        return _StubCursor(self)
+
+    def commit(self):
+        return None
+
+    def rollback(self):
+        return None
+
+    def close(self):
+        self.closed = True
+
+
+class _StubError(Exception):
+    pass
+
+
+class _StubModule:
+    Error = _StubError
+
+
+class StubDriver(Driver):
+    name = DRIVER_NAME
+
+    def __init__(self):
+        Driver.__init__(self)
+        self._module = _StubModule
+        self.opened = []
+        self._opened_lock = threading.Lock()
+
+    def connect(self, params):
+        conn = _StubConnection(params["user"])
+        with self._opened_lock:
+            self.opened.append(conn)
+        return conn
+
+    def reset_session(self, conn):
+        return None
+
+
+def run(threads, seconds, rotate_interval, stripes, affinity):
+    driver = StubDriver()
+    register_driver(DRIVER_NAME, lambda: driver)
+    versions = itertools.count()
+    state = {"account": DbAccount("user_%d" % next(versions), "pwd")}
+
+    db_config = DbConfig(params={
+        "secret_name": "bench",
+        "ip_address": "127.0.0.1",
+        "port": 3306,
+        "driver": DRIVER_NAME,
+        "pool_size": threads,
+        "pool_stripes": min(stripes, threads),
+        "thread_affinity": affinity,
+    })
+    config = Config(params={
+        "db_config": db_config,
+        "ssm_service_config": SsmAccount.with_cam_role("bench", "ap-guangzhou"),
+        "WATCH_FREQ": 3600,
+        "MAX_CONNECTIONS": threads * 3,
+    })
+
+    with mock.patch("ssm_rotation_sdk.db.get_current_account",
+                    side_effect=lambda *args: (state["account"], None)):
+        db = DynamicSecretRotationDb()
+        err = db.init(config)
+        if err:
+            raise RuntimeError(err.message)
+
+        start = threading.Barrier(threads + 2)
+        stop = threading.Event()
+        counts = [0] * threads
+        errors = []
+        rotations = [0]
+
+        def borrow(slot):
+            done = 0
+            start.wait()
+            while not stop.is_set():
+                try:
+                    db.execute("SELECT 1")
+                except Exception as exc:
+                    errors.append(exc)
+                done += 1
+            counts[slot] = done
+
+        def rotate():
+            start.wait()
+            while not stop.wait(rotate_interval):
+                state["account"] = DbAccount("user_%d" % next(versions), "pwd")
+                # 与监听线程发现新版本凭据时相同的刷新流程
+                err = db._refresh_pool(force=False)
+                if err:
+                    errors.append(err)
+                rotations[0] += 1
+
+        workers = [threading.Thread(target=borrow, args=(slot,)) for slot in range(threads)]
+        workers.append(threading.Thread(target=rotate))
+        for worker in workers:
+            worker.start()
+        start.wait()
+        began = time.perf_counter()
+        time.sleep(seconds)
+        stop.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - began
+        db.close()
+
+    leaked = sum(1 for conn in driver.opened if not conn.closed)
+    return sum(counts) / elapsed, rotations[0], len(errors), leaked
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=_int_list, default=[1, 2, 4, 8, 16], help="逗号分隔的线程数")
+    parser.add_argument("--seconds", type=float, default=3.0, help="每个线程数的运行时长（秒）")
+    parser.add_argument("--rotate-interval", type=float, default=0.05, help="两次轮转的间隔（秒）")
+    parser.add_argument("--stripes", type=int, default=1, help="连接池分片数")
+    parser.add_argument("--affinity", action="store_true", help="开启 thread_affinity")
+    args = parser.parse_args(argv)
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print("python %s, GIL %s" % (sys.version.split()[0], "enabled" if gil else "disabled"))
+    print("%8s %14s %10s %8s %8s" % ("threads", "ops_per_sec", "rotations", "errors", "leaked"))
+    failed = False
+    for threads in args.threads:
+        ops, rotations, errors, leaked = run(threads, args.seconds, args.rotate_interval,
+                                             args.stripes, args.affinity)
+        print("%8d %14.0f %10d %8d %8d" % (threads, ops, rotations, errors, leaked))
+        failed = failed or errors > 0 or leaked > 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
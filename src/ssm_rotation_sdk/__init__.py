@@ -18,16 +18,66 @@
 
 __version__ = "1.0.1"
 
-from ssm_rotation_sdk.requester import SsmAccount, CredentialType, Error, DbAccount
-from ssm_rotation_sdk.db import DynamicSecretRotationDb, Config, DbConfig
+import importlib
+import sys
+
+# 公开名称所在的子模块。子模块在首次访问对应名称时才导入，
+# 仅使用 SsmAccount 等轻量类型时不会加载 mysql.connector 与 tencentcloud。
+_LAZY_ATTRIBUTES = {
+    "SsmAccount": "ssm_rotation_sdk.requester",
+    "CredentialType": "ssm_rotation_sdk.requester",
+    "Transport": "ssm_rotation_sdk.requester",
+    "Error": "ssm_rotation_sdk.requester",
+    "DbAccount": "ssm_rotation_sdk.requester",
+    "SecretCache": "ssm_rotation_sdk.cache",
+    "DynamicSecretRotationDb": "ssm_rotation_sdk.db",
+    "Config": "ssm_rotation_sdk.db",
+    "DbConfig": "ssm_rotation_sdk.db",
+    "ConnectionUnavailableError": "ssm_rotation_sdk.db",
+    "with_connection": "ssm_rotation_sdk.db",
+    "RotationEvent": "ssm_rotation_sdk.events",
+    "EVENT_CREDENTIAL_CHANGED": "ssm_rotation_sdk.events",
+    "EVENT_POOL_READY": "ssm_rotation_sdk.events",
+    "EVENT_POOL_DRAINED": "ssm_rotation_sdk.events",
+    "set_concurrency": "ssm_rotation_sdk.concurrency",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
+if sys.version_info < (3, 7):
+    # Python 3.6 不支持模块级 __getattr__（PEP 562），退回到导入时加载
+    for _name in _LAZY_ATTRIBUTES:
+        __getattr__(_name)
+    del _name
 
 __all__ = [
     "__version__",
     "SsmAccount",
     "CredentialType",
+    "Transport",
     "Error",
     "DbAccount",
+    "SecretCache",
     "DynamicSecretRotationDb",
     "Config",
     "DbConfig",
+    "ConnectionUnavailableError",
+    "with_connection",
+    "RotationEvent",
+    "EVENT_CREDENTIAL_CHANGED",
+    "EVENT_POOL_READY",
+    "EVENT_POOL_DRAINED",
+    "set_concurrency",
 ]
@@ -0,0 +1,253 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""通用凭据缓存：按凭据名称与版本缓存 SSM 凭据内容及其解析结果。"""
+
+import collections
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+from queue import Full
+
+from ssm_rotation_sdk.events import EVENT_CREDENTIAL_CHANGED, EventDispatcher, RotationEvent
+from ssm_rotation_sdk.requester import Error, _get_secret_value, _parse_db_account
+from ssm_rotation_sdk.worker import BackgroundWorker
+
+# 版本标签，指向的具体版本会随轮转变化，需要按 TTL 刷新；其余版本号内容不可变
+CURRENT_VERSION = "SSM_Current"
+STAGE_PREFIX = "SSM_"
+
+
+def parse_json(secret_string):
+    """将凭据内容解析为 JSON 对象。"""
+    return json.loads(secret_string)
+
+
+def parse_db_account(secret_string):
+    """将 {"UserName": ..., "Password": ...} 格式的凭据内容解析为 DbAccount。"""
+    account, err = _parse_db_account(secret_string)
+    if err:
+        raise ValueError(err.message)
+    return account
+
+
+class _CacheEntry:
+    """单个 (凭据名称, 版本) 的缓存记录。"""
+
+    __slots__ = ("value", "fetched_at", "parsed", "future", "refreshing")
+
+    def __init__(self):
+        # 最近一次成功获取的 SecretValue
+        self.value = None
+        self.fetched_at = 0.0
+        # parser -> 解析结果，凭据内容变化时清空
+        self.parsed = {}
+        # 进行中的获取（同步获取或后台提前刷新），并发调用方共享同一个 Future
+        self.future = None
+        # 是否已提交后台提前刷新
+        self.refreshing = False
+
+
+class SecretCache:
+    """带 TTL 的 SSM 凭据缓存。
+
+    - 版本标签（SSM_Current 等）按 ``ttl`` 过期；具体版本号的内容不可变，获取后一直缓存
+    - 缓存存活超过 ``ttl * refresh_ahead`` 后由后台线程提前刷新，请求路径继续返回缓存值
+    - 同一凭据的并发获取合并为一次 SSM 请求；缓存过期时若后台提前刷新正在进行，调用方等待该次刷新
+    - 具体版本号最多缓存 ``max_versions`` 个，超过时淘汰最久未访问的版本
+    - 解析结果按 parser 缓存，凭据内容未变化时不会重复解析
+    - 刷新失败时返回过期的缓存值并记录告警，尚无缓存时返回错误
+    - 已缓存的凭据内容刷新后发生变化时派发 EVENT_CREDENTIAL_CHANGED 事件
+
+    :param ssm_account: SSM 账号信息
+    :type ssm_account: SsmAccount
+    :param ttl: 版本标签的缓存时长（秒）
+    :param refresh_ahead: 触发后台提前刷新的缓存时长比例，None 表示不提前刷新
+    :param fetch_timeout: 等待其他调用方进行中的获取的最长时间（秒）
+    :param max_versions: 缓存的具体版本号（非版本标签）数量上限，None 表示不限制
+    """
+
+    def __init__(self, ssm_account, ttl=300.0, refresh_ahead=0.8, fetch_timeout=30.0, max_versions=256):
+        self.ssm_account = ssm_account
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.fetch_timeout = fetch_timeout
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        self._entries = {}
+        # 具体版本号的缓存键，按最近访问顺序排列（最久未访问的在前）
+        self._versions = collections.OrderedDict()
+        self._refresher = BackgroundWorker("SSMSecretRefresher", max_pending=64)
+        self._events = EventDispatcher("SSMSecretCacheEvents")
+
+    def get_secret(self, name, version=None, parser=None):
+        """获取凭据内容。
+
+        :param name: 凭据名称
+        :type name: str
+        :param version: 凭据版本，默认为 SSM_Current
+        :type version: str
+        :param parser: 解析函数，接收凭据字符串返回解析结果，如 parse_json、parse_db_account；
+            None 表示返回原始字符串
+        :rtype: (value, error)
+        """
+        key = (name, version or CURRENT_VERSION)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _CacheEntry()
+            if not key[1].startswith(STAGE_PREFIX):
+                self._touch_version(key)
+            now = time.monotonic()
+            if entry.value is not None and not self._is_expired(key, entry, now):
+                if self._should_refresh_ahead(key, entry, now):
+                    self._submit_refresh(key, entry)
+                value = entry.value
+                future = None
+            else:
+                future = entry.future
+                leader = future is None
+                if leader:
+                    future = entry.future = concurrent.futures.Future()
+
+        if future is not None:
+            if leader:
+                self._fetch(key, future)
+            value, err = self._wait(future)
+            if err:
+                with self._lock:
+                    value = entry.value
+                if value is None:
+                    return None, err
+                logging.warning("refresh secret %s(%s) failed, using cached value: %s", key[0], key[1], err.message)
+        return self._parse(entry, value, parser)
+
+    def subscribe(self, listener, events=None):
+        """订阅凭据变更事件，参见 DynamicSecretRotationDb.subscribe。"""
+        return self._events.subscribe(listener, events)
+
+    def unsubscribe(self, listener):
+        """取消订阅凭据变更事件。"""
+        self._events.unsubscribe(listener)
+
+    def invalidate(self, name=None, version=None):
+        """丢弃缓存；name 为 None 时丢弃全部，version 为 None 时丢弃该凭据的全部版本。"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                self._versions.clear()
+                return
+            for key in list(self._entries):
+                if key[0] == name and (version is None or key[1] == version):
+                    del self._entries[key]
+                    self._versions.pop(key, None)
+
+    def close(self):
+        """停止后台刷新并清空缓存。"""
+        self._refresher.shutdown()
+        with self._lock:
+            # 排队中被取消的提前刷新不会再写入结果，唤醒等待它的调用方
+            pending = [entry.future for entry in self._entries.values()
+                       if entry.refreshing and entry.future is not None]
+        for future in pending:
+            if not future.done():
+                future.set_result((None, Error("secret cache is closed")))
+        self._events.close()
+        self.invalidate()
+
+    def _is_expired(self, key, entry, now):
+        if not key[1].startswith(STAGE_PREFIX):
+            return False
+        return now - entry.fetched_at >= self.ttl
+
+    def _should_refresh_ahead(self, key, entry, now):
+        if self.refresh_ahead is None or entry.refreshing or entry.future is not None:
+            return False
+        if not key[1].startswith(STAGE_PREFIX):
+            return False
+        return now - entry.fetched_at >= self.ttl * self.refresh_ahead
+
+    def _touch_version(self, key):
+        """记录具体版本号的访问，超过 max_versions 时淘汰最久未访问且没有进行中获取的版本。调用方需持有 _lock。"""
+        self._versions[key] = None
+        self._versions.move_to_end(key)
+        if self.max_versions is None:
+            return
+        for stale in list(self._versions):
+            if len(self._versions) <= self.max_versions:
+                break
+            if stale == key or self._entries[stale].future is not None:
+                continue
+            del self._versions[stale]
+            del self._entries[stale]
+
+    def _submit_refresh(self, key, entry):
+        """提交后台提前刷新，调用方需持有 _lock；刷新的 Future 同时供缓存过期的调用方等待。"""
+        future = concurrent.futures.Future()
+        try:
+            self._refresher.submit(self._fetch, key, future)
+        except (Full, RuntimeError):
+            return
+        entry.refreshing = True
+        entry.future = future
+
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.fetch_timeout)
+        except concurrent.futures.TimeoutError:
+            return None, Error("timed out waiting for secret fetch")
+
+    def _fetch(self, key, future):
+        """从 SSM 获取凭据并更新缓存，结果写入 future。"""
+        try:
+            value, err = _get_secret_value(key[0], self.ssm_account, key[1])
+        except Exception as exc:
+            value, err = None, Error("get secret value error: %s" % exc)
+        changed = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.future is future:
+                    entry.future = None
+                entry.refreshing = False
+                if err is None:
+                    if entry.value is None or entry.value.secret_string != value.secret_string:
+                        changed = entry.value is not None
+                        entry.parsed = {}
+                    entry.value = value
+                    entry.fetched_at = time.monotonic()
+        future.set_result((value, err))
+        if changed:
+            self._events.emit(RotationEvent(EVENT_CREDENTIAL_CHANGED, secret_name=key[0],
+                                            version_id=value.version_id))
+
+    def _parse(self, entry, value, parser):
+        if parser is None:
+            return value.secret_string, None
+        with self._lock:
+            parsed = entry.parsed if entry.value is value else {}
+            if parser in parsed:
+                return parsed[parser], None
+        try:
+            result = parser(value.secret_string)
+        except Exception as exc:
+            return None, Error("failed to parse secret %s: %s" % (value.secret_name, exc))
+        with self._lock:
+            if entry.value is value:
+                entry.parsed[parser] = result
+        return result, None
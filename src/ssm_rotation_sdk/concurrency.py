@@ -0,0 +1,195 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""并发模式：操作系统线程（默认）或 gevent / eventlet 协作式并发。
+
+协作式模式要求在导入数据库驱动之前完成 monkey patching，SDK 的后台线程随之以协程运行。
+在此基础上，SDK 的 Watcher 等待、借出重试的休眠、连接池的等待借出使用协程库的原语，
+不受 SDK 对象构造时机（是否早于打补丁）影响；SSM 请求受整体截止时间限制，超时后中断协程，
+不会无限期挂起。
+
+进程内只有一种并发模式，需在创建 SDK 对象之前调用 set_concurrency()。
+"""
+
+import importlib
+import threading
+import time
+
+CONCURRENCY_THREADING = "threading"
+CONCURRENCY_GEVENT = "gevent"
+CONCURRENCY_EVENTLET = "eventlet"
+
+
+class _NoTimeout:
+    """线程模式下的截止时间：线程无法被中断，由 socket 超时限制单次 I/O 的等待。"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class _NeverRaised(BaseException):
+    pass
+
+
+class Concurrency:
+    """并发模式基类，默认实现为操作系统线程。
+
+    协作式子类需设置 module_name，并在 check() 中确认已完成 monkey patching。
+    """
+
+    name = CONCURRENCY_THREADING
+    module_name = None
+    # 是否为协作式并发（单个操作系统线程内切换协程）
+    cooperative = False
+    # timeout() 到期时抛出的异常类型
+    Timeout = _NeverRaised
+
+    def __init__(self):
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def module(self):
+        """协程库模块，首次访问时导入。
+
+        :raises ImportError: 协程库未安装
+        """
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self.module_name)
+        return self._module
+
+    def check(self):
+        """检查运行环境，不满足时返回错误信息。"""
+        return None
+
+    def Event(self):
+        return threading.Event()
+
+    def RLock(self):
+        return threading.RLock()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def timeout(self, seconds):
+        """返回限制整体耗时的上下文管理器，到期时在当前协程中抛出 self.Timeout。"""
+        return _NoTimeout(seconds)
+
+
+class GeventConcurrency(Concurrency):
+    """gevent，需先调用 gevent.monkey.patch_all()。"""
+
+    name = CONCURRENCY_GEVENT
+    module_name = "gevent"
+    cooperative = True
+
+    def check(self):
+        monkey = importlib.import_module("gevent.monkey")
+        if not (monkey.is_module_patched("socket") and monkey.is_module_patched("threading")):
+            return "gevent concurrency requires gevent.monkey.patch_all() before importing database drivers"
+        return None
+
+    @property
+    def Timeout(self):
+        return self.module.Timeout
+
+    def Event(self):
+        return importlib.import_module("gevent.event").Event()
+
+    def RLock(self):
+        return importlib.import_module("gevent.lock").RLock()
+
+    def sleep(self, seconds):
+        self.module.sleep(seconds)
+
+    def timeout(self, seconds):
+        # 不指定异常时抛出 Timeout 本身（BaseException 子类），不会被驱动或 HTTP 库的 except Exception 吞掉
+        return self.module.Timeout(seconds)
+
+
+class EventletConcurrency(Concurrency):
+    """eventlet，需先调用 eventlet.monkey_patch()。"""
+
+    name = CONCURRENCY_EVENTLET
+    module_name = "eventlet"
+    cooperative = True
+
+    def check(self):
+        patcher = importlib.import_module("eventlet.patcher")
+        if not (patcher.is_monkey_patched("socket") and patcher.is_monkey_patched("thread")):
+            return "eventlet concurrency requires eventlet.monkey_patch() before importing database drivers"
+        return None
+
+    @property
+    def Timeout(self):
+        return self.module.Timeout
+
+    def Event(self):
+        return importlib.import_module("eventlet.green.threading").Event()
+
+    def RLock(self):
+        return importlib.import_module("eventlet.green.threading").RLock()
+
+    def sleep(self, seconds):
+        self.module.sleep(seconds)
+
+    def timeout(self, seconds):
+        return self.module.Timeout(seconds)
+
+
+_FACTORIES = {
+    CONCURRENCY_THREADING: Concurrency,
+    CONCURRENCY_GEVENT: GeventConcurrency,
+    CONCURRENCY_EVENTLET: EventletConcurrency,
+}
+_current = Concurrency()
+_current_lock = threading.Lock()
+
+
+def set_concurrency(name):
+    """设置进程的并发模式，需在打补丁之后、创建 SDK 对象之前调用。返回对应的 Concurrency。
+
+    :param name: "threading"、"gevent" 或 "eventlet"
+    :raises ValueError: 未知的并发模式
+    :raises ImportError: 协程库未安装
+    :raises RuntimeError: 尚未完成 monkey patching
+    """
+    global _current
+    factory = _FACTORIES.get(name)
+    if factory is None:
+        raise ValueError("unsupported concurrency: %s" % name)
+    concurrency = factory()
+    if concurrency.cooperative:
+        concurrency.module
+    message = concurrency.check()
+    if message:
+        raise RuntimeError(message)
+    with _current_lock:
+        _current = concurrency
+    return concurrency
+
+
+def get_concurrency():
+    """返回进程当前的并发模式。"""
+    return _current
@@ -14,16 +14,39 @@
 # limitations under the License.
 #
 
+import concurrent.futures
+import contextlib
+import functools
 import hashlib
+import heapq
+import itertools
 import logging
 import random
 import threading
 import time
 
-import mysql.connector
-from mysql.connector import pooling
+from ssm_rotation_sdk.concurrency import get_concurrency
+from ssm_rotation_sdk.drivers import DRIVER_MYSQL_CONNECTOR, get_driver
+from ssm_rotation_sdk.events import (
+    EVENT_CREDENTIAL_CHANGED,
+    EVENT_POOL_DRAINED,
+    EVENT_POOL_READY,
+    EventDispatcher,
+    RotationEvent,
+)
+from ssm_rotation_sdk.pool import (
+    ConnectionBudget,
+    ConnectionPool,
+    PoolError,
+    PoolExhaustedError,
+    StripedConnectionPool,
+)
+from ssm_rotation_sdk.requester import Error, get_account, get_current_account
+from ssm_rotation_sdk.worker import BackgroundWorker
 
-from ssm_rotation_sdk.requester import Error, get_current_account
+
+class ConnectionUnavailableError(PoolError):
+    """无法从连接池获取连接（SDK 未初始化、已关闭或连接池耗尽）。"""
 
 
 class Config:
@@ -32,6 +55,9 @@ class Config:
     DEFAULT_WATCH_FREQ = 10
     DEFAULT_BORROW_RETRY_COUNT = 3
     DEFAULT_BORROW_RETRY_INTERVAL_MS = 50
+    DEFAULT_RETRY_DEADLINE_MS = 5000
+    DEFAULT_POOL_BUILD_TIMEOUT = 30
+    DEFAULT_STANDBY_POOL_SIZE = 1
 
     def __init__(self, params=None):
         params = params or {}
@@ -45,6 +71,22 @@ class Config:
         self.borrow_retry_interval_ms = params.get(
             "BORROW_RETRY_INTERVAL_MS", self.DEFAULT_BORROW_RETRY_INTERVAL_MS
         )
+        self.retry_deadline_ms = params.get(
+            "RETRY_DEADLINE_MS", self.DEFAULT_RETRY_DEADLINE_MS
+        )
+        self.pool_build_timeout = params.get(
+            "POOL_BUILD_TIMEOUT", self.DEFAULT_POOL_BUILD_TIMEOUT
+        )
+        # 当前连接池与退休连接池合计的物理连接数上限（实例级 / 进程级），None 表示不限制
+        self.max_connections = params.get("MAX_CONNECTIONS")
+        self.process_max_connections = params.get("PROCESS_MAX_CONNECTIONS")
+        # 同时监听 SSM_Pending 版本，轮转生效前提前建好并预热新凭据的连接池
+        self.watch_pending = params.get("WATCH_PENDING", False)
+        # 双账号轮转：保留非活跃用户的连接池作为热备，再次轮转回该用户时直接提升
+        self.hot_standby = params.get("HOT_STANDBY", False)
+        self.standby_pool_size = params.get("STANDBY_POOL_SIZE", self.DEFAULT_STANDBY_POOL_SIZE)
+        # 轮转后该时长（秒）内新凭据认证失败时回退到 SSM_Previous，None 表示不回退
+        self.auth_fallback_window = params.get("AUTH_FALLBACK_WINDOW")
 
     def validate(self):
         if self.db_config is None:
@@ -64,12 +106,28 @@ class Config:
             return Error("BORROW_RETRY_COUNT must be greater than 0")
         if self.borrow_retry_interval_ms < 0:
             return Error("BORROW_RETRY_INTERVAL_MS must be greater than or equal to 0")
+        if self.retry_deadline_ms < 0:
+            return Error("RETRY_DEADLINE_MS must be greater than or equal to 0")
+        if self.pool_build_timeout is None or self.pool_build_timeout <= 0:
+            return Error("POOL_BUILD_TIMEOUT must be greater than 0")
+        if self.max_connections is not None and self.max_connections <= 0:
+            return Error("MAX_CONNECTIONS must be greater than 0")
+        if self.process_max_connections is not None and self.process_max_connections <= 0:
+            return Error("PROCESS_MAX_CONNECTIONS must be greater than 0")
+        if self.auth_fallback_window is not None and self.auth_fallback_window <= 0:
+            return Error("AUTH_FALLBACK_WINDOW must be greater than 0")
+        if self.standby_pool_size is None or self.standby_pool_size < 0:
+            return Error("STANDBY_POOL_SIZE must be greater than or equal to 0")
         return None
 
 
 class DbConfig:
     """数据库连接配置类。"""
 
+    # 只读副本负载均衡策略
+    LB_LEAST_BORROWED = "least_borrowed"
+    LB_LATENCY = "latency"
+
     def __init__(self, params=None):
         params = params or {}
         self.secret_name = params.get("secret_name")
@@ -79,6 +137,37 @@ class DbConfig:
         self.param_str = params.get("param_str")
         self.pool_size = params.get("pool_size", 5)
         self.pool_name = params.get("pool_name", "ssm_pool")
+        # 只读副本列表，元素形如 {"ip_address": "10.0.0.2", "port": 3306}
+        self.replicas = list(params.get("replicas") or [])
+        self.replica_pool_size = params.get("replica_pool_size", self.pool_size)
+        self.load_balance = params.get("load_balance", self.LB_LEAST_BORROWED)
+        # 借出校验与会话重置策略，取值见 ConnectionPool.VALIDATE_* / RESET_*
+        self.validation = params.get("validation", ConnectionPool.VALIDATE_IDLE)
+        self.validation_idle_ms = params.get("validation_idle_ms", 1000)
+        self.reset_session = params.get("reset_session", ConnectionPool.RESET_ALWAYS)
+        # 每条物理连接建立后执行一次的 SQL 列表（如 SET time_zone），或接收驱动连接的可调用对象
+        self.session_init = params.get("session_init")
+        # 线程亲和：归还的连接由归还线程保留，空闲超过 affinity_idle_timeout（秒）后放回共享连接池
+        self.thread_affinity = params.get("thread_affinity", False)
+        self.affinity_idle_timeout = params.get("affinity_idle_timeout", 30)
+        # 分片数：大于 1 时连接池拆分为多个共享 pool_size 的分片，降低高并发借出时的锁竞争
+        self.pool_stripes = params.get("pool_stripes", 1)
+        self.idle_validation = params.get("idle_validation", True)
+        # 连接回收：最长存活时间与空闲超时（秒），按 lifetime_jitter 比例随机提前
+        self.max_lifetime = params.get("max_lifetime")
+        self.idle_timeout = params.get("idle_timeout")
+        self.lifetime_jitter = params.get("lifetime_jitter", 0.1)
+        self.min_idle = params.get("min_idle")
+        # 连接借出超过该时长（秒）时记录疑似泄漏及借出调用栈，None 表示关闭
+        self.leak_detection_threshold = params.get("leak_detection_threshold")
+        # 建池或补足连接池时并行建连的最大线程数
+        self.connect_concurrency = params.get("connect_concurrency", 4)
+        # 驱动后端：drivers 模块中注册的名称或 Driver 实例
+        self.driver = params.get("driver", DRIVER_MYSQL_CONNECTOR)
+        # 连接全部借出时等待归还的最长时间（秒），None 表示立即失败并按 BORROW_RETRY_* 重试
+        self.borrow_timeout = params.get("borrow_timeout")
+        # 仅提供凭据：SDK 连接池不预建、不保留连接，供 SQLAlchemy 等自带连接池的框架使用
+        self.credential_only = params.get("credential_only", False)
 
     def validate(self):
         if not self.secret_name:
@@ -89,22 +178,137 @@ class DbConfig:
             return Error("port is required")
         if self.pool_size <= 0:
             return Error("pool_size must be greater than 0")
+        for index, replica in enumerate(self.replicas):
+            if not isinstance(replica, dict):
+                return Error("replicas[%d] must be a dict" % index)
+            if not replica.get("ip_address"):
+                return Error("replicas[%d].ip_address is required" % index)
+            if not replica.get("port"):
+                return Error("replicas[%d].port is required" % index)
+        if self.replicas and self.replica_pool_size <= 0:
+            return Error("replica_pool_size must be greater than 0")
+        if self.load_balance not in (self.LB_LEAST_BORROWED, self.LB_LATENCY):
+            return Error("load_balance must be one of: %s, %s"
+                         % (self.LB_LEAST_BORROWED, self.LB_LATENCY))
+        if self.validation not in ConnectionPool.VALIDATION_POLICIES:
+            return Error("validation must be one of: %s" % ", ".join(ConnectionPool.VALIDATION_POLICIES))
+        if self.validation_idle_ms < 0:
+            return Error("validation_idle_ms must be greater than or equal to 0")
+        if self.reset_session not in ConnectionPool.RESET_POLICIES:
+            return Error("reset_session must be one of: %s" % ", ".join(ConnectionPool.RESET_POLICIES))
+        if self.session_init is not None and not callable(self.session_init):
+            if isinstance(self.session_init, str) or not isinstance(self.session_init, (list, tuple)) \
+                    or not all(isinstance(sql, str) for sql in self.session_init):
+                return Error("session_init must be a list of SQL statements or a callable")
+        if self.affinity_idle_timeout is None or self.affinity_idle_timeout <= 0:
+            return Error("affinity_idle_timeout must be greater than 0")
+        if not isinstance(self.pool_stripes, int) or not 1 <= self.pool_stripes <= self.pool_size:
+            return Error("pool_stripes must be between 1 and pool_size")
+        if self.max_lifetime is not None and self.max_lifetime <= 0:
+            return Error("max_lifetime must be greater than 0")
+        if self.idle_timeout is not None and self.idle_timeout <= 0:
+            return Error("idle_timeout must be greater than 0")
+        if not 0 <= self.lifetime_jitter < 1:
+            return Error("lifetime_jitter must be greater than or equal to 0 and less than 1")
+        if self.min_idle is not None and not 0 <= self.min_idle <= self.pool_size:
+            return Error("min_idle must be between 0 and pool_size")
+        if self.leak_detection_threshold is not None and self.leak_detection_threshold <= 0:
+            return Error("leak_detection_threshold must be greater than 0")
+        if self.connect_concurrency <= 0:
+            return Error("connect_concurrency must be greater than 0")
+        if self.borrow_timeout is not None:
+            if self.borrow_timeout < 0:
+                return Error("borrow_timeout must be greater than or equal to 0")
+            if self.pool_stripes > 1:
+                return Error("borrow_timeout is not supported with pool_stripes")
+        if self.credential_only and self.min_idle:
+            return Error("min_idle must be 0 with credential_only")
+        try:
+            driver = get_driver(self.driver)
+            driver.module
+        except ValueError as exc:
+            return Error(str(exc))
+        except ImportError as exc:
+            return Error("driver %s is not installed: %s" % (self.driver, exc))
+        concurrency = get_concurrency()
+        if concurrency.cooperative:
+            # 协程共用一个操作系统线程：按线程保留连接与按线程分片都没有意义
+            if self.thread_affinity or self.pool_stripes > 1:
+                return Error("thread_affinity and pool_stripes are not supported with %s concurrency"
+                             % concurrency.name)
+            if not driver.supports_concurrency(concurrency):
+                return Error("driver %s blocks the %s hub, use a pure Python driver such as "
+                             "mysql-connector-pure or pymysql" % (driver.name, concurrency.name))
         return None
 
 
 class ConnCache:
-    """当前连接池缓存。"""
+    """当前连接池缓存（主库连接池 + 只读副本连接池）。"""
+
+    __slots__ = ("conn_key", "user_name", "pool", "replicas", "secret", "version_id", "generation",
+                 "conn_config", "rotated_at")
 
-    def __init__(self, conn_key=None, user_name=None, pool=None):
+    def __init__(self, conn_key=None, user_name=None, pool=None, replicas=None, secret=None,
+                 version_id=None, conn_config=None):
         self.conn_key = conn_key
         self.user_name = user_name
         self.pool = pool
+        self.replicas = replicas or []
+        # 建连使用的密码（SecretBytes），连接池退休后清零
+        self.secret = secret
+        self.version_id = version_id
+        # 本地凭据代数，每次切换连接池加一
+        self.generation = 0
+        # 主库建连参数（不含密码），供自带连接池的框架使用
+        self.conn_config = conn_config
+        # 作为新凭据切换为当前连接池的时间；首次建池或同一凭据重建时为 None
+        self.rotated_at = None
+
+    def pools(self):
+        """返回该缓存持有的全部连接池（主库在前）。"""
+        pools = [self.pool] if self.pool is not None else []
+        pools.extend(replica.pool for replica in self.replicas)
+        return pools
+
+
+class ReplicaPool:
+    """只读副本连接池及其负载均衡统计。"""
+
+    __slots__ = ("index", "host", "port", "pool", "latency")
+
+    def __init__(self, index=0, host=None, port=None, pool=None, latency=None):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.pool = pool
+        # ping 往返时延的指数移动平均（秒），None 表示尚未测量
+        self.latency = latency
+
+    def observe_latency(self, sample, weight=0.3):
+        if self.latency is None:
+            self.latency = sample
+        else:
+            self.latency = (1.0 - weight) * self.latency + weight * sample
 
 
 class RetiredPool:
-    def __init__(self, pool=None, expire_at=0.0):
+    """轮转后进入排空模式的旧连接池，按 expire_at 在最小堆中排序。"""
+
+    __slots__ = ("pool", "expire_at", "seq", "drained", "cache")
+
+    _counter = itertools.count()
+
+    def __init__(self, pool=None, expire_at=0.0, cache=None):
         self.pool = pool
         self.expire_at = expire_at
+        # 同一截止时间的多个连接池按退休顺序排列
+        self.seq = next(self._counter)
+        self.drained = False
+        # 连接池所属的 ConnCache，用于事件中的凭据版本信息
+        self.cache = cache
+
+    def __lt__(self, other):
+        return (self.expire_at, self.seq) < (other.expire_at, other.seq)
 
 
 class DynamicSecretRotationDb:
@@ -113,46 +317,117 @@ class DynamicSecretRotationDb:
     MAX_WATCH_FAILURES = 5
     # 指数退避最大倍数（2^5 = 32 倍）
     MAX_BACKOFF_MULTIPLIER = 5
+    # 兼容保留：MySQL 的错误码，实际分类由驱动后端（Driver.is_authentication_error 等）完成
     AUTH_ERROR_CODES = {1044, 1045, 1698}
+    CONNECTION_LOST_CODES = {2003, 2006, 2013, 2055}
     UNSUPPORTED_PARAMS = {"loc", "parseTime"}
+    # latency 策略：时延不超过最低时延 (1 + LATENCY_TOLERANCE) 倍或相差不超过 LATENCY_SLACK 秒的副本视为同一档，
+    # 档内借出数最少者优先，相同时随机选择
+    LATENCY_TOLERANCE = 0.5
+    LATENCY_SLACK = 0.002
 
     def __init__(self, params=None):
         params = params or {}
         self.config = params.get("config")
         self.db_conn = params.get("db_conn")
-        self._lock = threading.RLock()
-        self._stop_event = threading.Event()
+        # 并发模式（线程或 gevent / eventlet 协作式），决定锁、等待与休眠使用的原语
+        self._concurrency = get_concurrency()
+        self._lock = self._concurrency.RLock()
+        self._stop_event = self._concurrency.Event()
+        # 唤醒 Watcher 重新计算下一次等待时间（停止或新增退休连接池时）
+        self._wakeup = self._concurrency.Event()
         self._watch_thread = None
         self.closed = False
         self.watch_failures = 0
         self.last_error = None
+        # 退休连接池的截止时间最小堆
         self._retired_pools = []
+        # 后台建池：刷新任务在独立线程中执行，借出方继续使用当前连接池直到原子切换
+        self._builder = None
+        self._refresh_future = None
+        self._refresh_forced = False
+        self._refresh_started = 0.0
+        self._building_pools = set()
+        self._budget = None
+        # 轮转事件在独立线程中派发给监听器
+        self._events = EventDispatcher("SSMRotationEvents")
+        self._generation = 0
+        # WATCH_PENDING：按 SSM_Pending 版本预热、尚未投入使用的连接池
+        self._warm_cache = None
+        # HOT_STANDBY：非活跃用户的热备连接池，及其各连接池原本的 min_idle
+        self._standby_cache = None
+        self._standby_min_idle = []
+        # AUTH_FALLBACK_WINDOW：认证失败的凭据及回退截止时间
+        self._failed_conn_key = None
+        self._fallback_until = 0.0
+
+    @property
+    def driver(self):
+        """当前配置使用的驱动后端（drivers.Driver）。"""
+        return get_driver(self.config.db_config.driver)
+
+    def get_conn(self, readonly=False):
+        """从当前连接池中获取一个连接。
+
+        :param readonly: 为 True 时从只读副本中按负载均衡策略选取连接，
+            未配置副本或副本不可用时回退到主库
+        :type readonly: bool
+        """
+        with self._lock:
+            config = self.config
+        if config is None:
+            return None
+        return self._borrow(readonly, time.monotonic() + config.retry_deadline_ms / 1000.0)
 
-    def get_conn(self):
-        """从当前连接池中获取一个连接。"""
+    def _borrow(self, readonly, expires_at):
+        """按 BORROW_RETRY_* 重试借出连接，认证失败时的刷新等待与重试间隔不超过截止时间 expires_at（monotonic）。"""
         with self._lock:
             if self.closed or self.db_conn is None or self.db_conn.pool is None:
                 return None
-            pool = self.db_conn.pool
+            # 在锁内取配置快照，不依赖 GIL 保证与 init() 的可见性顺序
+            config = self.config
+            pool = self._select_pool(self.db_conn, readonly)
+            primary = self.db_conn.pool
 
-        for attempt in range(self.config.borrow_retry_count):
+        for attempt in range(config.borrow_retry_count):
             try:
                 return pool.get_connection()
-            except mysql.connector.Error as exc:
+            except (self.driver.Error, PoolError) as exc:
+                remaining = expires_at - time.monotonic()
                 if self._is_authentication_error(exc):
+                    if remaining <= 0:
+                        logging.error("authentication failed when borrowing connection, deadline exceeded")
+                        return None
                     logging.warning("authentication failed when borrowing connection, refreshing pool")
-                    err = self._refresh_pool(force=True)
+                    err = self._refresh_shared(remaining)
                     if err:
                         logging.error("failed to refresh pool after authentication error: %s", err.message)
                         return None
                     with self._lock:
                         if self.db_conn is None or self.db_conn.pool is None:
                             return None
-                        pool = self.db_conn.pool
+                        pool = self._select_pool(self.db_conn, readonly)
+                        primary = self.db_conn.pool
+                    continue
+
+                if pool.closed:
+                    # 选中的连接池在借出前被轮转退休，改用新的当前连接池
+                    with self._lock:
+                        if self.closed or self.db_conn is None or self.db_conn.pool is None:
+                            return None
+                        pool = self._select_pool(self.db_conn, readonly)
+                        primary = self.db_conn.pool
+                    continue
+
+                if pool is not primary:
+                    logging.warning("failed to get connection from replica, falling back to primary: %s", str(exc))
+                    pool = primary
                     continue
 
-                if self._is_pool_exhausted(exc) and attempt + 1 < self.config.borrow_retry_count:
-                    time.sleep(self.config.borrow_retry_interval_ms / 1000.0)
+                interval = config.borrow_retry_interval_ms / 1000.0
+                if (self._is_pool_exhausted(exc) and attempt + 1 < config.borrow_retry_count
+                        and interval < remaining):
+                    self._concurrency.sleep(interval)
                     continue
 
                 logging.error("failed to get connection from pool: %s", str(exc))
@@ -160,25 +435,185 @@ class DynamicSecretRotationDb:
 
         return None
 
+    def execute(self, sql, params=None, idempotent=True, readonly=False, deadline=None):
+        """执行单条 SQL，凭据轮转或连接断开时在截止时间内透明重试。
+
+        认证失败时等待同一次进行中的连接池刷新，再从新连接池借出连接重试；
+        连接断开时语句可能已在服务端执行，仅 idempotent=True 时重试。
+
+        :param sql: SQL 语句
+        :param params: 语句参数
+        :param idempotent: 语句是否可安全重复执行
+        :param readonly: 同 get_conn
+        :param deadline: 重试总时长上限（秒），默认取 Config 的 RETRY_DEADLINE_MS
+        :return: 有结果集时返回全部行，否则提交事务并返回影响行数
+        :raises ConnectionUnavailableError: 截止时间内无法获取连接
+        """
+        with self._lock:
+            config = self.config
+        if config is None:
+            raise ConnectionUnavailableError("dynamic secret rotation db is not initialized")
+        if deadline is None:
+            deadline = config.retry_deadline_ms / 1000.0
+        expires_at = time.monotonic() + deadline
+        interval = config.borrow_retry_interval_ms / 1000.0
+
+        while True:
+            conn = self._borrow(readonly, expires_at)
+            if conn is None:
+                with self._lock:
+                    closed = self.closed
+                if closed or time.monotonic() + interval >= expires_at:
+                    raise ConnectionUnavailableError("failed to get connection from pool")
+                self._concurrency.sleep(interval)
+                continue
+
+            try:
+                result = self._run_statement(conn, sql, params)
+            except self.driver.Error as exc:
+                auth_failed = self._is_authentication_error(exc)
+                if not auth_failed and not self._is_connection_lost(exc):
+                    conn.close()
+                    raise
+                conn.invalidate()
+                if (not auth_failed and not idempotent) or time.monotonic() >= expires_at:
+                    raise
+                logging.warning("statement failed on a stale connection, retrying: %s", str(exc))
+                if auth_failed:
+                    self._refresh_shared(max(0.0, expires_at - time.monotonic()))
+                continue
+            except BaseException:
+                # 参数错误、KeyboardInterrupt、协程超时等：连接状态未知，断开而不是放回连接池
+                conn.invalidate()
+                raise
+            conn.close()
+            return result
+
+    def _run_statement(self, conn, sql, params):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            if cursor.description is not None:
+                return cursor.fetchall()
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            try:
+                cursor.close()
+            except self.driver.Error:
+                logging.debug("failed to close cursor", exc_info=True)
+
+    @contextlib.contextmanager
+    def connection(self, readonly=False, rollback_on_error=True):
+        """借出连接的上下文管理器，退出时总是归还连接。
+
+        with db.connection() as conn:
+            ...
+
+        :param readonly: 同 get_conn
+        :param rollback_on_error: 代码块抛出异常时先回滚当前事务再归还
+        :raises ConnectionUnavailableError: 无法获取连接
+        """
+        conn = self.get_conn(readonly=readonly)
+        if conn is None:
+            raise ConnectionUnavailableError("failed to get connection from pool")
+        try:
+            yield conn
+        except BaseException:
+            if rollback_on_error:
+                try:
+                    conn.rollback()
+                except Exception:
+                    logging.debug("failed to rollback before returning connection", exc_info=True)
+            raise
+        finally:
+            conn.close()
+
+    @contextlib.contextmanager
+    def cursor(self, readonly=False, rollback_on_error=True, **cursor_kwargs):
+        """借出连接并创建游标的上下文管理器，退出时依次关闭游标、归还连接。
+
+        with db.cursor() as cur:
+            cur.execute("SELECT 1")
+
+        :param cursor_kwargs: 透传给驱动 cursor() 的参数，如 dictionary=True
+        """
+        with self.connection(readonly=readonly, rollback_on_error=rollback_on_error) as conn:
+            cur = conn.cursor(**cursor_kwargs)
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    def budget_stats(self):
+        """返回连接预算的使用情况与压力指标，未配置预算时返回 None。
+
+        denied 为建连因预算不足被拒绝的次数，reclaimed 为预算紧张时收缩的空闲连接数。
+        """
+        budget = self._budget
+        if budget is None:
+            return None
+        return budget.stats()
+
+    def pool_stats(self):
+        """返回当前各连接池（主库在前）的状态与持有时长统计。"""
+        with self._lock:
+            if self.closed or self.db_conn is None:
+                return []
+            pools = self.db_conn.pools()
+        return [pool.stats() for pool in pools]
+
+    def subscribe(self, listener, events=None):
+        """订阅轮转事件，监听器在独立线程中以 RotationEvent 为参数调用。
+
+        :param listener: 可调用对象，也可以用作装饰器
+        :param events: 关注的事件类型（EVENT_CREDENTIAL_CHANGED、EVENT_POOL_READY、
+            EVENT_POOL_DRAINED），None 表示全部
+        :rtype: listener
+        """
+        return self._events.subscribe(listener, events)
+
+    def unsubscribe(self, listener):
+        """取消订阅轮转事件。"""
+        self._events.unsubscribe(listener)
+
     def init(self, config):
         """初始化支持动态凭据轮转的数据库连接。"""
-        self.config = config
-        err = self.config.validate()
+        err = config.validate()
         if err:
             return err
 
-        self.closed = False
-        self._stop_event.clear()
+        concurrency = get_concurrency()
+        if concurrency is not self._concurrency:
+            # 实例在 set_concurrency() 之前构造（如模块级单例）：按当前并发模式重建锁与 Watcher 的等待原语
+            self._concurrency = concurrency
+            self._lock = concurrency.RLock()
+            self._stop_event = concurrency.Event()
+            self._wakeup = concurrency.Event()
+
+        with self._lock:
+            self.config = config
+            self.closed = False
+            self._stop_event.clear()
+            try:
+                budget = self._build_budget()
+            except ValueError as exc:
+                return Error(str(exc))
+            # 上一次 init() 失败后重新初始化：释放之前登记的进程级预算
+            self._release_budget(self._budget)
+            self._budget = budget
         err = self._refresh_pool(force=True)
         if err:
             return err
 
-        self._watch_thread = threading.Thread(
+        watcher = threading.Thread(
             target=self._watch_secret_change,
             name="SSMRotationWatcher",
             daemon=True,
         )
-        self._watch_thread.start()
+        with self._lock:
+            self._watch_thread = watcher
+        watcher.start()
         logging.info("succeed to init db_conn")
         return None
 
@@ -189,19 +624,41 @@ class DynamicSecretRotationDb:
                 return
             self.closed = True
             self._stop_event.set()
+            self._wakeup.set()
             current = self.db_conn
             self.db_conn = None
             retired_pools = self._retired_pools
             self._retired_pools = []
+            builder = self._builder
+            self._builder = None
+            building = list(self._building_pools)
+            warm = self._warm_cache
+            self._warm_cache = None
+            standby = self._standby_cache
+            self._standby_cache = None
+            watcher = self._watch_thread
+            budget = self._budget
+            self._budget = None
+
+        # 取消排队中的刷新任务，并中止正在建立连接的新连接池
+        if builder is not None:
+            builder.shutdown()
+        for pool in building:
+            self._close_pool(pool)
 
-        watcher = self._watch_thread
         if (watcher and watcher.is_alive()
                 and watcher is not threading.current_thread()):
             watcher.join(timeout=1)
 
-        self._close_pool(current.pool if current else None)
+        for pool in (current.pools() if current else []):
+            self._close_pool(pool)
         for retired in retired_pools:
             self._close_pool(retired.pool)
+        for unused in (warm, standby):
+            if unused is not None:
+                self._close_cache(unused)
+        self._release_budget(budget)
+        self._events.close()
 
     def is_healthy(self):
         with self._lock:
@@ -213,9 +670,25 @@ class DynamicSecretRotationDb:
             return
 
         interval = self.config.watch_freq
-        while not self._stop_event.wait(interval):
+        next_poll = time.time() + interval
+        while True:
+            # 在下一次轮询与最早的退休截止时间之间取较早者唤醒
+            timeout = next_poll - time.time()
+            deadline = self._next_retire_deadline()
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.time())
+            self._wakeup.wait(max(0.0, timeout))
+            self._wakeup.clear()
+            if self._stop_event.is_set():
+                return
+
             self._cleanup_retired_pools(force=False)
+            if time.time() < next_poll:
+                continue
+
             self._watch_change()
+            self._maintain_pools()
+            self._probe_replicas()
 
             # 指数退避：连续失败超过阈值后，逐步增大轮询间隔
             with self._lock:
@@ -227,21 +700,76 @@ class DynamicSecretRotationDb:
             else:
                 # 恢复正常后，重置为原始间隔
                 interval = self.config.watch_freq
+            next_poll = time.time() + interval
 
     def _watch_change(self):
-        err = self._refresh_pool(force=False)
+        """提交一次非强制刷新，不等待建池完成；上一次刷新仍在进行时跳过。
+
+        上一次刷新超过 POOL_BUILD_TIMEOUT 仍未完成（如驱动没有建连超时、握手挂起）时记为一次监听失败，
+        使 is_healthy() 能反映建池线程被卡住。
+        """
+        with self._lock:
+            pending = self._refresh_future
+            started = self._refresh_started
+        elapsed = time.time() - started
+        if pending is not None and not pending.done() and elapsed >= self.config.pool_build_timeout:
+            self._record_watch_result(Error("pool refresh still pending after %.1fs" % elapsed))
+            return
+        self._submit_refresh(force=False, track=True)
+
+    def _record_watch_result(self, err):
         if err:
             with self._lock:
                 self.watch_failures += 1
                 self.last_error = err.message
+                failures = self.watch_failures
             logging.error("failed to watch secret change (%d/%d): %s",
-                          self.watch_failures, self.MAX_WATCH_FAILURES, err.message)
+                          failures, self.MAX_WATCH_FAILURES, err.message)
             return
 
         with self._lock:
             self.watch_failures = 0
             self.last_error = None
 
+    def _submit_refresh(self, force=False, track=False):
+        """向后台建池线程提交刷新任务，返回 Future，结果为 Error 或 None。
+
+        已有进行中的刷新且能满足本次请求时直接返回该 Future，保证同一时刻只有一次建池。
+        """
+        with self._lock:
+            pending = self._refresh_future
+            if pending is not None and not pending.done() and (self._refresh_forced or not force):
+                return pending
+            if self.closed:
+                future = concurrent.futures.Future()
+                future.set_result(Error("dynamic secret rotation db is closed"))
+                return future
+            if self._builder is None:
+                self._builder = BackgroundWorker("SSMPoolBuilder")
+            future = self._builder.submit(self._run_refresh, force, track)
+            self._refresh_future = future
+            self._refresh_forced = force
+            self._refresh_started = time.time()
+            return future
+
+    def _run_refresh(self, force, track):
+        err = self._refresh_pool(force=force)
+        if track:
+            self._record_watch_result(err)
+            if self.config.watch_pending:
+                self._warm_pending()
+        return err
+
+    def _refresh_shared(self, timeout):
+        """强制刷新连接池并最多等待 timeout 秒；并发调用方共享同一次刷新及其结果。"""
+        future = self._submit_refresh(force=True)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            return Error("timed out waiting for connection pool refresh")
+        except concurrent.futures.CancelledError:
+            return Error("connection pool refresh was cancelled")
+
     def _refresh_pool(self, force=False):
         account, err = get_current_account(
             self.config.db_config.secret_name,
@@ -253,56 +781,542 @@ class DynamicSecretRotationDb:
         conn_key = self._build_conn_key(account)
         with self._lock:
             current = self.db_conn
-            if (
+            unchanged = (
                 not force
                 and not self.closed
                 and current is not None
                 and current.conn_key == conn_key
-            ):
+            )
+            # 回退窗口内不切换回刚刚认证失败的凭据
+            suppressed = (
+                not force
+                and conn_key == self._failed_conn_key
+                and time.time() < self._fallback_until
+            )
+        if unchanged:
+            if len(self.config.db_config.replicas) > len(current.replicas):
+                self._repair_replicas(account, current)
+            return None
+        if suppressed:
+            return None
+
+        # 刚轮转的凭据认证失败时，重建同一凭据的连接池无济于事，先回退到上一版本凭据
+        if force and current is not None and current.conn_key == conn_key and self._should_fallback(current):
+            err = self._fallback_to_previous(conn_key)
+            if err is None:
                 return None
+            logging.warning("failed to fall back to previous credential: %s", err.message)
 
-        pool_config = self._build_pool_config(account)
-        try:
-            new_pool = pooling.MySQLConnectionPool(**pool_config)
-            test_conn = new_pool.get_connection()
-            try:
-                test_conn.ping(reconnect=True)
-            finally:
-                test_conn.close()
-        except mysql.connector.Error as exc:
-            return Error("connect to cdb error: %s" % str(exc))
+        cache, standby_min_idle, err = self._acquire_cache(account, conn_key)
+        if err:
+            return err
+        return self._activate_cache(cache, standby_min_idle)
+
+    def _acquire_cache(self, account, conn_key):
+        """获取 account 的连接池：优先使用预热连接池和热备连接池，否则新建。
+
+        :rtype: (ConnCache, 热备连接池原 min_idle 列表或 None, error)
+        """
+        # 已按 SSM_Pending 预热过该凭据时直接切换，不在关键路径上建连
+        cache = self._take_warm_cache(conn_key)
+        if cache is not None:
+            cache.version_id = account.version_id
+            logging.info("promoting pre-warmed pool for user %s", account.user_name)
+            return cache, None, None
+        cache, standby_min_idle = self._take_standby_cache(account, conn_key)
+        if cache is not None:
+            return cache, standby_min_idle, None
+        cache, err = self._build_cache(account, conn_key)
+        return cache, None, err
 
-        cache = ConnCache(conn_key=conn_key, user_name=account.user_name, pool=new_pool)
+    def _activate_cache(self, cache, standby_min_idle=None):
+        """将 cache 原子切换为当前连接池，并退休（或保留为热备）原连接池。"""
         old_cache = None
         with self._lock:
             if self.closed:
-                self._close_pool(new_pool)
+                for pool in cache.pools():
+                    self._close_pool(pool)
                 return Error("dynamic secret rotation db is closed")
             old_cache = self.db_conn
+            self._generation += 1
+            cache.generation = self._generation
+            if old_cache is not None and old_cache.conn_key != cache.conn_key:
+                cache.rotated_at = time.time()
             self.db_conn = cache
+            if cache.conn_key == self._failed_conn_key:
+                self._failed_conn_key = None
+                self._fallback_until = 0.0
 
-        if old_cache is not None and old_cache.user_name != account.user_name:
-            logging.info("credential rotated: %s -> %s", old_cache.user_name, account.user_name)
-        if old_cache is not None:
-            self._retire_pool(old_cache.pool)
+        if old_cache is not None and old_cache.user_name != cache.user_name:
+            logging.info("credential rotated: %s -> %s", old_cache.user_name, cache.user_name)
+        if old_cache is not None and old_cache.conn_key != cache.conn_key:
+            self._emit(EVENT_CREDENTIAL_CHANGED, cache, previous_user_name=old_cache.user_name)
+        for pool in cache.pools():
+            self._emit(EVENT_POOL_READY, cache, pool_name=pool.pool_name)
+        if standby_min_idle is not None:
+            self._restore_standby(cache, standby_min_idle)
+        if old_cache is not None and not self._keep_standby(old_cache, cache):
+            # 旧密码在退休连接池全部排空后清零，见 _wipe_drained_secret
+            for pool in old_cache.pools():
+                self._retire_pool(pool, old_cache)
         return None
 
-    def _build_pool_config(self, account):
+    def _should_fallback(self, current):
+        """current 是否为 AUTH_FALLBACK_WINDOW 内刚轮转生效的凭据（回退得到的连接池不再回退）。"""
+        window = self.config.auth_fallback_window
+        if window is None or current.rotated_at is None:
+            return False
+        with self._lock:
+            if self._failed_conn_key is not None:
+                return False
+        return time.time() - current.rotated_at <= window
+
+    def _fallback_to_previous(self, failed_conn_key):
+        """切换到 SSM_Previous 版本的凭据（优先使用其热备连接池），并在回退窗口内不再切回失败的凭据。"""
+        account, err = get_account(
+            self.config.db_config.secret_name,
+            self.config.ssm_service_config,
+            "SSM_Previous",
+        )
+        if err:
+            return err
+        conn_key = self._build_conn_key(account)
+        if conn_key == failed_conn_key:
+            return Error("previous credential is the same as the current one")
+
+        logging.warning("authentication failed with new credential, falling back to previous credential of user %s",
+                        account.user_name)
+        with self._lock:
+            self._failed_conn_key = failed_conn_key
+            self._fallback_until = time.time() + self.config.auth_fallback_window
+        cache, standby_min_idle, err = self._acquire_cache(account, conn_key)
+        if err:
+            with self._lock:
+                self._failed_conn_key = None
+                self._fallback_until = 0.0
+            return err
+        return self._activate_cache(cache, standby_min_idle)
+
+    def _take_standby_cache(self, account, conn_key):
+        """取出 account 用户的热备连接池，返回 (ConnCache, 原 min_idle 列表)，没有时返回 (None, None)。
+
+        密码已变化时原地更新热备连接池使用的密码：已建立的会话不受改密影响，之后新建的连接使用新密码。
+        """
+        with self._lock:
+            standby = self._standby_cache
+            if standby is None or standby.user_name != account.user_name:
+                return None, None
+            self._standby_cache = None
+            min_idle = self._standby_min_idle
+            self._standby_min_idle = []
+        if standby.conn_key != conn_key:
+            standby.secret.update(account.secret)
+            standby.conn_key = conn_key
+        standby.version_id = account.version_id
+        logging.info("promoting standby pool for user %s", account.user_name)
+        return standby, min_idle
+
+    def _restore_standby(self, cache, min_idle):
+        """热备连接池提升后恢复原 min_idle 并补足连接；补建不在切换的关键路径上。"""
+        deadline = time.time() + self.config.pool_build_timeout
+        for pool, value in zip(cache.pools(), min_idle):
+            pool.min_idle = value
+            try:
+                pool.fill(deadline)
+            except (self.driver.Error, PoolError) as exc:
+                logging.warning("failed to grow promoted pool %s: %s", pool.pool_name, str(exc))
+
+    def _keep_standby(self, old_cache, cache):
+        """HOT_STANDBY 开启且轮转切换了用户时，将旧连接池收缩后保留为热备，返回是否保留。"""
+        if not self.config.hot_standby or old_cache.user_name == cache.user_name:
+            return False
+        pools = old_cache.pools()
+        with self._lock:
+            if self.closed:
+                return False
+            previous = self._standby_cache
+            self._standby_cache = old_cache
+            self._standby_min_idle = [pool.min_idle for pool in pools]
+        if previous is not None:
+            # 第三个用户出现时，原热备不再属于双账号轮转，按普通轮转退休
+            for pool in previous.pools():
+                self._retire_pool(pool, previous)
+        self._shrink_standby(old_cache)
+        return True
+
+    def _shrink_standby(self, cache):
+        """将热备连接池收缩到 STANDBY_POOL_SIZE 个空闲连接；cache 已被提升时跳过。"""
+        size = self.config.standby_pool_size
+        with self._lock:
+            if self._standby_cache is not cache:
+                return
+            pools = cache.pools()
+            for pool in pools:
+                pool.min_idle = min(pool.min_idle, size)
+        for pool in pools:
+            pool.shrink(pool.idle_count - size)
+
+    def _build_cache(self, account, conn_key):
+        """使用 account 建立主库与全部副本连接池，返回 (ConnCache, error)。"""
+        deadline = time.time() + self.config.pool_build_timeout
+        pool_config = self._build_pool_config(account)
+        try:
+            new_pool = self._create_pool(pool_config, deadline)
+        except (self.driver.Error, PoolError) as exc:
+            return None, Error("connect to cdb error: %s" % str(exc))
+
+        # 主库与全部副本使用同一份凭据一起重建，单个副本失败不阻塞轮转
+        replicas = []
+        for index in range(len(self.config.db_config.replicas)):
+            replica = self._build_replica_pool(account, index, deadline)
+            if replica is not None:
+                replicas.append(replica)
+
+        cache = ConnCache(conn_key=conn_key, user_name=account.user_name, pool=new_pool,
+                          replicas=replicas, secret=account.secret, version_id=account.version_id,
+                          conn_config=pool_config["conn_config"])
+        return cache, None
+
+    def _take_warm_cache(self, conn_key):
+        """取出与 conn_key 匹配的预热连接池；不匹配的预热连接池保留，等待下一次 SSM_Pending 检查。"""
+        with self._lock:
+            warm = self._warm_cache
+            if warm is None or warm.conn_key != conn_key:
+                return None
+            self._warm_cache = None
+            return warm
+
+    def _warm_pending(self):
+        """检查 SSM_Pending 版本，为尚未生效的新凭据提前建立并预热连接池。"""
+        account, err = get_account(
+            self.config.db_config.secret_name,
+            self.config.ssm_service_config,
+            "SSM_Pending",
+        )
+        if err:
+            if err.code is not None and err.code.split(".")[0] == "ResourceNotFound":
+                # 不在轮转窗口内时没有 SSM_Pending 版本，属于正常情况；丢弃已失效的预热连接池
+                logging.debug("no pending credential: %s", err.message)
+                self._discard_warm_cache()
+            else:
+                # 鉴权失败、限流等：保留已有的预热连接池，下次监听时重试
+                logging.warning("failed to get pending credential for pre-warming: %s", err.message)
+            return
+        conn_key = self._build_conn_key(account)
+        with self._lock:
+            if self.closed:
+                return
+            current = self.db_conn
+            warm = self._warm_cache
+        if current is not None and current.conn_key == conn_key:
+            # 轮转已完成，SSM_Pending 与当前凭据相同
+            self._discard_warm_cache()
+            return
+        if warm is not None and warm.conn_key == conn_key:
+            return
+        if self._refresh_standby(account, conn_key):
+            return
+
+        logging.info("pre-warming pool for pending credential of user %s", account.user_name)
+        cache, err = self._build_cache(account, conn_key)
+        if err:
+            logging.warning("failed to pre-warm pool for pending credential: %s", err.message)
+            return
+        with self._lock:
+            if self.closed:
+                stale = cache
+            else:
+                stale = self._warm_cache
+                self._warm_cache = cache
+        if stale is not None:
+            self._close_cache(stale)
+
+    def _refresh_standby(self, account, conn_key):
+        """SSM_Pending 为热备用户的新密码时，原地更新热备连接池的密码，无需另建预热连接池。"""
+        with self._lock:
+            standby = self._standby_cache
+            if standby is None or standby.user_name != account.user_name:
+                return False
+            if standby.conn_key != conn_key:
+                standby.secret.update(account.secret)
+                standby.conn_key = conn_key
+        self._discard_warm_cache()
+        return True
+
+    def _discard_warm_cache(self):
+        with self._lock:
+            warm = self._warm_cache
+            self._warm_cache = None
+        if warm is not None:
+            self._close_cache(warm)
+
+    def _close_cache(self, cache):
+        """关闭未投入使用的连接池，全部排空后清零其密码。"""
+        pools = cache.pools()
+        for pool in pools:
+            self._close_pool(pool, on_drained=functools.partial(self._wipe_drained_secret, cache))
+        if not pools:
+            self._wipe_drained_secret(cache)
+
+    def _wipe_drained_secret(self, cache):
+        """cache 的全部连接池排空后清零其密码。
+
+        连接池关闭后，已通过关闭检查的借出方仍可能在建连时读取密码，排空（没有借出连接和进行中的建连）
+        之后才不会再有建连使用它；密码仍被当前、热备或预热连接池使用时保留。
+        """
+        if cache is None or cache.secret is None:
+            return
+        if not all(pool.drained for pool in cache.pools()):
+            return
+        with self._lock:
+            active = (self.db_conn, self._standby_cache, self._warm_cache)
+            if any(item is not None and item.secret is cache.secret for item in active):
+                return
+        cache.secret.wipe()
+
+    def _emit(self, event_type, cache, **kwargs):
+        """派发与 cache 对应凭据相关的轮转事件；关闭后不再派发。"""
+        if self.closed or cache is None:
+            return
+        self._events.emit(RotationEvent(
+            event_type,
+            secret_name=self.config.db_config.secret_name,
+            version_id=cache.version_id,
+            generation=cache.generation,
+            user_name=cache.user_name,
+            **kwargs))
+
+    def _create_pool(self, pool_config, deadline=None):
+        """创建连接池、建立全部连接并借出一个连接做连通性校验。
+
+        建池期间连接池登记在 _building_pools 中，close() 会将其关闭以中止建连。
+        """
+        pool_config = dict(pool_config)
         db_config = self.config.db_config
-        pool_config = {
-            "pool_name": db_config.pool_name,
-            "pool_size": db_config.pool_size,
-            "pool_reset_session": True,
+        conn_config = pool_config.pop("conn_config")
+        secret = pool_config.pop("secret")
+        stripes = min(db_config.pool_stripes, pool_config["pool_size"])
+        if stripes > 1:
+            pool_class = functools.partial(StripedConnectionPool, stripes=stripes)
+        else:
+            pool_class = ConnectionPool
+        new_pool = pool_class(
+            connect=functools.partial(self._connect, conn_config, secret, deadline),
+            validation=db_config.validation,
+            validation_idle_ms=db_config.validation_idle_ms,
+            reset_session=db_config.reset_session,
+            session_init=db_config.session_init,
+            thread_affinity=db_config.thread_affinity,
+            affinity_idle_timeout=db_config.affinity_idle_timeout,
+            borrow_timeout=db_config.borrow_timeout,
+            max_lifetime=db_config.max_lifetime,
+            idle_timeout=db_config.idle_timeout,
+            lifetime_jitter=db_config.lifetime_jitter,
+            leak_detection_threshold=db_config.leak_detection_threshold,
+            connect_concurrency=db_config.connect_concurrency,
+            budget=self._budget,
+            driver=self.driver,
+            **pool_config
+        )
+        with self._lock:
+            if self.closed:
+                raise PoolError("dynamic secret rotation db is closed")
+            self._building_pools.add(new_pool)
+        try:
+            new_pool.fill(deadline=deadline)
+            test_conn = new_pool.get_connection()
+            try:
+                self.driver.ping(test_conn)
+            finally:
+                if db_config.credential_only:
+                    # 校验凭据后立即断开，不在 SDK 连接池中保留连接
+                    test_conn.invalidate()
+                else:
+                    test_conn.close()
+        except Exception:
+            new_pool.close()
+            raise
+        finally:
+            with self._lock:
+                self._building_pools.discard(new_pool)
+        return new_pool
+
+    def _connect_params(self):
+        """返回 (conn_key, 驱动的主库建连参数)，未初始化或已关闭时返回 (None, None)。
+
+        参数中包含当前凭据的密码明文，仅用于 SQLAlchemy 等自带连接池的框架立即建连。
+        """
+        with self._lock:
+            cache = self.db_conn
+            if self.closed or cache is None or cache.conn_config is None:
+                return None, None
+            params = dict(cache.conn_config)
+            secret = cache.secret
+            conn_key = cache.conn_key
+        params["password"] = secret.reveal()
+        return conn_key, self.driver.connect_params(params)
+
+    def _current_conn_key(self):
+        # 单次引用读取在自由线程版 CPython 中同样是原子的，SQLAlchemy 每次借出都会调用，不加锁
+        cache = self.db_conn
+        return cache.conn_key if cache is not None else None
+
+    def _connect(self, conn_config, secret, deadline=None):
+        """建立一个物理连接；密码仅在建连时从 SecretBytes 解码，不保存在连接配置中。
+
+        建池期间单次建连的超时取剩余建池时间，建池完成后补建连接最多等待 POOL_BUILD_TIMEOUT，
+        避免一次挂起的握手一直占用 SSMPoolBuilder 线程。
+        """
+        kwargs = dict(conn_config)
+        kwargs["password"] = secret.reveal()
+        timeout = self.config.pool_build_timeout
+        now = time.time()
+        if deadline is not None and now < deadline:
+            timeout = min(timeout, deadline - now)
+        return self.driver.connect(self.driver.with_connect_timeout(kwargs, timeout))
+
+    def _build_replica_pool(self, account, index, deadline=None):
+        replica_config = self.config.db_config.replicas[index]
+        pool_config = self._build_pool_config(account, replica_config, index)
+        try:
+            pool = self._create_pool(pool_config, deadline)
+        except (self.driver.Error, PoolError) as exc:
+            logging.warning("failed to connect to replica %s:%s: %s",
+                            replica_config.get("ip_address"), replica_config.get("port"), str(exc))
+            return None
+        replica = ReplicaPool(
+            index=index,
+            host=replica_config.get("ip_address"),
+            port=replica_config.get("port"),
+            pool=pool,
+        )
+        if self.config.db_config.load_balance == DbConfig.LB_LATENCY:
+            replica.latency = self._measure_latency(replica)
+        return replica
+
+    def _repair_replicas(self, account, cache):
+        """凭据未变化时，补建上次轮转中创建失败的副本连接池。"""
+        existing = set(replica.index for replica in cache.replicas)
+        deadline = time.time() + self.config.pool_build_timeout
+        repaired = []
+        for index in range(len(self.config.db_config.replicas)):
+            if index in existing:
+                continue
+            replica = self._build_replica_pool(account, index, deadline)
+            if replica is not None:
+                repaired.append(replica)
+        if not repaired:
+            return
+        with self._lock:
+            if self.closed or self.db_conn is not cache:
+                stale = repaired
+            else:
+                stale = []
+                cache.replicas = sorted(cache.replicas + repaired, key=lambda item: item.index)
+        for replica in stale:
+            self._close_pool(replica.pool)
+        for replica in repaired:
+            if replica not in stale:
+                self._emit(EVENT_POOL_READY, cache, pool_name=replica.pool.pool_name)
+
+    def _select_pool(self, cache, readonly):
+        """按负载均衡策略为本次借出选择连接池，调用方需持有 self._lock。"""
+        if not readonly or not cache.replicas:
+            return cache.pool
+        candidates = cache.replicas
+        if self.config.db_config.load_balance == DbConfig.LB_LATENCY:
+            measured = [item for item in candidates if item.latency is not None]
+            if measured:
+                best = min(item.latency for item in measured)
+                limit = max(best * (1.0 + self.LATENCY_TOLERANCE), best + self.LATENCY_SLACK)
+                candidates = [item for item in measured if item.latency <= limit]
+            # 同一档内按借出数分摊读负载，借出数相同时随机选择，避免空闲时全部落在同一个副本
+            least = min(item.pool.outstanding for item in candidates)
+            return random.choice([item for item in candidates if item.pool.outstanding == least]).pool
+        return min(candidates, key=lambda item: item.pool.outstanding).pool
+
+    def _maintain_pools(self):
+        """在 Watcher 中维护当前连接池：补足受预算限制未建满的连接，回收过期连接，校验空闲连接。"""
+        with self._lock:
+            if self.closed or self.db_conn is None:
+                return
+            pools = self.db_conn.pools()
+            if self._warm_cache is not None:
+                pools.extend(self._warm_cache.pools())
+            standby = self._standby_cache
+        if standby is not None:
+            # 借出中的连接归还到热备连接池后再收缩到 STANDBY_POOL_SIZE
+            self._shrink_standby(standby)
+            pools.extend(standby.pools())
+        for pool in pools:
+            if self._budget is not None:
+                try:
+                    pool.fill()
+                except (self.driver.Error, PoolError) as exc:
+                    logging.warning("failed to grow pool %s: %s", pool.pool_name, str(exc))
+            pool.recycle()
+            if self.config.db_config.idle_validation:
+                pool.validate_idle()
+            pool.detect_leaks()
+
+    def _probe_replicas(self):
+        """在 Watcher 中测量各副本的 ping 时延，供 latency 策略使用。"""
+        with self._lock:
+            if self.closed or self.db_conn is None:
+                return
+            replicas = list(self.db_conn.replicas)
+        if self.config.db_config.load_balance != DbConfig.LB_LATENCY:
+            return
+        for replica in replicas:
+            sample = self._measure_latency(replica)
+            if sample is not None:
+                with self._lock:
+                    replica.observe_latency(sample)
+
+    def _measure_latency(self, replica):
+        """借出一个副本连接并测量一次 ping 往返时延（秒），只计时 ping 本身；失败时返回 None。"""
+        try:
+            conn = replica.pool.get_connection()
+        except (self.driver.Error, PoolError):
+            return None
+        try:
+            started = time.perf_counter()
+            self.driver.ping(conn)
+            return time.perf_counter() - started
+        except self.driver.Error as exc:
+            logging.debug("failed to probe replica %s:%s: %s", replica.host, replica.port, str(exc))
+            return None
+        finally:
+            conn.close()
+
+    def _build_pool_config(self, account, replica_config=None, replica_index=None):
+        db_config = self.config.db_config
+        conn_config = {
             "user": account.user_name,
-            "password": account.password,
             "host": db_config.ip_address,
             "port": db_config.port,
         }
+        pool_config = {
+            "pool_name": db_config.pool_name,
+            "pool_size": db_config.pool_size,
+            "min_idle": db_config.min_idle,
+            "conn_config": conn_config,
+            "secret": account.secret,
+        }
+        if replica_config is not None:
+            pool_config["pool_name"] = "%s_r%d" % (db_config.pool_name, replica_index)
+            pool_config["pool_size"] = db_config.replica_pool_size
+            if db_config.min_idle is not None:
+                pool_config["min_idle"] = min(db_config.min_idle, db_config.replica_pool_size)
+            conn_config["host"] = replica_config["ip_address"]
+            conn_config["port"] = replica_config["port"]
+        if db_config.credential_only:
+            pool_config["min_idle"] = 0
         if db_config.db_name:
-            pool_config["database"] = db_config.db_name
+            conn_config["database"] = db_config.db_name
 
         for key, value in self._parse_extra_params(db_config.param_str).items():
-            pool_config[key] = value
+            conn_config[key] = value
         return pool_config
 
     def _parse_extra_params(self, param_str):
@@ -320,42 +1334,78 @@ class DynamicSecretRotationDb:
         return parsed
 
     def _build_conn_key(self, account):
-        key = "{0}\0{1}".format(account.user_name, account.password)
-        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+        # 增量哈希，避免再拼接一份包含密码明文的字符串
+        digest = hashlib.sha256(account.user_name.encode("utf-8"))
+        digest.update(b"\0")
+        with account.secret.view() as password:
+            digest.update(password)
+        return digest.hexdigest()
+
+    def _build_budget(self):
+        if self.config.max_connections is None and self.config.process_max_connections is None:
+            return None
+        parent = None
+        if self.config.process_max_connections is not None:
+            parent = ConnectionBudget.process(self.config.process_max_connections)
+        return ConnectionBudget(self.config.max_connections, parent=parent,
+                                name=self.config.db_config.pool_name)
+
+    def _release_budget(self, budget):
+        """释放 budget 登记的进程级预算，最后一个实例关闭后进程级上限可以重新确定。"""
+        if budget is not None and budget.parent is not None:
+            ConnectionBudget.release_process(budget.parent)
 
     def _rotation_grace_period(self):
         if self.config.rotation_grace_period is not None:
             return float(self.config.rotation_grace_period)
         return max(30.0, float(self.config.watch_freq) * 3.0)
 
-    def _retire_pool(self, pool):
+    def _retire_pool(self, pool, cache=None):
+        """退休旧连接池：立即进入排空模式，借出连接全部归还或宽限期结束时释放。"""
         if pool is None:
             return
+        retired = RetiredPool(pool=pool, expire_at=time.time() + self._rotation_grace_period(),
+                              cache=cache)
         with self._lock:
-            self._retired_pools.append(
-                RetiredPool(
-                    pool=pool,
-                    expire_at=time.time() + self._rotation_grace_period(),
-                )
-            )
+            heapq.heappush(self._retired_pools, retired)
+        self._wakeup.set()
+        pool.drain(on_drained=functools.partial(self._on_retired_pool_drained, retired))
+
+    def _on_retired_pool_drained(self, retired):
+        with self._lock:
+            retired.drained = True
+        logging.debug("retired pool %s drained", retired.pool.pool_name)
+        self._emit(EVENT_POOL_DRAINED, retired.cache, pool_name=retired.pool.pool_name)
+        self._wipe_drained_secret(retired.cache)
+
+    def _next_retire_deadline(self):
+        with self._lock:
+            if not self._retired_pools:
+                return None
+            return self._retired_pools[0].expire_at
 
     def _cleanup_retired_pools(self, force=False):
+        """释放已排空或已过宽限期的退休连接池。
+
+        已排空的连接池已不持有任何连接，在堆中惰性删除，到达堆顶时再弹出。
+        """
         with self._lock:
-            retired_pools = self._retired_pools
             if force:
+                expired = self._retired_pools
                 self._retired_pools = []
             else:
                 now = time.time()
-                self._retired_pools = [
-                    item for item in retired_pools if item.pool is not None and item.expire_at > now
-                ]
+                expired = []
+                heap = self._retired_pools
+                while heap and (heap[0].drained or heap[0].expire_at <= now):
+                    expired.append(heapq.heappop(heap))
 
-        now = time.time()
-        for item in retired_pools:
+        for item in expired:
             if item.pool is None:
                 continue
-            if not force and item.expire_at > now:
-                continue
+            if not item.drained:
+                logging.info("grace period of retired pool %s expired with %d connections still borrowed",
+                             item.pool.pool_name, item.pool.outstanding)
             self._close_pool(item.pool)
 
     def _randomized_initial_delay(self):
@@ -363,20 +1413,48 @@ class DynamicSecretRotationDb:
             return 0.0
         return random.uniform(0.0, float(self.config.watch_freq))
 
-    def _close_pool(self, pool):
+    def _close_pool(self, pool, on_drained=None):
         if pool is None:
             return
         try:
-            pool._remove_connections()
-        except (mysql.connector.Error, AttributeError, RuntimeError):
+            if on_drained is None:
+                pool.close()
+            else:
+                pool.drain(on_drained=on_drained)
+        except (self.driver.Error, PoolError, AttributeError, RuntimeError):
             logging.debug("failed to eagerly close old pool", exc_info=True)
 
     def _is_authentication_error(self, exc):
-        errno = getattr(exc, "errno", None)
-        if errno in self.AUTH_ERROR_CODES:
-            return True
-        message = str(exc).lower()
-        return "access denied" in message or "authentication" in message
+        return self.driver.is_authentication_error(exc)
+
+    def _is_connection_lost(self, exc):
+        return self.driver.is_connection_lost(exc)
 
     def _is_pool_exhausted(self, exc):
+        if isinstance(exc, PoolExhaustedError):
+            return True
         return "pool exhausted" in str(exc).lower()
+
+
+def with_connection(db, readonly=False, rollback_on_error=True):
+    """装饰器：调用被装饰函数前借出连接并以关键字参数 conn 传入，返回后归还。
+
+    调用方显式传入 conn 时直接复用，便于在同一连接上嵌套调用。
+
+    @with_connection(db)
+    def load_user(user_id, conn=None):
+        ...
+
+    :param db: DynamicSecretRotationDb 实例
+    :type db: DynamicSecretRotationDb
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if kwargs.get("conn") is not None:
+                return func(*args, **kwargs)
+            with db.connection(readonly=readonly, rollback_on_error=rollback_on_error) as conn:
+                kwargs["conn"] = conn
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
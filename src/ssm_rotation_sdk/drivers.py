@@ -0,0 +1,303 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""数据库驱动后端：屏蔽建连参数、存活检查、会话重置与错误分类上的驱动差异。
+
+轮转核心（DynamicSecretRotationDb 的监听、刷新、退休、宽限期与退避）只通过 Driver 接口访问驱动。
+
+驱动模块在首次使用时才导入，未安装的驱动只有被选用时才会报错。
+"""
+
+import importlib
+import math
+import threading
+
+from ssm_rotation_sdk.concurrency import CONCURRENCY_GEVENT
+
+DRIVER_MYSQL_CONNECTOR = "mysql-connector"
+DRIVER_MYSQL_CONNECTOR_C = "mysql-connector-c"
+DRIVER_MYSQL_CONNECTOR_PURE = "mysql-connector-pure"
+DRIVER_PYMYSQL = "pymysql"
+DRIVER_MYSQLCLIENT = "mysqlclient"
+DRIVER_PSYCOPG = "psycopg"
+
+
+class Driver:
+    """驱动后端基类。
+
+    子类需设置 name、module_name，并实现 connect()；错误码从异常的 errno 或 args[0] 读取。
+    """
+
+    name = None
+    module_name = None
+    # 认证失败的错误码
+    AUTH_ERROR_CODES = frozenset()
+    # 连接断开（可在新连接上重试）的错误码
+    CONNECTION_LOST_CODES = frozenset()
+    # 只限制建连阶段（TCP 握手与认证）的超时参数名，None 表示驱动没有这样的参数
+    CONNECT_TIMEOUT_PARAM = None
+    # 网络 I/O 是否经由 Python socket 模块，从而能被 gevent / eventlet 的补丁替换为协作式
+    cooperative = False
+
+    def __init__(self):
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def module(self):
+        """驱动模块，首次访问时导入。
+
+        :raises ImportError: 驱动未安装
+        """
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self.module_name)
+        return self._module
+
+    @property
+    def Error(self):
+        """驱动的 DB-API 异常基类。"""
+        return self.module.Error
+
+    def supports_concurrency(self, concurrency):
+        """驱动能否用于该并发模式（concurrency.Concurrency）；C 扩展内的阻塞 I/O 会挂起整个协程事件循环。"""
+        return not concurrency.cooperative or self.cooperative
+
+    def connect_params(self, params):
+        """将通用建连参数（user、password、host、port、database 及额外参数）转换为驱动的关键字参数。"""
+        return dict(params)
+
+    def with_connect_timeout(self, params, timeout):
+        """为通用建连参数加上建连超时（秒，向上取整），已在额外参数中显式配置时保留原值。
+
+        只使用仅作用于建连阶段的驱动参数（CONNECT_TIMEOUT_PARAM），驱动没有这样的参数时原样返回。
+        """
+        key = self.CONNECT_TIMEOUT_PARAM
+        if key is None or key in params:
+            return params
+        params = dict(params)
+        params[key] = max(1, int(math.ceil(timeout)))
+        return params
+
+    def connect(self, params):
+        """使用通用建连参数建立物理连接。"""
+        return self.module.connect(**self.connect_params(params))
+
+    def ping(self, conn):
+        """检查连接存活，失败时抛出异常。"""
+        conn.ping()
+
+    def reset_session(self, conn):
+        """将连接归还连接池前重置会话；驱动不支持时回滚未提交的事务。"""
+        conn.rollback()
+
+    def in_transaction(self, conn):
+        """连接是否有未结束的事务，无法判断时返回 None。"""
+        return None
+
+    def error_code(self, exc):
+        code = getattr(exc, "errno", None)
+        if code is None and getattr(exc, "args", None):
+            code = exc.args[0]
+        return code if isinstance(code, int) else None
+
+    def is_authentication_error(self, exc):
+        if self.error_code(exc) in self.AUTH_ERROR_CODES:
+            return True
+        message = str(exc).lower()
+        return "access denied" in message or "authentication" in message
+
+    def is_connection_lost(self, exc):
+        return self.error_code(exc) in self.CONNECTION_LOST_CODES
+
+
+class _MySQLDriver(Driver):
+    # ER_DBACCESS_DENIED_ERROR / ER_ACCESS_DENIED_ERROR / ER_ACCESS_DENIED_NO_PASSWORD_ERROR
+    AUTH_ERROR_CODES = frozenset([1044, 1045, 1698])
+    # CR_CONN_HOST_ERROR / CR_SERVER_GONE_ERROR / CR_SERVER_LOST / CR_SERVER_LOST_EXTENDED
+    CONNECTION_LOST_CODES = frozenset([2003, 2006, 2013, 2055])
+
+
+class MySQLConnectorDriver(_MySQLDriver):
+    """mysql-connector-python。
+
+    connection_timeout 同时限制建连之后的每次读写，SDK 不设置；需要时在 param_str 中显式配置。
+
+    :param use_pure: True 使用纯 Python 协议实现，False 强制使用 C 扩展，None 使用驱动默认值
+    """
+
+    name = DRIVER_MYSQL_CONNECTOR
+    module_name = "mysql.connector"
+
+    def __init__(self, use_pure=None):
+        _MySQLDriver.__init__(self)
+        self.use_pure = use_pure
+
+    @property
+    def cooperative(self):
+        # 安装了 C 扩展时默认使用 C 扩展，只有强制纯 Python 实现才能协作式运行
+        return self.use_pure is True
+
+    def connect_params(self, params):
+        params = dict(params)
+        if self.use_pure is not None:
+            params["use_pure"] = self.use_pure
+        return params
+
+    def ping(self, conn):
+        conn.ping(reconnect=False)
+
+    def reset_session(self, conn):
+        conn.reset_session()
+
+    def in_transaction(self, conn):
+        return conn.in_transaction
+
+
+class PyMySQLDriver(_MySQLDriver):
+    """PyMySQL（纯 Python）。PyMySQL 不支持 COM_RESET_CONNECTION，会话重置仅回滚事务。"""
+
+    name = DRIVER_PYMYSQL
+    module_name = "pymysql"
+    CONNECT_TIMEOUT_PARAM = "connect_timeout"
+    cooperative = True
+
+    def connect_params(self, params):
+        params = dict(params)
+        if "port" in params:
+            params["port"] = int(params["port"])
+        return params
+
+    def ping(self, conn):
+        conn.ping(reconnect=False)
+
+    def in_transaction(self, conn):
+        # SERVER_STATUS_IN_TRANS
+        return bool(conn.server_status & 1)
+
+
+class MySQLClientDriver(_MySQLDriver):
+    """mysqlclient（MySQLdb，基于 libmysqlclient 的 C 扩展）。会话重置仅回滚事务。"""
+
+    name = DRIVER_MYSQLCLIENT
+    module_name = "MySQLdb"
+    CONNECT_TIMEOUT_PARAM = "connect_timeout"
+
+    def connect_params(self, params):
+        params = dict(params)
+        if "port" in params:
+            params["port"] = int(params["port"])
+        return params
+
+
+class PsycopgDriver(Driver):
+    """PostgreSQL，psycopg 3。
+
+    认证失败按 SQLSTATE 28P01（invalid_password）/ 28000（invalid_authorization_specification）分类；
+    建连阶段的认证失败没有 SQLSTATE，按错误信息（password authentication failed）识别。
+    """
+
+    name = DRIVER_PSYCOPG
+    module_name = "psycopg"
+    AUTH_ERROR_CODES = frozenset(["28P01", "28000"])
+    # 08xxx connection_exception，57P01~57P03 服务端关闭或不可用
+    CONNECTION_LOST_CODES = frozenset(["57P01", "57P02", "57P03"])
+    CONNECTION_LOST_MESSAGES = ("server closed the connection", "connection is closed", "connection is lost")
+    # libpq 的 connect_timeout，小于 2 秒时按 2 秒处理
+    CONNECT_TIMEOUT_PARAM = "connect_timeout"
+
+    def supports_concurrency(self, concurrency):
+        # psycopg 检测到 gevent 的补丁后改用 select 等待 libpq，不支持 eventlet
+        return not concurrency.cooperative or concurrency.name == CONCURRENCY_GEVENT
+
+    def connect_params(self, params):
+        params = dict(params)
+        if "database" in params:
+            params["dbname"] = params.pop("database")
+        if "port" in params:
+            params["port"] = int(params["port"])
+        return params
+
+    def ping(self, conn):
+        idle = conn.info.transaction_status == self.module.pq.TransactionStatus.IDLE
+        conn.execute("SELECT 1")
+        if idle and not conn.autocommit:
+            conn.rollback()
+
+    def reset_session(self, conn):
+        # DISCARD ALL 不能在事务块中执行：先回滚，再临时切换为自动提交
+        conn.rollback()
+        autocommit = conn.autocommit
+        conn.autocommit = True
+        try:
+            conn.execute("DISCARD ALL")
+        finally:
+            conn.autocommit = autocommit
+
+    def in_transaction(self, conn):
+        return conn.info.transaction_status != self.module.pq.TransactionStatus.IDLE
+
+    def error_code(self, exc):
+        return getattr(exc, "sqlstate", None)
+
+    def is_connection_lost(self, exc):
+        code = self.error_code(exc)
+        if code is not None:
+            return code.startswith("08") or code in self.CONNECTION_LOST_CODES
+        message = str(exc).lower()
+        return any(text in message for text in self.CONNECTION_LOST_MESSAGES)
+
+
+_FACTORIES = {
+    DRIVER_MYSQL_CONNECTOR: MySQLConnectorDriver,
+    DRIVER_MYSQL_CONNECTOR_C: lambda: MySQLConnectorDriver(use_pure=False),
+    DRIVER_MYSQL_CONNECTOR_PURE: lambda: MySQLConnectorDriver(use_pure=True),
+    DRIVER_PYMYSQL: PyMySQLDriver,
+    DRIVER_MYSQLCLIENT: MySQLClientDriver,
+    DRIVER_PSYCOPG: PsycopgDriver,
+}
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def register_driver(name, factory):
+    """注册自定义驱动后端，factory 为返回 Driver 实例的无参可调用对象。"""
+    with _instances_lock:
+        _FACTORIES[name] = factory
+        _instances.pop(name, None)
+
+
+def driver_names():
+    with _instances_lock:
+        return sorted(_FACTORIES)
+
+
+def get_driver(driver):
+    """按名称返回共享的驱动实例；传入 Driver 实例时原样返回。
+
+    :raises ValueError: 未知的驱动名称
+    """
+    if isinstance(driver, Driver):
+        return driver
+    with _instances_lock:
+        instance = _instances.get(driver)
+        if instance is None:
+            factory = _FACTORIES.get(driver)
+            if factory is None:
+                raise ValueError("unsupported driver: %s" % driver)
+            instance = _instances[driver] = factory()
+        return instance
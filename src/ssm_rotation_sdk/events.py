@@ -0,0 +1,133 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""轮转事件：凭据变更、新连接池就绪、旧连接池排空的订阅与派发。"""
+
+import logging
+import threading
+import time
+from queue import Full
+
+from ssm_rotation_sdk.worker import BackgroundWorker
+
+# 凭据内容发生变化（用户名或密码轮转）
+EVENT_CREDENTIAL_CHANGED = "credential_changed"
+# 新连接池已建立并切换为当前连接池
+EVENT_POOL_READY = "pool_ready"
+# 退休连接池的连接已全部归还并断开
+EVENT_POOL_DRAINED = "pool_drained"
+
+EVENT_TYPES = frozenset([EVENT_CREDENTIAL_CHANGED, EVENT_POOL_READY, EVENT_POOL_DRAINED])
+
+
+class RotationEvent:
+    """一次轮转事件。
+
+    :param type: 事件类型，EVENT_* 常量之一
+    :param secret_name: 凭据名称
+    :param version_id: SSM 返回的凭据版本
+    :param generation: 本地凭据代数，每次切换连接池加一；凭据缓存事件为 None
+    :param user_name: 当前用户名（凭据缓存事件为 None）
+    :param previous_user_name: 轮转前的用户名，仅 EVENT_CREDENTIAL_CHANGED
+    :param pool_name: 相关连接池名称，仅连接池事件
+    """
+
+    __slots__ = ("type", "secret_name", "version_id", "generation", "user_name",
+                 "previous_user_name", "pool_name", "timestamp")
+
+    def __init__(self, type, secret_name=None, version_id=None, generation=None, user_name=None,
+                 previous_user_name=None, pool_name=None):
+        self.type = type
+        self.secret_name = secret_name
+        self.version_id = version_id
+        self.generation = generation
+        self.user_name = user_name
+        self.previous_user_name = previous_user_name
+        self.pool_name = pool_name
+        self.timestamp = time.time()
+
+    def __repr__(self):
+        return "RotationEvent(type=%r, secret_name=%r, version_id=%r, generation=%r, pool_name=%r)" % (
+            self.type, self.secret_name, self.version_id, self.generation, self.pool_name)
+
+
+class EventDispatcher:
+    """在独立守护线程中按顺序调用监听器。
+
+    排队事件数超过 max_pending 时丢弃新事件并记录告警，慢监听器不会阻塞 Watcher 或建池线程；
+    监听器抛出的异常会被记录并忽略。
+
+    :param name: 派发线程名称
+    :param max_pending: 排队事件数上限
+    """
+
+    def __init__(self, name, max_pending=100):
+        self.name = name
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._worker = None
+
+    def subscribe(self, listener, events=None):
+        """注册监听器，返回 listener 本身以便用作装饰器。
+
+        :param listener: 接收 RotationEvent 的可调用对象
+        :param events: 关注的事件类型集合，None 表示全部
+        """
+        events = frozenset(events) if events is not None else EVENT_TYPES
+        unknown = events - EVENT_TYPES
+        if unknown:
+            raise ValueError("unknown event types: %s" % ", ".join(sorted(unknown)))
+        with self._lock:
+            self._listeners.append((listener, events))
+        return listener
+
+    def unsubscribe(self, listener):
+        """移除监听器的全部注册，未注册时无副作用。"""
+        with self._lock:
+            self._listeners = [item for item in self._listeners if item[0] is not listener]
+
+    def emit(self, event):
+        with self._lock:
+            listeners = [listener for listener, events in self._listeners if event.type in events]
+            if not listeners:
+                return
+            if self._worker is None:
+                self._worker = BackgroundWorker(self.name, max_pending=self.max_pending)
+            worker = self._worker
+        try:
+            worker.submit(self._deliver, event, listeners)
+        except (Full, RuntimeError):
+            with self._lock:
+                self.dropped += 1
+            logging.warning("rotation event %s dropped: listeners are too slow", event.type)
+
+    def close(self):
+        """停止派发线程，尚未派发的事件会被丢弃。"""
+        with self._lock:
+            worker = self._worker
+            self._worker = None
+        if worker is not None:
+            worker.shutdown()
+
+    @staticmethod
+    def _deliver(event, listeners):
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception:
+                logging.exception("rotation event listener %r failed", listener)
@@ -0,0 +1,1227 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""SDK 自有连接池：可配置的借出校验、会话重置与连接回收策略。"""
+
+import collections
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+import traceback
+import weakref
+
+from ssm_rotation_sdk.concurrency import get_concurrency
+
+
+# RESET_TRACKED 下视为修改会话状态的语句：会话变量、切换库、临时表、锁、预处理语句、存储过程等
+_SESSION_STATEMENT = re.compile(
+    r"^\s*(?:/\*.*?\*/\s*)*(?:SET|USE|CREATE\s+TEMPORARY|DROP\s+TEMPORARY|LOCK|UNLOCK|PREPARE|EXECUTE|"
+    r"DEALLOCATE|DECLARE|LISTEN|UNLISTEN|RESET|DISCARD|CALL|HANDLER)\b",
+    re.IGNORECASE | re.DOTALL)
+# 语句中出现用户变量、命名锁、set_config() 或多语句时同样视为修改会话状态
+_SESSION_FRAGMENT = re.compile(r"@\w|:=|GET_LOCK\s*\(|pg_advisory_lock|set_config\s*\(|;\s*\S", re.IGNORECASE)
+
+
+def _changes_session(operation):
+    """判断语句是否可能修改会话状态；无法判断时返回 True。"""
+    if isinstance(operation, (bytes, bytearray)):
+        operation = bytes(operation).decode("latin-1")
+    if not isinstance(operation, str):
+        return True
+    return bool(_SESSION_STATEMENT.match(operation) or _SESSION_FRAGMENT.search(operation))
+
+
+class PoolError(Exception):
+    """连接池错误。"""
+
+
+class PoolExhaustedError(PoolError):
+    """连接池中的连接已全部借出。"""
+
+
+class BudgetExhaustedError(PoolExhaustedError):
+    """物理连接数已达到连接预算上限。"""
+
+
+class ConnectionBudget:
+    """物理连接数预算，限制一组连接池（当前池 + 退休池）同时持有的连接总数。
+
+    预算可以嵌套：实例预算的 parent 为进程级预算，建连时需同时获得两级名额。
+
+    :param limit: 连接数上限，None 表示不限制（仅统计）
+    :param parent: 上一级预算
+    :param name: 预算名称，用于日志
+    """
+
+    _process_budget = None
+    _process_users = 0
+    _process_lock = threading.Lock()
+
+    def __init__(self, limit=None, parent=None, name=None):
+        self.limit = limit
+        self.parent = parent
+        self.name = name
+        self._lock = threading.Lock()
+        self._pools = weakref.WeakSet()
+        self._in_use = 0
+        self._peak = 0
+        self._denied = 0
+        self._reclaimed = 0
+
+    @classmethod
+    def process(cls, limit):
+        """返回进程内共享的预算并登记一个使用方；上限由第一次调用确定，之后不会被其他实例修改。
+
+        使用方不再需要时调用 release_process()，最后一个使用方释放后，下一次调用可以重新确定上限。
+
+        :raises ValueError: limit 与已创建的进程级预算上限不一致
+        """
+        with cls._process_lock:
+            budget = cls._process_budget
+            if budget is None:
+                budget = cls._process_budget = cls(limit, name="process")
+            elif budget.limit != limit:
+                raise ValueError("process connection budget is already %s, got %s" % (budget.limit, limit))
+            cls._process_users += 1
+            return budget
+
+    @classmethod
+    def release_process(cls, budget):
+        """释放 process() 登记的一个使用方；最后一个使用方释放后丢弃进程级预算。"""
+        with cls._process_lock:
+            if budget is not cls._process_budget:
+                return
+            cls._process_users -= 1
+            if cls._process_users <= 0:
+                cls._process_budget = None
+                cls._process_users = 0
+
+    @classmethod
+    def reset_process(cls):
+        """丢弃进程级预算，不论是否仍有使用方；用于测试或进程内重新配置上限。
+
+        已取得旧预算的实例继续按旧预算计数，之后的 process() 调用创建新的预算。
+        """
+        with cls._process_lock:
+            cls._process_budget = None
+            cls._process_users = 0
+
+    def try_acquire(self):
+        """尝试占用一个连接名额，成功返回 True。"""
+        with self._lock:
+            if self.limit is not None and self._in_use >= self.limit:
+                self._denied += 1
+                return False
+            self._in_use += 1
+            if self._in_use > self._peak:
+                self._peak = self._in_use
+        if self.parent is not None and not self.parent.try_acquire():
+            with self._lock:
+                self._in_use -= 1
+                self._denied += 1
+            return False
+        return True
+
+    def release(self):
+        with self._lock:
+            self._in_use -= 1
+        if self.parent is not None:
+            self.parent.release()
+
+    def register(self, pool):
+        with self._lock:
+            self._pools.add(pool)
+        if self.parent is not None:
+            self.parent.register(pool)
+
+    def reclaim(self, requester, count=1):
+        """预算紧张时关闭其他连接池中最多 count 个空闲连接，返回实际释放数量。
+
+        空闲连接最多的连接池优先收缩；已退休的连接池不持有空闲连接，不受影响。
+        """
+        with self._lock:
+            pools = [pool for pool in self._pools if pool is not requester]
+        pools.sort(key=lambda pool: pool.idle_count, reverse=True)
+        freed = 0
+        for pool in pools:
+            if freed >= count:
+                break
+            freed += pool.shrink(count - freed)
+        with self._lock:
+            self._reclaimed += freed
+        if freed < count and self.parent is not None:
+            freed += self.parent.reclaim(requester, count - freed)
+        return freed
+
+    def stats(self):
+        """返回预算使用情况：上限、占用、峰值、拒绝次数与回收的空闲连接数。"""
+        with self._lock:
+            stats = {
+                "name": self.name,
+                "limit": self.limit,
+                "in_use": self._in_use,
+                "peak": self._peak,
+                "denied": self._denied,
+                "reclaimed": self._reclaimed,
+            }
+        if self.parent is not None:
+            stats["parent"] = self.parent.stats()
+        return stats
+
+
+class _PoolEntry:
+    """连接池中的一条物理连接记录。"""
+
+    __slots__ = ("conn", "created_at", "jitter", "last_used", "last_checked", "dirty",
+                 "borrowed_at", "borrow_stack", "leak_reported", "pinned")
+
+    def __init__(self, conn, now, jitter=0.0):
+        self.conn = conn
+        self.created_at = now
+        # 每条连接独立的抖动比例，使同一批连接的过期时间错开
+        self.jitter = jitter
+        # 最近一次归还时间，用于判断空闲时长
+        self.last_used = now
+        # 最近一次确认连接存活的时间（建立、ping 成功）
+        self.last_checked = now
+        # 借用者是否可能修改过会话状态（RESET_DIRTY / RESET_TRACKED）
+        self.dirty = False
+        # 当前借出的开始时间与调用栈（仅开启泄漏检测时记录）
+        self.borrowed_at = None
+        self.borrow_stack = None
+        self.leak_reported = False
+        # 是否由某个线程保留（thread_affinity），保留期间计入借出数
+        self.pinned = False
+
+
+class PooledConnection:
+    """连接池借出的连接。
+
+    行为与底层驱动连接一致，close() 将连接归还到连接池而非断开 TCP 连接。
+    与 DB-API threadsafety=1 一致，连接本身不是线程安全的，同一时刻只应由一个线程使用。
+    """
+
+    # 仅访问这些属性不会改变会话状态，归还时可按 RESET_DIRTY 策略跳过会话重置
+    CLEAN_ATTRIBUTES = frozenset([
+        "ping",
+        "is_connected",
+        "get_server_info",
+        "get_server_version",
+        "server_host",
+        "server_port",
+    ])
+
+    # RESET_TRACKED 下只结束事务、不改变会话状态的方法
+    TRANSACTION_ATTRIBUTES = frozenset(["commit", "rollback"])
+
+    __slots__ = ("_pool", "_entry")
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def cursor(self, *args, **kwargs):
+        """创建游标；RESET_TRACKED 下返回记录会话修改语句的游标代理。"""
+        entry = self._entry
+        if entry is None:
+            raise PoolError("connection has already been returned to the pool")
+        cursor = entry.conn.cursor(*args, **kwargs)
+        if self._pool.reset_session == ConnectionPool.RESET_TRACKED:
+            return _TrackedCursor(cursor, entry)
+        entry.dirty = True
+        return cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getattr__(self, attr):
+        try:
+            entry = object.__getattribute__(self, "_entry")
+        except AttributeError:
+            entry = None
+        if entry is None:
+            raise PoolError("connection has already been returned to the pool")
+        if attr not in self.CLEAN_ATTRIBUTES:
+            if (attr == "execute" and self._pool.reset_session == ConnectionPool.RESET_TRACKED
+                    and hasattr(entry.conn, "execute")):
+                # psycopg 的 Connection.execute() 快捷方式
+                return _TrackedCursor(entry.conn, entry).execute
+            if not (attr in self.TRANSACTION_ATTRIBUTES
+                    and self._pool.reset_session == ConnectionPool.RESET_TRACKED):
+                entry.dirty = True
+        return getattr(entry.conn, attr)
+
+    def __setattr__(self, attr, value):
+        if attr in PooledConnection.__slots__:
+            object.__setattr__(self, attr, value)
+            return
+        entry = self._entry
+        if entry is None:
+            raise PoolError("connection has already been returned to the pool")
+        # 如 autocommit、time_zone 等属性会修改会话状态，归还时需要重置
+        entry.dirty = True
+        setattr(entry.conn, attr, value)
+
+    @property
+    def pool_name(self):
+        return self._pool.pool_name
+
+    def close(self):
+        """归还连接到连接池，重复调用无副作用。"""
+        entry = self._entry
+        if entry is None:
+            return
+        self._entry = None
+        self._pool._release(entry)
+
+    def invalidate(self):
+        """标记连接已失效：断开物理连接而不放回连接池。"""
+        entry = self._entry
+        if entry is None:
+            return
+        self._entry = None
+        self._pool._release(entry, discard=True)
+
+
+class _TrackedCursor:
+    """RESET_TRACKED 下的游标代理：执行可能修改会话状态的语句时标记连接需要重置。"""
+
+    __slots__ = ("_cursor", "_entry")
+
+    def __init__(self, cursor, entry):
+        self._cursor = cursor
+        self._entry = entry
+
+    def __getattr__(self, attr):
+        return getattr(self._cursor, attr)
+
+    def __setattr__(self, attr, value):
+        if attr in _TrackedCursor.__slots__:
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self._cursor, attr, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._cursor.close()
+
+    def execute(self, operation, *args, **kwargs):
+        if _changes_session(operation):
+            self._entry.dirty = True
+        return self._cursor.execute(operation, *args, **kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        if _changes_session(operation):
+            self._entry.dirty = True
+        return self._cursor.executemany(operation, *args, **kwargs)
+
+    def callproc(self, *args, **kwargs):
+        self._entry.dirty = True
+        return self._cursor.callproc(*args, **kwargs)
+
+
+class ConnectionPool:
+    """线程安全的连接池。
+
+    :param connect: 无参可调用对象，返回一个新的驱动连接
+    :param pool_size: 最大物理连接数
+    :param pool_name: 连接池名称
+    :param validation: 借出校验策略，见 VALIDATE_*
+    :param validation_idle_ms: VALIDATE_IDLE 策略下，空闲超过该时长（毫秒）的连接在借出前先 ping
+    :param reset_session: 归还时的会话重置策略，见 RESET_*
+    :param max_lifetime: 物理连接最长存活时间（秒），None 表示不限制
+    :param idle_timeout: 空闲连接超时时间（秒），None 表示不限制
+    :param lifetime_jitter: 过期时间的随机提前比例（0~1），避免连接同时过期
+    :param min_idle: 回收后保持的最少连接数，默认与 pool_size 相同
+    :param leak_detection_threshold: 连接借出超过该时长（秒）视为疑似泄漏，None 表示关闭检测
+    :param connect_concurrency: 补足连接池时并行建连的最大线程数
+    :param budget: 物理连接数预算（ConnectionBudget），预算不足时停止补足连接池，借出时抛出 BudgetExhaustedError
+    :param driver: 驱动后端（drivers.Driver），用于存活检查与会话重置；None 时直接调用连接的
+        ping() 与 reset_session()
+    :param session_init: 每条物理连接建立后（及会话重置后）执行的 SQL 列表，或接收驱动连接的可调用对象
+    :param thread_affinity: 归还的连接由归还线程保留，该线程下次借出时不经过共享空闲队列和连接池锁
+    :param affinity_idle_timeout: 线程保留的连接空闲超过该时长（秒）后由 recycle() 放回共享空闲队列
+    :param borrow_timeout: 连接全部借出时最多等待该时长（秒）直到有连接归还，按先来先得唤醒等待者；
+        None 表示立即抛出 PoolExhaustedError。等待使用当前并发模式的原语，gevent / eventlet 下只挂起协程
+    """
+
+    # 每次借出前都 ping
+    VALIDATE_ALWAYS = "always"
+    # 仅空闲超过 validation_idle_ms 的连接在借出前 ping
+    VALIDATE_IDLE = "idle"
+    # 借出前不校验
+    VALIDATE_NONE = "none"
+    VALIDATION_POLICIES = (VALIDATE_ALWAYS, VALIDATE_IDLE, VALIDATE_NONE)
+
+    # 每次归还都重置会话（COM_RESET_CONNECTION）
+    RESET_ALWAYS = "always"
+    # 仅借用者使用过连接时才重置，未使用的连接直接放回
+    RESET_DIRTY = "dirty"
+    # 从不重置，由调用方保证归还时会话干净
+    RESET_NEVER = "never"
+    # 跟踪借用者执行的语句：仅执行过 SET/USE 等修改会话状态的语句时重置，
+    # 否则只回滚未结束的事务；session_init 设置的会话状态得以保留
+    RESET_TRACKED = "tracked"
+    RESET_POLICIES = (RESET_ALWAYS, RESET_DIRTY, RESET_NEVER, RESET_TRACKED)
+
+    def __init__(self, connect, pool_size=5, pool_name=None,
+                 validation=VALIDATE_IDLE, validation_idle_ms=1000,
+                 reset_session=RESET_ALWAYS, max_lifetime=None, idle_timeout=None,
+                 lifetime_jitter=0.0, min_idle=None, leak_detection_threshold=None,
+                 connect_concurrency=1, budget=None, driver=None, session_init=None,
+                 thread_affinity=False, affinity_idle_timeout=30.0, borrow_timeout=None):
+        if pool_size <= 0:
+            raise ValueError("pool_size must be greater than 0")
+        if min_idle is None:
+            min_idle = pool_size
+        if min_idle < 0 or min_idle > pool_size:
+            raise ValueError("min_idle must be between 0 and pool_size")
+        if not 0.0 <= lifetime_jitter < 1.0:
+            raise ValueError("lifetime_jitter must be in [0, 1)")
+        if connect_concurrency <= 0:
+            raise ValueError("connect_concurrency must be greater than 0")
+        if validation not in self.VALIDATION_POLICIES:
+            raise ValueError("unsupported validation policy: %s" % validation)
+        if reset_session not in self.RESET_POLICIES:
+            raise ValueError("unsupported reset_session policy: %s" % reset_session)
+        if borrow_timeout is not None and borrow_timeout < 0:
+            raise ValueError("borrow_timeout must be greater than or equal to 0")
+        if session_init is not None and not callable(session_init):
+            if isinstance(session_init, str) or not all(isinstance(sql, str) for sql in session_init):
+                raise ValueError("session_init must be a list of SQL statements or a callable")
+            session_init = tuple(session_init)
+        self.pool_name = pool_name
+        self.pool_size = pool_size
+        self.validation = validation
+        self.validation_idle = validation_idle_ms / 1000.0
+        self.reset_session = reset_session
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.lifetime_jitter = lifetime_jitter
+        self.min_idle = min_idle
+        self.leak_detection_threshold = leak_detection_threshold
+        self.connect_concurrency = connect_concurrency
+        self.budget = budget
+        self.driver = driver
+        self.session_init = session_init
+        self.thread_affinity = thread_affinity
+        self.affinity_idle_timeout = affinity_idle_timeout
+        self.borrow_timeout = borrow_timeout
+        self.closed = False
+        self._connect = connect
+        self._concurrency = get_concurrency()
+        self._lock = threading.Lock()
+        # 后进先出：热连接保持活跃，冷连接集中在左端便于后台校验
+        self._idle = collections.deque()
+        # 已建立的物理连接数（空闲 + 借出 + 校验中）
+        self._size = 0
+        self._borrowed = 0
+        # 进行中的建连数：连接池关闭后仍可能有已通过关闭检查的建连在使用凭据
+        self._opening = 0
+        self._in_use = set()
+        # 线程标识 -> 该线程保留的连接；只通过 dict 的原子操作（pop/setdefault/popitem）访问，不持有 _lock
+        self._sticky = {}
+        # 开启泄漏检测时，从线程保留中再次借出的连接；同样只通过 set 的原子操作（add/discard/copy）访问
+        self._sticky_borrowed = set()
+        # 等待归还连接的借出方（Event），先进先出
+        self._waiters = collections.deque()
+        # 排空完成（关闭后借出连接全部归还）时的回调
+        self._on_drained = None
+        if budget is not None:
+            budget.register(self)
+        # 持有时长统计
+        self._returns = 0
+        self._hold_time_total = 0.0
+        self._hold_time_max = 0.0
+
+    @property
+    def outstanding(self):
+        """当前借出未归还的连接数。"""
+        with self._lock:
+            return self._borrowed
+
+    @property
+    def idle_count(self):
+        with self._lock:
+            return len(self._idle)
+
+    @property
+    def drained(self):
+        """连接池已关闭，且没有借出中的连接和进行中的建连。"""
+        with self._lock:
+            return self.closed and not self._borrowed and not self._opening
+
+    def stats(self):
+        """返回连接池状态与连接持有时长统计（秒）。
+
+        thread_affinity 下从线程保留中再次借出的连接不获取连接池锁，不计入持有时长统计。
+        """
+        with self._lock:
+            returns = self._returns
+            return {
+                "pool_name": self.pool_name,
+                "pool_size": self.pool_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "outstanding": self._borrowed,
+                "sticky": len(self._sticky),
+                "returns": returns,
+                "hold_time_avg": self._hold_time_total / returns if returns else 0.0,
+                "hold_time_max": self._hold_time_max,
+            }
+
+    def fill(self, deadline=None):
+        """建立物理连接直到达到 min_idle，建连失败时抛出驱动异常。
+
+        最多由 connect_concurrency 个线程并行建连，一批连接的就绪时间接近单次握手耗时。
+
+        :param deadline: 截止时间戳，超时未建完时抛出 PoolError
+
+        连接预算不足时提前停止（不抛出异常），剩余连接在预算释放后由后续 fill() 或借出时补建。
+        """
+        with self._lock:
+            if self.closed:
+                return
+            missing = self.min_idle - self._size
+            if missing <= 0:
+                return
+            # 预先占用名额，避免并发的借出方同时新建连接超出 pool_size
+            self._size += missing
+        state = {"remaining": missing, "errors": [], "throttled": False}
+
+        def open_connections():
+            while True:
+                with self._lock:
+                    if self.closed or state["remaining"] == 0 or state["errors"] or state["throttled"]:
+                        return
+                    if deadline is not None and time.time() >= deadline:
+                        state["errors"].append(PoolError("timed out filling pool %s" % self.pool_name))
+                        return
+                    state["remaining"] -= 1
+                try:
+                    entry = self._open()
+                except BudgetExhaustedError:
+                    with self._lock:
+                        self._size -= 1
+                        self._notify_waiters()
+                        state["throttled"] = True
+                    return
+                except Exception as exc:
+                    with self._lock:
+                        self._size -= 1
+                        self._notify_waiters()
+                        state["errors"].append(exc)
+                    return
+                self._put_idle(entry)
+
+        helpers = [
+            threading.Thread(target=open_connections, name="SSMPoolFiller", daemon=True)
+            for _ in range(min(self.connect_concurrency, missing) - 1)
+        ]
+        for thread in helpers:
+            thread.start()
+        open_connections()
+        for thread in helpers:
+            thread.join()
+
+        with self._lock:
+            # 归还因失败、超时或关闭而未使用的名额
+            self._size -= state["remaining"]
+            self._notify_waiters(state["remaining"])
+        if state["throttled"]:
+            logging.debug("filling pool %s throttled by connection budget", self.pool_name)
+        if state["errors"]:
+            raise state["errors"][0]
+
+    def get_connection(self, create=True):
+        """借出一个连接。
+
+        :param create: 没有空闲连接时是否新建连接；为 False 时只复用空闲或其他线程保留的连接，也不等待
+        :raises PoolExhaustedError: 连接已全部借出，且在 borrow_timeout 内没有连接归还
+        :raises PoolError: 连接池已关闭
+        """
+        if self.thread_affinity:
+            conn = self._borrow_sticky()
+            if conn is not None:
+                return conn
+        deadline = None
+        while True:
+            waiter = None
+            with self._lock:
+                if self.closed:
+                    raise PoolError("pool is closed")
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._borrowed += 1
+                elif create and self._size < self.pool_size:
+                    entry = None
+                    self._size += 1
+                    self._borrowed += 1
+                else:
+                    # 接管其他线程保留的连接，保留期间已计入借出数
+                    entry = self._steal_sticky()
+                    if entry is None:
+                        if not create or self.borrow_timeout is None:
+                            raise PoolExhaustedError("Failed getting connection; pool exhausted")
+                        if deadline is None:
+                            deadline = time.time() + self.borrow_timeout
+                        if time.time() >= deadline:
+                            raise PoolExhaustedError("Failed getting connection; pool exhausted")
+                        waiter = self._concurrency.Event()
+                        self._waiters.append(waiter)
+
+            if waiter is not None:
+                self._await(waiter, deadline)
+                continue
+            if entry is None:
+                try:
+                    entry = self._open()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._borrowed -= 1
+                        self._notify_waiters()
+                    raise
+                return self._checkout(entry)
+
+            if self._is_expired(entry, time.time()):
+                self._discard(entry, borrowed=True)
+                continue
+            if self._needs_validation(entry) and not self._is_alive(entry):
+                # 失效连接直接丢弃，下一轮循环会复用其他空闲连接或新建连接
+                self._discard(entry, borrowed=True)
+                continue
+            return self._checkout(entry)
+
+    def _borrow_sticky(self):
+        entry = self._sticky.pop(threading.get_ident(), None)
+        if entry is None:
+            return None
+        if self.closed or self._is_expired(entry, time.time()) or (
+                self._needs_validation(entry) and not self._is_alive(entry)):
+            entry.pinned = False
+            self._discard(entry, borrowed=True)
+            return None
+        # 线程保留的连接不登记到 _in_use，借出与归还都不获取连接池锁
+        entry.borrowed_at = time.time()
+        if self.leak_detection_threshold is not None:
+            entry.leak_reported = False
+            entry.borrow_stack = traceback.format_stack()[:-2]
+            self._sticky_borrowed.add(entry)
+        return PooledConnection(self, entry)
+
+    def _steal_sticky(self):
+        try:
+            _, entry = self._sticky.popitem()
+        except KeyError:
+            return None
+        entry.pinned = False
+        return entry
+
+    def _park(self, entry):
+        """将归还的连接保留给当前线程，当前线程已保留其他连接或连接池已关闭时返回 False。"""
+        ident = threading.get_ident()
+        entry.pinned = True
+        if self.closed or self._sticky.setdefault(ident, entry) is not entry:
+            entry.pinned = False
+            return False
+        if self.closed and self._sticky.pop(ident, None) is entry:
+            # close() 已清理过保留连接，由调用方按已关闭处理
+            entry.pinned = False
+            return False
+        if self._waiters and self._sticky.pop(ident, None) is entry:
+            # 有借出方在等待：放回共享空闲队列并唤醒等待者。等待者登记后会再检查一次保留连接，不会错过
+            entry.pinned = False
+            return False
+        return True
+
+    def release_sticky(self, max_idle=None):
+        """将线程保留超过 max_idle 秒（默认 affinity_idle_timeout）的连接放回共享空闲队列，返回数量。"""
+        if max_idle is None:
+            max_idle = self.affinity_idle_timeout
+        now = time.time()
+        released = 0
+        # dict.copy() 在自由线程版 CPython 中对并发写入是原子的，直接迭代 items() 可能抛出 RuntimeError
+        for ident, entry in self._sticky.copy().items():
+            if now - entry.last_used < max_idle or self._sticky.get(ident) is not entry:
+                continue
+            entry = self._sticky.pop(ident, None)
+            if entry is None:
+                continue
+            entry.pinned = False
+            released += 1
+            with self._lock:
+                self._borrowed -= 1
+                self._notify_waiters()
+                if not self.closed:
+                    self._idle.appendleft(entry)
+                    continue
+                self._size -= 1
+            self._close_conn(entry)
+            self._check_drained()
+        return released
+
+    def detect_leaks(self):
+        """记录借出时长超过 leak_detection_threshold 的连接及其借出调用栈，返回新发现的数量。
+
+        每次借出只报告一次，连接最终归还时再记录一条日志。从线程保留中再次借出的连接同样会被检测。
+        """
+        if self.leak_detection_threshold is None:
+            return 0
+        now = time.time()
+        with self._lock:
+            leaked = [
+                entry for entry in itertools.chain(self._in_use, self._sticky_borrowed.copy())
+                if not entry.leak_reported and now - entry.borrowed_at >= self.leak_detection_threshold
+            ]
+            for entry in leaked:
+                entry.leak_reported = True
+        for entry in leaked:
+            logging.warning(
+                "possible connection leak in pool %s: held for %.1fs, borrowed at:\n%s",
+                self.pool_name, now - entry.borrowed_at, "".join(entry.borrow_stack or []),
+            )
+        return len(leaked)
+
+    def validate_idle(self):
+        """校验空闲较久的连接并移除已失效的连接，返回移除数量。
+
+        供后台线程周期性调用，使请求线程尽量借不到已断开的连接。
+        """
+        now = time.time()
+        with self._lock:
+            if self.closed:
+                return 0
+            candidates = [
+                entry for entry in self._idle
+                if now - max(entry.last_used, entry.last_checked) >= self.validation_idle
+            ]
+            for entry in candidates:
+                self._idle.remove(entry)
+
+        removed = 0
+        for entry in candidates:
+            if self._is_alive(entry):
+                with self._lock:
+                    self._notify_waiters()
+                    if not self.closed:
+                        self._idle.appendleft(entry)
+                        continue
+                    self._size -= 1
+                self._close_conn(entry)
+            else:
+                removed += 1
+                self._discard(entry, borrowed=False)
+
+        if removed:
+            logging.info("removed %d broken idle connections from pool %s", removed, self.pool_name)
+            try:
+                self.fill()
+            except Exception as exc:
+                logging.warning("failed to replenish pool %s: %s", self.pool_name, str(exc))
+        return removed
+
+    def recycle(self):
+        """回收超过最长存活时间或空闲超时的空闲连接，并补足到 min_idle。返回回收数量。
+
+        每条连接的过期时间带有独立抖动，周期性调用时连接会逐步轮换，而不是同时断开重连。
+        """
+        if self._sticky:
+            self.release_sticky()
+        if self.max_lifetime is None and self.idle_timeout is None:
+            return 0
+        now = time.time()
+        with self._lock:
+            if self.closed:
+                return 0
+            expired = [entry for entry in self._idle if self._is_expired(entry, now)]
+            for entry in expired:
+                self._idle.remove(entry)
+        for entry in expired:
+            self._discard(entry, borrowed=False)
+
+        if expired:
+            logging.debug("recycled %d connections from pool %s", len(expired), self.pool_name)
+        try:
+            self.fill()
+        except Exception as exc:
+            logging.warning("failed to replenish pool %s: %s", self.pool_name, str(exc))
+        return len(expired)
+
+    def shrink(self, count):
+        """断开最多 count 个空闲时间最长的空闲连接，返回断开数量。"""
+        with self._lock:
+            victims = []
+            while self._idle and len(victims) < count:
+                victims.append(self._idle.popleft())
+            self._size -= len(victims)
+            self._notify_waiters(len(victims))
+        for entry in victims:
+            self._close_conn(entry)
+        return len(victims)
+
+    def close(self):
+        """关闭连接池：立即断开空闲连接与线程保留的连接，借出中的连接在归还时断开。返回断开的连接数。"""
+        with self._lock:
+            self.closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            # 等待者被唤醒后得到 PoolError
+            self._notify_waiters(len(self._waiters))
+        for entry in idle:
+            self._close_conn(entry)
+        sticky = 0
+        while True:
+            entry = self._steal_sticky()
+            if entry is None:
+                break
+            sticky += 1
+            self._discard(entry, borrowed=True)
+        return len(idle) + sticky
+
+    def _await(self, waiter, deadline):
+        """等待连接归还，超时抛出 PoolExhaustedError；被唤醒后由调用方重新借出。"""
+        if waiter.wait(max(0.0, deadline - time.time())):
+            return
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                # 超时的同时被唤醒：按唤醒处理，避免这次通知丢失
+                return
+        raise PoolExhaustedError("Failed getting connection; pool exhausted")
+
+    def _notify_waiters(self, count=1):
+        """唤醒最早登记的 count 个等待者，调用方需持有 _lock。"""
+        while count > 0 and self._waiters:
+            self._waiters.popleft().set()
+            count -= 1
+
+    def _checkout(self, entry):
+        entry.borrowed_at = time.time()
+        entry.leak_reported = False
+        if self.leak_detection_threshold is not None:
+            # 去掉连接池内部的两层栈帧，只保留调用方
+            entry.borrow_stack = traceback.format_stack()[:-2]
+        with self._lock:
+            self._in_use.add(entry)
+        return PooledConnection(self, entry)
+
+    def _checkin_sticky(self, entry):
+        if self.leak_detection_threshold is None:
+            return
+        self._sticky_borrowed.discard(entry)
+        if entry.leak_reported:
+            logging.info("previously reported leaked connection returned to pool %s after %.1fs",
+                         self.pool_name, time.time() - entry.borrowed_at)
+        entry.borrow_stack = None
+
+    def _checkin(self, entry):
+        hold_time = time.time() - entry.borrowed_at
+        with self._lock:
+            self._in_use.discard(entry)
+            self._returns += 1
+            self._hold_time_total += hold_time
+            if hold_time > self._hold_time_max:
+                self._hold_time_max = hold_time
+        if entry.leak_reported:
+            logging.info("previously reported leaked connection returned to pool %s after %.1fs",
+                         self.pool_name, hold_time)
+        entry.borrow_stack = None
+
+    def drain(self, on_drained=None):
+        """排空连接池：立即断开空闲连接并拒绝新的借出，借出中的连接归还时立即断开。
+
+        借出连接全部归还且进行中的建连全部结束后调用一次 on_drained；调用时已满足则立即回调。
+        """
+        with self._lock:
+            self._on_drained = on_drained
+        self.close()
+        self._check_drained()
+
+    def _check_drained(self):
+        with self._lock:
+            if not self.closed or self._borrowed or self._opening or self._on_drained is None:
+                return
+            callback = self._on_drained
+            self._on_drained = None
+        try:
+            callback()
+        except Exception:
+            logging.warning("pool drained callback failed", exc_info=True)
+
+    def _open(self):
+        with self._lock:
+            self._opening += 1
+        try:
+            return self._open_conn()
+        finally:
+            with self._lock:
+                self._opening -= 1
+            self._check_drained()
+
+    def _open_conn(self):
+        if self.budget is not None and not self._acquire_budget():
+            raise BudgetExhaustedError("Failed getting connection; connection budget exhausted")
+        try:
+            conn = self._connect()
+        except Exception:
+            if self.budget is not None:
+                self.budget.release()
+            raise
+        try:
+            self._init_session(conn)
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                logging.debug("failed to close connection after session init error", exc_info=True)
+            if self.budget is not None:
+                self.budget.release()
+            raise
+        jitter = random.uniform(0.0, self.lifetime_jitter) if self.lifetime_jitter else 0.0
+        return _PoolEntry(conn, time.time(), jitter)
+
+    def _acquire_budget(self):
+        if self.budget.try_acquire():
+            return True
+        # 预算不足时先收缩其他连接池的空闲连接再重试一次
+        return self.budget.reclaim(self, 1) > 0 and self.budget.try_acquire()
+
+    def _is_expired(self, entry, now):
+        factor = 1.0 - entry.jitter
+        if self.max_lifetime is not None and now - entry.created_at >= self.max_lifetime * factor:
+            return True
+        if self.idle_timeout is not None and now - entry.last_used >= self.idle_timeout * factor:
+            return True
+        return False
+
+    def _put_idle(self, entry):
+        with self._lock:
+            self._notify_waiters()
+            if not self.closed:
+                self._idle.append(entry)
+                return
+            self._size -= 1
+        self._close_conn(entry)
+
+    def _needs_validation(self, entry):
+        if self.validation == self.VALIDATE_ALWAYS:
+            return True
+        if self.validation == self.VALIDATE_IDLE:
+            return time.time() - max(entry.last_used, entry.last_checked) >= self.validation_idle
+        return False
+
+    def _is_alive(self, entry):
+        try:
+            if self.driver is not None:
+                self.driver.ping(entry.conn)
+            else:
+                entry.conn.ping()
+        except Exception as exc:
+            logging.debug("pooled connection failed validation: %s", str(exc))
+            return False
+        entry.last_checked = time.time()
+        return True
+
+    def _should_reset(self, entry):
+        if self.reset_session == self.RESET_ALWAYS:
+            return True
+        if self.reset_session in (self.RESET_DIRTY, self.RESET_TRACKED):
+            return entry.dirty
+        return False
+
+    def _init_session(self, conn):
+        if self.session_init is None:
+            return
+        if callable(self.session_init):
+            self.session_init(conn)
+            return
+        cursor = conn.cursor()
+        try:
+            for sql in self.session_init:
+                cursor.execute(sql)
+        finally:
+            cursor.close()
+        # PostgreSQL 非自动提交模式下 SET 在事务中执行，提交后才对后续事务生效
+        conn.commit()
+
+    def _reset(self, entry):
+        if self.driver is not None:
+            self.driver.reset_session(entry.conn)
+        else:
+            entry.conn.reset_session()
+        self._init_session(entry.conn)
+
+    def _in_transaction(self, entry):
+        if self.driver is not None:
+            state = self.driver.in_transaction(entry.conn)
+        else:
+            state = getattr(entry.conn, "in_transaction", None)
+        # 无法判断时按存在未结束的事务处理
+        return state is None or bool(state)
+
+    def _release(self, entry, discard=False):
+        if entry.pinned:
+            # 线程保留的连接借出时未登记 _in_use，也不计入持有时长统计
+            entry.pinned = False
+            self._checkin_sticky(entry)
+        else:
+            self._checkin(entry)
+        if discard:
+            self._discard(entry, borrowed=True)
+            return
+        if not self.closed:
+            try:
+                if self._should_reset(entry):
+                    self._reset(entry)
+                elif self.reset_session == self.RESET_TRACKED and self._in_transaction(entry):
+                    entry.conn.rollback()
+            except Exception as exc:
+                logging.debug("failed to reset session, discarding connection: %s", str(exc))
+                self._discard(entry, borrowed=True)
+                return
+        entry.dirty = False
+        entry.last_used = time.time()
+        if self.max_lifetime is not None and self._is_expired(entry, entry.last_used):
+            self._discard(entry, borrowed=True)
+            return
+        if self.thread_affinity and self._park(entry):
+            return
+        with self._lock:
+            self._borrowed -= 1
+            self._notify_waiters()
+            if not self.closed:
+                self._idle.append(entry)
+                return
+            self._size -= 1
+        self._close_conn(entry)
+        self._check_drained()
+
+    def _discard(self, entry, borrowed):
+        with self._lock:
+            self._size -= 1
+            self._notify_waiters()
+            if borrowed:
+                self._borrowed -= 1
+        self._close_conn(entry)
+        if borrowed:
+            self._check_drained()
+
+    def _close_conn(self, entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            logging.debug("failed to close pooled connection", exc_info=True)
+        finally:
+            if self.budget is not None:
+                self.budget.release()
+
+
+class StripedConnectionPool:
+    """分片连接池：由多个共享 pool_size 名额的 ConnectionPool 组成，降低单一连接池锁上的竞争。
+
+    每个线程固定使用一个分片；分片没有空闲连接时依次从相邻分片借用空闲连接，
+    全部分片都没有空闲连接时才在本线程的分片新建连接。分片间通过内部的 ConnectionBudget
+    共享 pool_size，物理连接总数不会超过 pool_size。接口与 ConnectionPool 一致。
+
+    :param connect: 无参可调用对象，返回一个新的驱动连接
+    :param pool_size: 全部分片合计的最大物理连接数
+    :param stripes: 分片数
+    :param pool_name: 连接池名称，分片名称为 "<pool_name>_s<序号>"
+    :param min_idle: 全部分片合计保持的最少连接数，默认与 pool_size 相同
+    :param connect_concurrency: 补足连接池时全部分片合计的并行建连线程数
+    :param budget: 上一级物理连接数预算
+    :param kwargs: 其余参数透传给每个分片的 ConnectionPool
+    """
+
+    def __init__(self, connect, pool_size=5, stripes=4, pool_name=None, min_idle=None,
+                 connect_concurrency=1, budget=None, **kwargs):
+        if pool_size <= 0:
+            raise ValueError("pool_size must be greater than 0")
+        if not 1 <= stripes <= pool_size:
+            raise ValueError("stripes must be between 1 and pool_size")
+        if min_idle is None:
+            min_idle = pool_size
+        if min_idle < 0 or min_idle > pool_size:
+            raise ValueError("min_idle must be between 0 and pool_size")
+        if kwargs.get("borrow_timeout") is not None:
+            # 分片间通过预算共享名额，等待本分片的归还无法感知其他分片释放的名额
+            raise ValueError("borrow_timeout is not supported by StripedConnectionPool")
+        self.pool_name = pool_name
+        self.pool_size = pool_size
+        self.budget = budget
+        # 分片共享的连接名额，上一级预算不足时同样拒绝建连
+        self._shared = ConnectionBudget(pool_size, parent=budget, name=pool_name)
+        concurrency = max(1, -(-connect_concurrency // stripes))
+        self._stripes = [
+            ConnectionPool(connect, pool_size=pool_size, pool_name="%s_s%d" % (pool_name, index),
+                           min_idle=0, connect_concurrency=concurrency, budget=self._shared, **kwargs)
+            for index in range(stripes)
+        ]
+        self.min_idle = min_idle
+        self._local = threading.local()
+        self._next_stripe = itertools.count()
+        self._next_stripe_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+
+    @property
+    def stripes(self):
+        return list(self._stripes)
+
+    @property
+    def min_idle(self):
+        return sum(stripe.min_idle for stripe in self._stripes)
+
+    @min_idle.setter
+    def min_idle(self, value):
+        share, extra = divmod(value, len(self._stripes))
+        for index, stripe in enumerate(self._stripes):
+            stripe.min_idle = share + (1 if index < extra else 0)
+
+    @property
+    def closed(self):
+        return self._stripes[0].closed
+
+    @property
+    def outstanding(self):
+        return sum(stripe.outstanding for stripe in self._stripes)
+
+    @property
+    def idle_count(self):
+        return sum(stripe.idle_count for stripe in self._stripes)
+
+    @property
+    def drained(self):
+        return all(stripe.drained for stripe in self._stripes)
+
+    def _stripe_index(self):
+        index = getattr(self._local, "index", None)
+        if index is None:
+            # 按线程首次借出的顺序轮流分配，避免线程标识取模时分布不均
+            # itertools.count 在自由线程版 CPython 中不保证并发调用 next() 的原子性，每个线程只分配一次
+            with self._next_stripe_lock:
+                index = next(self._next_stripe) % len(self._stripes)
+            self._local.index = index
+        return index
+
+    def get_connection(self):
+        """借出一个连接：本分片的空闲连接 -> 相邻分片的空闲连接 -> 在本分片新建连接。
+
+        :raises PoolExhaustedError: 连接已全部借出
+        :raises PoolError: 连接池已关闭
+        """
+        index = self._stripe_index()
+        order = self._stripes[index:] + self._stripes[:index]
+        for stripe in order:
+            try:
+                return stripe.get_connection(create=False)
+            except PoolExhaustedError:
+                continue
+        try:
+            return order[0].get_connection()
+        except BudgetExhaustedError:
+            if self.budget is not None and self._shared.stats()["in_use"] < self.pool_size:
+                raise
+            raise PoolExhaustedError("Failed getting connection; pool exhausted")
+
+    def fill(self, deadline=None):
+        """并行补足各分片到其 min_idle，任一分片建连失败时抛出该异常。"""
+        errors = []
+
+        def fill_stripe(stripe):
+            try:
+                stripe.fill(deadline)
+            except Exception as exc:
+                errors.append(exc)
+
+        helpers = [threading.Thread(target=fill_stripe, args=(stripe,), name="SSMPoolFiller", daemon=True)
+                   for stripe in self._stripes[1:]]
+        for helper in helpers:
+            helper.start()
+        fill_stripe(self._stripes[0])
+        for helper in helpers:
+            helper.join()
+        if errors:
+            raise errors[0]
+
+    def shrink(self, count):
+        """优先从空闲连接最多的分片断开最多 count 个空闲连接，返回断开数量。"""
+        freed = 0
+        for stripe in sorted(self._stripes, key=lambda item: item.idle_count, reverse=True):
+            if freed >= count:
+                break
+            freed += stripe.shrink(count - freed)
+        return freed
+
+    def recycle(self):
+        return sum(stripe.recycle() for stripe in self._stripes)
+
+    def validate_idle(self):
+        return sum(stripe.validate_idle() for stripe in self._stripes)
+
+    def detect_leaks(self):
+        return sum(stripe.detect_leaks() for stripe in self._stripes)
+
+    def release_sticky(self, max_idle=None):
+        return sum(stripe.release_sticky(max_idle) for stripe in self._stripes)
+
+    def close(self):
+        return sum(stripe.close() for stripe in self._stripes)
+
+    def drain(self, on_drained=None):
+        """排空全部分片，所有分片的借出连接都归还后调用一次 on_drained。"""
+        remaining = [len(self._stripes)]
+
+        def stripe_drained():
+            with self._drain_lock:
+                remaining[0] -= 1
+                done = remaining[0] == 0
+            if done and on_drained is not None:
+                on_drained()
+
+        for stripe in self._stripes:
+            stripe.drain(stripe_drained)
+
+    def stats(self):
+        """返回全部分片合计的连接池状态，stripes 为各分片的统计。"""
+        stripes = [stripe.stats() for stripe in self._stripes]
+        returns = sum(item["returns"] for item in stripes)
+        hold_total = sum(item["hold_time_avg"] * item["returns"] for item in stripes)
+        return {
+            "pool_name": self.pool_name,
+            "pool_size": self.pool_size,
+            "size": sum(item["size"] for item in stripes),
+            "idle": sum(item["idle"] for item in stripes),
+            "outstanding": sum(item["outstanding"] for item in stripes),
+            "sticky": sum(item["sticky"] for item in stripes),
+            "returns": returns,
+            "hold_time_avg": hold_total / returns if returns else 0.0,
+            "hold_time_max": max(item["hold_time_max"] for item in stripes),
+            "stripes": stripes,
+        }
@@ -14,14 +14,18 @@
 # limitations under the License.
 #
 
+import hashlib
+import hmac
 import json
 import logging
+import threading
+import time
 from enum import Enum
 from threading import Timer
-from tencentcloud.ssm.v20190923 import models, ssm_client
-from tencentcloud.common.profile import client_profile
-from tencentcloud.common import credential
-from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from ssm_rotation_sdk.concurrency import get_concurrency
+
+# tencentcloud 模块较重，在首次请求 SSM 时才导入，避免拖慢仅构造 SsmAccount 等场景的启动
 
 
 class CredentialType(Enum):
@@ -37,19 +41,35 @@ class CredentialType(Enum):
     CAM_ROLE = "cam_role"
 
 
+class Transport(Enum):
+    """SSM 请求方式枚举
+
+    1. SDK     - 使用 tencentcloud-sdk-python 的 SsmClient（默认）
+    2. BUILTIN - 使用内置的轻量 HTTP 客户端：自行完成 TC3-HMAC-SHA256 签名，
+                 复用长连接，只解析 SecretString 与版本信息
+    """
+    SDK = "sdk"
+    BUILTIN = "builtin"
+
+
 class Error:
     """自定义错误类
 
     """
-    def __init__(self, message=None):
+    __slots__ = ("message", "code")
+
+    def __init__(self, message=None, code=None):
         """
         :param message: 错误信息
         :type message: str
+        :param code: 云 API 返回的错误码，如 ResourceNotFound；非 API 错误时为 None
+        :type code: str
         """
         if message is None:
             self.message = None
         else:
             self.message = message
+        self.code = code
 
 
 class LoopTimer(Timer):
@@ -72,10 +92,66 @@ class LoopTimer(Timer):
             self.function(*self.args, **self.kwargs)
 
 
+class SecretBytes:
+    """敏感内容持有类
+
+    以 bytearray 保存明文，使用完毕后可调用 wipe() 原地清零，
+    避免在堆中长期保留多份不可变的明文字符串。
+    """
+    __slots__ = ("_buf",)
+
+    def __init__(self, value=None):
+        if value is None:
+            self._buf = bytearray()
+        elif isinstance(value, (bytes, bytearray)):
+            self._buf = bytearray(value)
+        else:
+            self._buf = bytearray(value.encode("utf-8"))
+
+    def reveal(self):
+        """返回明文字符串（每次调用生成一份临时副本，调用方不应长期持有）。"""
+        return self._buf.decode("utf-8")
+
+    def view(self):
+        """返回底层缓冲区的视图，用于哈希等无需解码的场景；用完需 release()，否则无法 wipe()。"""
+        return memoryview(self._buf)
+
+    def wipe(self):
+        """原地清零并清空缓冲区。"""
+        for index in range(len(self._buf)):
+            self._buf[index] = 0
+        del self._buf[:]
+
+    def update(self, other):
+        """清零当前内容后替换为 other（SecretBytes）的内容，引用该对象的建连函数随之使用新密码。"""
+        self.wipe()
+        self._buf.extend(other._buf)
+
+    def __len__(self):
+        return len(self._buf)
+
+    def __eq__(self, other):
+        if not isinstance(other, SecretBytes):
+            return NotImplemented
+        return hmac.compare_digest(bytes(self._buf), bytes(other._buf))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "SecretBytes(***)"
+
+
 class DbAccount:
     """DB 账号信息类
 
+    密码保存在 SecretBytes 中，读取 password 属性时才解码为字符串。
     """
+    __slots__ = ("user_name", "secret", "version_id")
+
     def __init__(self, user_name=None, password=None):
         """
         :param user_name: 用户名
@@ -85,6 +161,26 @@ class DbAccount:
         """
         self.user_name = user_name
         self.password = password
+        # SSM 返回的凭据版本
+        self.version_id = None
+
+    @property
+    def password(self):
+        if self.secret is None:
+            return None
+        return self.secret.reveal()
+
+    @password.setter
+    def password(self, value):
+        if value is None or isinstance(value, SecretBytes):
+            self.secret = value
+        else:
+            self.secret = SecretBytes(value)
+
+    def wipe(self):
+        """清零密码明文。"""
+        if self.secret is not None:
+            self.secret.wipe()
 
 
 class SsmAccount:
@@ -100,6 +196,17 @@ class SsmAccount:
     - SsmAccount.with_temporary_credential(secret_id, secret_key, token, region)
     - SsmAccount.with_permanent_credential(secret_id, secret_key, region)
     """
+    __slots__ = (
+        "credential_type",
+        "secret_id",
+        "secret_key",
+        "token",
+        "role_name",
+        "url",
+        "region",
+        "transport",
+    )
+
     def __init__(self, params=None):
         """
         :param secret_id: 密钥ID，用于标识调用者身份
@@ -116,6 +223,8 @@ class SsmAccount:
         :type region: str
         :param credential_type: 凭据类型，默认为 PERMANENT
         :type credential_type: CredentialType
+        :param transport: SSM 请求方式，默认为 SDK
+        :type transport: Transport
         """
         if params is None:
             self.credential_type = CredentialType.PERMANENT
@@ -125,6 +234,7 @@ class SsmAccount:
             self.role_name = None
             self.url = None
             self.region = None
+            self.transport = Transport.SDK
         else:
             self.credential_type = params.get('credential_type', CredentialType.PERMANENT)
             self.secret_id = params.get('secret_id')
@@ -133,6 +243,7 @@ class SsmAccount:
             self.role_name = params.get('role_name')
             self.url = params.get('url')
             self.region = params.get('region')
+            self.transport = params.get('transport', Transport.SDK)
 
     @staticmethod
     def with_cam_role(role_name, region):
@@ -210,6 +321,26 @@ class SsmAccount:
         self.url = url
         return self
 
+    def with_transport(self, transport):
+        """设置 SSM 请求方式（链式调用）
+
+        :param transport: Transport.SDK 或 Transport.BUILTIN
+        :type transport: Transport
+        :rtype: SsmAccount
+        """
+        self.transport = transport
+        return self
+
+
+class SecretValue:
+    """GetSecretValue 返回的凭据内容及版本信息。"""
+    __slots__ = ("secret_name", "version_id", "secret_string")
+
+    def __init__(self, secret_name=None, version_id=None, secret_string=None):
+        self.secret_name = secret_name
+        self.version_id = version_id
+        self.secret_string = secret_string
+
 
 def _create_credential(ssm_acc):
     """根据凭据类型创建对应的 Credential 对象
@@ -218,6 +349,8 @@ def _create_credential(ssm_acc):
     :type ssm_acc: SsmAccount
     :rtype: credential 对象
     """
+    from tencentcloud.common import credential
+
     cred_type = getattr(ssm_acc, 'credential_type', CredentialType.PERMANENT)
 
     if cred_type == CredentialType.TEMPORARY:
@@ -257,6 +390,10 @@ def _get_client(ssm_acc):
     except ValueError as exc:
         return None, Error(str(exc))
 
+    from tencentcloud.common.profile import client_profile
+    from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+    from tencentcloud.ssm.v20190923 import ssm_client
+
     http_profile = client_profile.HttpProfile()
     http_profile.reqMethod = "POST"
     url = getattr(ssm_acc, 'url', None)
@@ -275,37 +412,276 @@ def _get_client(ssm_acc):
     return client, err
 
 
-def _get_current_product_secret_value(secret_name, ssm_acc):
-    """获取当前云产品凭据内容
+# ---------------------------------------------------------------------------
+# 内置 HTTP 客户端（Transport.BUILTIN）
+# ---------------------------------------------------------------------------
+
+_SSM_SERVICE = "ssm"
+_SSM_API_VERSION = "2019-09-23"
+_SSM_DEFAULT_ENDPOINT = "ssm.tencentcloudapi.com"
+_HTTP_TIMEOUT = 60
+# 每个接入点保留的空闲 keep-alive 连接数上限
+_HTTP_MAX_IDLE = 4
+_CONTENT_TYPE = "application/json; charset=utf-8"
+_CVM_ROLE_CREDENTIAL_URL = "http://metadata.tencentyun.com/latest/meta-data/cam/security-credentials/"
+# CAM 角色临时凭据在过期前提前刷新的时间（秒）
+_ROLE_CREDENTIAL_REFRESH_AHEAD = 300
+
+_http_clients = {}
+_http_clients_lock = threading.Lock()
+_role_credentials = {}
+_role_credentials_lock = threading.Lock()
+
+
+def _sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _tc3_signature(secret_key, date, string_to_sign, service=_SSM_SERVICE):
+    """计算 TC3-HMAC-SHA256 签名。"""
+    k_date = hmac.new(("TC3" + secret_key).encode("utf-8"), date.encode("utf-8"), hashlib.sha256).digest()
+    k_service = hmac.new(k_date, service.encode("utf-8"), hashlib.sha256).digest()
+    k_signing = hmac.new(k_service, b"tc3_request", hashlib.sha256).digest()
+    return hmac.new(k_signing, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _tc3_headers(action, payload, host, region, secret_id, secret_key, token=None, timestamp=None):
+    """构造带 TC3-HMAC-SHA256 签名的请求头。
+
+    :param payload: 请求体（bytes）
+    :rtype: dict
+    """
+    if timestamp is None:
+        timestamp = int(time.time())
+    date = time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+    canonical_request = "POST\n/\n\ncontent-type:%s\nhost:%s\n\ncontent-type;host\n%s" % (
+        _CONTENT_TYPE, host, _sha256_hex(payload))
+    scope = "%s/%s/tc3_request" % (date, _SSM_SERVICE)
+    string_to_sign = "TC3-HMAC-SHA256\n%d\n%s\n%s" % (
+        timestamp, scope, _sha256_hex(canonical_request.encode("utf-8")))
+    signature = _tc3_signature(secret_key, date, string_to_sign)
+    headers = {
+        "Authorization": "TC3-HMAC-SHA256 Credential=%s/%s, SignedHeaders=content-type;host, Signature=%s" % (
+            secret_id, scope, signature),
+        "Content-Type": _CONTENT_TYPE,
+        "Host": host,
+        "X-TC-Action": action,
+        "X-TC-Version": _SSM_API_VERSION,
+        "X-TC-Timestamp": str(timestamp),
+        "X-TC-Region": region,
+    }
+    if token:
+        headers["X-TC-Token"] = token
+    return headers
+
+
+class _SsmHttpClient:
+    """复用 keep-alive 连接的 SSM API 客户端。
+
+    并发请求各自借用一条空闲连接，锁只保护空闲连接列表，不在持锁期间等待网络 I/O：
+    协作式并发下一个挂起的请求不会让其他协程在锁上阻塞整个事件循环。
+    """
+
+    def __init__(self, scheme, host, timeout=_HTTP_TIMEOUT):
+        self.scheme = scheme
+        self.host = host
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _new_connection(self):
+        import http.client
+        if self.scheme == "http":
+            return http.client.HTTPConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new_connection(), False
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < _HTTP_MAX_IDLE:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def call(self, action, params, region, secret_id, secret_key, token=None):
+        """调用 SSM API，返回 (Response 字段, error)。"""
+        import http.client
+        payload = json.dumps(params).encode("utf-8")
+        for attempt in range(2):
+            if attempt == 0:
+                conn, reused = self._acquire()
+            else:
+                conn, reused = self._new_connection(), False
+            headers = _tc3_headers(action, payload, self.host, region, secret_id, secret_key, token)
+            try:
+                conn.request("POST", "/", body=payload, headers=headers)
+                rsp = conn.getresponse()
+                status, data = rsp.status, rsp.read()
+            except (http.client.HTTPException, OSError) as exc:
+                conn.close()
+                # 复用的连接可能已被服务端关闭，其余空闲连接通常也已失效：全部丢弃后用新连接重试一次
+                # （GetSecretValue 为只读请求）
+                if reused and attempt == 0:
+                    self.close()
+                    continue
+                return None, Error("request %s failed: %s" % (self.host, exc))
+            except BaseException:
+                # 被协作式超时等中断时连接状态未知，不再复用
+                conn.close()
+                raise
+            if rsp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            break
+        try:
+            response = json.loads(data.decode("utf-8"))["Response"]
+        except (ValueError, KeyError, TypeError):
+            return None, Error("unexpected response from %s: HTTP %d" % (self.host, status))
+        error = response.get("Error")
+        if error:
+            return None, Error("[%s] %s" % (error.get("Code"), error.get("Message")), error.get("Code"))
+        return response, None
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def _get_http_client(url):
+    """按接入点复用内置 HTTP 客户端。
+
+    :param url: 接入点，可以是域名（默认 HTTPS），也可以带 scheme，如 http://127.0.0.1:8080
+    """
+    url = url or _SSM_DEFAULT_ENDPOINT
+    if "://" in url:
+        scheme, _, host = url.partition("://")
+        scheme = scheme.lower()
+    else:
+        scheme, host = "https", url
+    host = host.split("/", 1)[0]
+    key = (scheme, host)
+    with _http_clients_lock:
+        client = _http_clients.get(key)
+        if client is None:
+            client = _http_clients[key] = _SsmHttpClient(scheme, host)
+        return client
+
+
+def _get_role_credential(role_name):
+    """从 CVM 元数据服务获取 CAM 角色临时凭据，过期前复用。
+
+    :rtype: (secret_id, secret_key, token)
+    """
+    now = time.time()
+    with _role_credentials_lock:
+        cached = _role_credentials.get(role_name)
+        if cached is not None and cached[0] - _ROLE_CREDENTIAL_REFRESH_AHEAD > now:
+            return cached[1]
+    # 不在持锁期间请求元数据服务：锁在导入时创建，打补丁后仍是原生锁，协程在其上等待会阻塞事件循环
+    from urllib.request import urlopen
+    with urlopen(_CVM_ROLE_CREDENTIAL_URL + role_name, timeout=10) as rsp:
+        data = json.loads(rsp.read().decode("utf-8"))
+    if data.get("Code") not in (None, "Success"):
+        raise ValueError("failed to get credential of role %s: %s" % (role_name, data.get("Code")))
+    credential = (data["TmpSecretId"], data["TmpSecretKey"], data.get("Token"))
+    with _role_credentials_lock:
+        _role_credentials[role_name] = (float(data.get("ExpiredTime", now)), credential)
+    return credential
+
+
+def _resolve_credential(ssm_acc):
+    """解析内置 HTTP 客户端使用的 (secret_id, secret_key, token)。"""
+    cred_type = getattr(ssm_acc, 'credential_type', CredentialType.PERMANENT)
+    if cred_type == CredentialType.CAM_ROLE:
+        if not ssm_acc.role_name:
+            raise ValueError("role_name is required for CAM_ROLE credential type")
+        return _get_role_credential(ssm_acc.role_name)
+    if not ssm_acc.secret_id or not ssm_acc.secret_key:
+        raise ValueError("secret_id and secret_key are required for %s credential type" % cred_type.name)
+    if cred_type == CredentialType.TEMPORARY:
+        if not ssm_acc.token:
+            raise ValueError("token is required for TEMPORARY credential type")
+        return ssm_acc.secret_id, ssm_acc.secret_key, ssm_acc.token
+    return ssm_acc.secret_id, ssm_acc.secret_key, None
+
+
+def _builtin_get_secret_value(secret_name, ssm_acc, version_id):
+    """使用内置 HTTP 客户端调用 GetSecretValue。
+
+    :rtype: (SecretValue, error)
+    """
+    if ssm_acc is None:
+        return None, Error("create ssm HTTP client error: ssm account is required")
+    if not getattr(ssm_acc, "region", None):
+        return None, Error("create ssm HTTP client error: region is required")
+    try:
+        secret_id, secret_key, token = _resolve_credential(ssm_acc)
+    except (ValueError, KeyError, OSError) as exc:
+        return None, Error("create ssm HTTP client error: %s" % exc)
+
+    client = _get_http_client(getattr(ssm_acc, "url", None))
+    params = {"SecretName": secret_name, "VersionId": version_id}
+    response, err = client.call("GetSecretValue", params, ssm_acc.region, secret_id, secret_key, token)
+    if err:
+        return None, Error("ssm GetSecretValue error: " + err.message, err.code)
+    return SecretValue(response.get("SecretName"), response.get("VersionId"),
+                       response.get("SecretString")), None
+
+
+def _get_secret_value(secret_name, ssm_acc, version_id="SSM_Current"):
+    """获取指定版本的云产品凭据内容，错误由调用方记录
 
     :param secret_name: 凭据名称
     :type secret_name: str
     :param ssm_acc: SSM 账号信息
     :type ssm_acc: SsmAccount class
-    :rtype :str: 凭据内容
+    :param version_id: 凭据版本，如 SSM_Current、SSM_Pending、SSM_Previous
+    :type version_id: str
+    :rtype :SecretValue: 凭据内容及版本信息
     :rtype :error: 异常报错信息
-
     """
+    concurrency = get_concurrency()
+    try:
+        # 协作式并发下整体耗时超过 _HTTP_TIMEOUT 时中断请求协程；线程模式由 socket 超时限制
+        with concurrency.timeout(_HTTP_TIMEOUT):
+            return _request_secret_value(secret_name, ssm_acc, version_id)
+    except concurrency.Timeout:
+        return None, Error("ssm GetSecretValue error: request timed out after %ds" % _HTTP_TIMEOUT)
+
+
+def _request_secret_value(secret_name, ssm_acc, version_id):
+    if getattr(ssm_acc, "transport", Transport.SDK) == Transport.BUILTIN:
+        return _builtin_get_secret_value(secret_name, ssm_acc, version_id)
+
     client, err = _get_client(ssm_acc)
     if err:
-        logging.error("create ssm client error: %s", err.message)
         return None, Error("create ssm HTTP client error: %s" % err.message)
 
+    from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+    from tencentcloud.ssm.v20190923 import models
+
     # 获取凭据内容
     request = models.GetSecretValueRequest()
     request.SecretName = secret_name
-    request.VersionId = "SSM_Current"  # hard-code
+    request.VersionId = version_id
 
     rsp = None
     try:
         rsp = client.GetSecretValue(request)
     except TencentCloudSDKException as e:
-        err = Error(str(e.args[0]))
+        err = Error(str(e.args[0]), e.get_code())
     if err:
-        logging.error("ssm GetSecretValue error: " + err.message)
-        return None, Error("ssm GetSecretValue error: " + err.message)
+        return None, Error("ssm GetSecretValue error: " + err.message, err.code)
 
-    return rsp.SecretString, None
+    return SecretValue(rsp.SecretName, rsp.VersionId, rsp.SecretString), None
 
 
 def get_current_account(secret_name, ssm_acc):
@@ -319,19 +695,51 @@ def get_current_account(secret_name, ssm_acc):
     :rtype :error: 异常报错信息
 
     """
-    # 获取 secret_name 对应的凭据内容
-    secret_value, err = _get_current_product_secret_value(secret_name, ssm_acc)
+    account, err = get_account(secret_name, ssm_acc, "SSM_Current")
     if err:
         logging.error("failed to GetSecretValue, err=" + err.message)
+    return account, err
+
+
+def get_account(secret_name, ssm_acc, version_id):
+    """获取指定版本的账号信息，不记录错误日志
+
+    :param secret_name: 凭据名称
+    :type secret_name: str
+    :param ssm_acc: SSM 账号信息
+    :type ssm_acc: SsmAccount class
+    :param version_id: 凭据版本，如 SSM_Current、SSM_Pending、SSM_Previous
+    :type version_id: str
+    :rtype :DbAccount: 账号信息
+    :rtype :error: 异常报错信息
+    """
+    value, err = _get_secret_value(secret_name, ssm_acc, version_id)
+    if err:
         return None, err
-    # secret_value 是 JSON格式的字符串，形如： {"UserName":"test_user","Password":"test_pwd"}
-    if len(secret_value) == 0:
+    account, err = _parse_db_account(value.secret_string)
+    if account is not None:
+        account.version_id = value.version_id
+    return account, err
+
+
+def _parse_db_account(secret_value):
+    """解析形如 {"UserName":"test_user","Password":"test_pwd"} 的凭据内容
+
+    :rtype :DbAccount: 账号信息
+    :rtype :error: 异常报错信息
+    """
+    if not secret_value:
         return None, Error("no valid account info found because secret value is empty")
     try:
         current_user_and_password = json.loads(secret_value)
     except (ValueError, KeyError, TypeError) as exc:
         return None, Error("invalid secret value format: %s" % str(exc))
-    if "UserName" not in current_user_and_password or "Password" not in current_user_and_password:
+    finally:
+        # 尽早释放原始 JSON 明文的引用
+        del secret_value
+    if not isinstance(current_user_and_password, dict) \
+            or "UserName" not in current_user_and_password or "Password" not in current_user_and_password:
         return None, Error("secret value missing required fields: UserName and/or Password")
-    account = DbAccount(current_user_and_password["UserName"], current_user_and_password["Password"])
+    account = DbAccount(current_user_and_password["UserName"],
+                        SecretBytes(current_user_and_password.pop("Password")))
     return account, None
@@ -0,0 +1,102 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""SQLAlchemy 集成：Engine 始终使用 DynamicSecretRotationDb 的当前凭据建连。
+
+需要安装 SQLAlchemy（``pip install ssm-rotation-sdk[sqlalchemy]``）。
+
+- ``do_connect`` 钩子在每次建立物理连接时填入当前凭据，URL 中无需包含用户名和密码
+- ``checkout`` 钩子发现借出的连接使用的是轮转前的凭据时使其失效，由 SQLAlchemy 透明地重新建连
+- 建连遇到认证失败时等待一次连接池刷新后重试
+
+Engine 本身不会重建，编译缓存等状态在轮转后继续有效。连接由 SQLAlchemy 连接池持有，
+db 应配置 ``credential_only=True``，避免 SDK 连接池另外保留一份连接并占用连接预算。
+"""
+
+import logging
+
+import sqlalchemy
+from sqlalchemy import event, exc
+
+from ssm_rotation_sdk.db import ConnectionUnavailableError
+
+# 连接记录 info 中保存建连时凭据的键
+CONN_KEY_INFO = "ssm_rotation_conn_key"
+
+
+class RotatingCredentialAdapter:
+    """将 DynamicSecretRotationDb 的凭据接入 SQLAlchemy Engine。
+
+    :param db: 已调用 init() 的 DynamicSecretRotationDb，建议配置 credential_only=True
+    """
+
+    def __init__(self, db):
+        self.db = db
+        config = db.config
+        if config is not None and not config.db_config.credential_only:
+            logging.warning("sqlalchemy engine uses a db without credential_only, "
+                            "the sdk pool keeps its own connections alongside the engine pool")
+
+    def attach(self, engine):
+        """在 engine 上注册 do_connect 与 checkout 钩子，返回 engine。"""
+        event.listen(engine, "do_connect", self._do_connect)
+        event.listen(engine, "checkout", self._checkout)
+        return engine
+
+    def detach(self, engine):
+        """移除 attach() 注册的钩子。"""
+        event.remove(engine, "do_connect", self._do_connect)
+        event.remove(engine, "checkout", self._checkout)
+
+    def _do_connect(self, dialect, conn_rec, cargs, cparams):
+        for attempt in range(2):
+            conn_key, params = self.db._connect_params()
+            if params is None:
+                raise ConnectionUnavailableError("dynamic secret rotation db is not initialized or closed")
+            cparams.update(params)
+            try:
+                conn = dialect.connect(*cargs, **cparams)
+            except Exception as e:
+                if attempt == 0 and self.db._is_authentication_error(e):
+                    logging.warning("authentication failed when connecting from sqlalchemy, refreshing pool")
+                    err = self.db._refresh_shared(self.db.config.retry_deadline_ms / 1000.0)
+                    if err is None:
+                        continue
+                    logging.error("failed to refresh pool after authentication error: %s", err.message)
+                raise
+            conn_rec.info[CONN_KEY_INFO] = conn_key
+            return conn
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        current = self.db._current_conn_key()
+        if current is None:
+            return
+        if connection_record.info.get(CONN_KEY_INFO) != current:
+            # 连接使用的是轮转前的凭据：SQLAlchemy 会丢弃该连接并用当前凭据重新建连
+            raise exc.DisconnectionError("connection uses a rotated credential")
+
+
+def create_engine(db, url="mysql+mysqlconnector://", **kwargs):
+    """创建使用 db 当前凭据建连的 SQLAlchemy Engine。
+
+    :param db: 已调用 init() 的 DynamicSecretRotationDb
+    :param url: 数据库 URL，用户名、密码、地址与库名由 db 的配置填入，通常只需指定方言与驱动，
+        须与 db 的驱动后端一致，如 PostgreSQL（driver="psycopg"）使用 "postgresql+psycopg://"
+    :param kwargs: 透传给 sqlalchemy.create_engine 的参数，如 pool_size、pool_recycle
+    :rtype: sqlalchemy.engine.Engine
+    """
+    engine = sqlalchemy.create_engine(url, **kwargs)
+    return RotatingCredentialAdapter(db).attach(engine)
@@ -0,0 +1,94 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""后台任务线程：按提交顺序执行任务并返回 Future。"""
+
+import collections
+import logging
+import threading
+from concurrent.futures import Future
+from queue import Full
+
+
+class BackgroundWorker:
+    """由单个守护线程顺序执行任务的执行器。
+
+    与 ThreadPoolExecutor 不同，工作线程是守护线程，不会阻止进程退出；
+    线程在首次提交任务时才启动。
+
+    :param name: 工作线程名称
+    :param max_pending: 排队任务数上限，超过时 submit 抛出 queue.Full，None 表示不限制
+    """
+
+    def __init__(self, name, max_pending=None):
+        self.name = name
+        self.max_pending = max_pending
+        self._cond = threading.Condition(threading.Lock())
+        self._tasks = collections.deque()
+        self._thread = None
+        self._shutdown = False
+
+    def submit(self, fn, *args, **kwargs):
+        """提交任务，返回 concurrent.futures.Future。
+
+        :raises RuntimeError: 执行器已关闭
+        :raises queue.Full: 排队任务数已达上限
+        """
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("worker %s has been shut down" % self.name)
+            if self.max_pending is not None and len(self._tasks) >= self.max_pending:
+                raise Full("worker %s has too many pending tasks" % self.name)
+            self._tasks.append((future, fn, args, kwargs))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def pending(self):
+        """返回排队中（未开始执行）的任务数。"""
+        with self._cond:
+            return len(self._tasks)
+
+    def shutdown(self):
+        """关闭执行器并取消排队中的任务，正在执行的任务会继续运行至结束。"""
+        with self._cond:
+            self._shutdown = True
+            tasks = list(self._tasks)
+            self._tasks.clear()
+            self._cond.notify_all()
+        for future, _, _, _ in tasks:
+            future.cancel()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._tasks and not self._shutdown:
+                    self._cond.wait()
+                if not self._tasks:
+                    return
+                future, fn, args, kwargs = self._tasks.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as exc:
+                logging.debug("background task failed in %s", self.name, exc_info=True)
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
@@ -16,6 +16,9 @@
 
 """ssm_rotation_sdk 包的基础单元测试（不依赖外部服务）"""
 
+import os
+import subprocess
+import sys
 import unittest
 
 
@@ -41,6 +44,24 @@ class TestImport(unittest.TestCase):
         self.assertIsNotNone(SsmAccount)
         self.assertIsNotNone(DynamicSecretRotationDb)
 
+    def test_lightweight_import_skips_heavy_dependencies(self):
+        # 在全新解释器中检查：仅使用 SsmAccount 时不加载 mysql.connector 与 tencentcloud
+        script = (
+            "import sys\n"
+            "from ssm_rotation_sdk import SsmAccount, DbAccount, CredentialType\n"
+            "SsmAccount.with_cam_role('role', 'ap-guangzhou')\n"
+            "print(sorted(m for m in sys.modules if m.split('.')[0] in ('mysql', 'tencentcloud')))\n"
+        )
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.check_output([sys.executable, "-c", script], env=env)
+        self.assertEqual(output.decode().strip(), "[]")
+
+    def test_unknown_attribute_raises(self):
+        import ssm_rotation_sdk
+        with self.assertRaises(AttributeError):
+            ssm_rotation_sdk.NotExported
+        self.assertIn("DynamicSecretRotationDb", dir(ssm_rotation_sdk))
+
 
 class TestSsmAccount(unittest.TestCase):
     """验证 SsmAccount 工厂方法"""
@@ -150,5 +171,33 @@ class TestError(unittest.TestCase):
         self.assertIsNone(err.message)
 
 
+class TestSecretBytes(unittest.TestCase):
+    """验证密码容器与账号记录"""
+
+    def test_reveal_and_repr(self):
+        from ssm_rotation_sdk.requester import SecretBytes
+        secret = SecretBytes("p@ss")
+        self.assertEqual(secret.reveal(), "p@ss")
+        self.assertEqual(len(secret), 4)
+        self.assertNotIn("p@ss", repr(secret))
+        self.assertEqual(secret, SecretBytes("p@ss"))
+        self.assertNotEqual(secret, SecretBytes("other"))
+
+    def test_wipe_clears_buffer(self):
+        from ssm_rotation_sdk.requester import SecretBytes
+        secret = SecretBytes("p@ss")
+        secret.wipe()
+        self.assertEqual(len(secret), 0)
+        self.assertEqual(secret.reveal(), "")
+
+    def test_db_account_uses_slots(self):
+        from ssm_rotation_sdk import DbAccount
+        account = DbAccount("user", "pwd")
+        self.assertEqual(account.password, "pwd")
+        self.assertFalse(hasattr(account, "__dict__"))
+        account.wipe()
+        self.assertEqual(account.password, "")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,191 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""SecretCache 的单元测试（替换 SSM 请求，不依赖外部服务）"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from ssm_rotation_sdk import Error, SecretCache
+from ssm_rotation_sdk.cache import parse_db_account, parse_json
+from ssm_rotation_sdk.requester import SecretValue
+
+
+class FakeSsm:
+    """按 (名称, 版本) 返回凭据内容，并记录请求次数。"""
+
+    def __init__(self):
+        self.secrets = {}
+        self.calls = []
+        self.gate = None
+
+    def __call__(self, name, ssm_account, version):
+        self.calls.append((name, version))
+        if self.gate is not None:
+            self.gate.wait(5)
+        secret = self.secrets.get((name, version))
+        if secret is None:
+            return None, Error("ssm GetSecretValue error: [ResourceNotFound] %s" % name, "ResourceNotFound")
+        return SecretValue(name, version, secret), None
+
+
+class TestSecretCache(unittest.TestCase):
+    def setUp(self):
+        self.ssm = FakeSsm()
+        self.ssm.secrets[("api-key", "SSM_Current")] = "key-1"
+        self.ssm.secrets[("db", "SSM_Current")] = '{"UserName": "u", "Password": "p"}'
+        patcher = mock.patch("ssm_rotation_sdk.cache._get_secret_value", self.ssm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def build_cache(self, **kwargs):
+        cache = SecretCache(ssm_account=None, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_cached_within_ttl(self):
+        cache = self.build_cache(ttl=60)
+        self.assertEqual(cache.get_secret("api-key"), ("key-1", None))
+        self.assertEqual(cache.get_secret("api-key"), ("key-1", None))
+        self.assertEqual(self.ssm.calls, [("api-key", "SSM_Current")])
+
+    def test_expired_entry_is_refetched(self):
+        cache = self.build_cache(ttl=0, refresh_ahead=None)
+        cache.get_secret("api-key")
+        self.ssm.secrets[("api-key", "SSM_Current")] = "key-2"
+        self.assertEqual(cache.get_secret("api-key"), ("key-2", None))
+        self.assertEqual(len(self.ssm.calls), 2)
+
+    def test_fixed_version_never_expires(self):
+        self.ssm.secrets[("api-key", "v1")] = "old"
+        cache = self.build_cache(ttl=0)
+        self.assertEqual(cache.get_secret("api-key", version="v1"), ("old", None))
+        self.assertEqual(cache.get_secret("api-key", version="v1"), ("old", None))
+        self.assertEqual(self.ssm.calls, [("api-key", "v1")])
+
+    def test_parsed_value_is_memoized(self):
+        cache = self.build_cache(ttl=60)
+        parser = mock.Mock(side_effect=parse_json)
+        first, err = cache.get_secret("db", parser=parser)
+        self.assertIsNone(err)
+        self.assertIs(cache.get_secret("db", parser=parser)[0], first)
+        self.assertEqual(parser.call_count, 1)
+        account, err = cache.get_secret("db", parser=parse_db_account)
+        self.assertEqual((account.user_name, account.password), ("u", "p"))
+
+    def test_parse_error_is_returned(self):
+        cache = self.build_cache()
+        value, err = cache.get_secret("api-key", parser=parse_json)
+        self.assertIsNone(value)
+        self.assertIn("failed to parse secret api-key", err.message)
+
+    def test_concurrent_fetches_are_coalesced(self):
+        cache = self.build_cache()
+        self.ssm.gate = threading.Event()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_secret("api-key")))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        self.ssm.gate.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, [("key-1", None)] * 8)
+        self.assertEqual(len(self.ssm.calls), 1)
+
+    def test_refresh_ahead_runs_in_background(self):
+        cache = self.build_cache(ttl=60, refresh_ahead=0)
+        cache.get_secret("api-key")
+        self.ssm.secrets[("api-key", "SSM_Current")] = "key-2"
+        # 仍返回缓存值，同时提交后台刷新
+        self.assertEqual(cache.get_secret("api-key"), ("key-1", None))
+        deadline = time.time() + 5
+        while cache.get_secret("api-key")[0] != "key-2" and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(cache.get_secret("api-key")[0], "key-2")
+
+    def test_expired_readers_wait_for_refresh_ahead(self):
+        cache = self.build_cache(ttl=0.2, refresh_ahead=0.3)
+        cache.get_secret("api-key")
+        time.sleep(0.08)
+        self.ssm.secrets[("api-key", "SSM_Current")] = "key-2"
+        self.ssm.gate = threading.Event()
+        # 提交后台刷新并阻塞在 SSM 请求上，缓存随后过期
+        self.assertEqual(cache.get_secret("api-key"), ("key-1", None))
+        time.sleep(0.15)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_secret("api-key")))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        self.ssm.gate.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, [("key-2", None)] * 4)
+        self.assertEqual(len(self.ssm.calls), 2)
+
+    def test_fixed_versions_are_evicted_least_recently_used(self):
+        for version in ("v1", "v2", "v3"):
+            self.ssm.secrets[("api-key", version)] = version
+        cache = self.build_cache(max_versions=2)
+        cache.get_secret("api-key")
+        cache.get_secret("api-key", version="v1")
+        cache.get_secret("api-key", version="v2")
+        cache.get_secret("api-key", version="v1")
+        cache.get_secret("api-key", version="v3")
+        self.assertEqual(sorted(cache._entries),
+                         [("api-key", "SSM_Current"), ("api-key", "v1"), ("api-key", "v3")])
+        self.assertEqual(cache.get_secret("api-key", version="v2"), ("v2", None))
+        self.assertEqual(self.ssm.calls.count(("api-key", "v2")), 2)
+
+    def test_failed_refresh_returns_stale_value(self):
+        cache = self.build_cache(ttl=0, refresh_ahead=None)
+        cache.get_secret("api-key")
+        del self.ssm.secrets[("api-key", "SSM_Current")]
+        self.assertEqual(cache.get_secret("api-key"), ("key-1", None))
+
+    def test_missing_secret_returns_error(self):
+        cache = self.build_cache()
+        value, err = cache.get_secret("missing")
+        self.assertIsNone(value)
+        self.assertIn("ResourceNotFound", err.message)
+
+    def test_changed_secret_emits_event(self):
+        cache = self.build_cache(ttl=0, refresh_ahead=None)
+        events = []
+        done = threading.Event()
+        cache.subscribe(lambda event: (events.append(event), done.set()))
+        cache.get_secret("api-key")
+        self.ssm.secrets[("api-key", "SSM_Current")] = "key-2"
+        cache.get_secret("api-key")
+        self.assertTrue(done.wait(5))
+        self.assertEqual([(event.type, event.secret_name) for event in events],
+                         [("credential_changed", "api-key")])
+
+    def test_invalidate(self):
+        cache = self.build_cache(ttl=60)
+        cache.get_secret("api-key")
+        cache.invalidate("api-key")
+        cache.get_secret("api-key")
+        self.assertEqual(len(self.ssm.calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,276 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""协作式并发模式测试：gevent 场景在打过补丁的子进程中运行，未安装 gevent 时跳过"""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+
+import ssm_rotation_sdk
+from ssm_rotation_sdk import concurrency
+from ssm_rotation_sdk.concurrency import get_concurrency, set_concurrency
+from ssm_rotation_sdk.drivers import get_driver
+
+HAS_GEVENT = importlib.util.find_spec("gevent") is not None
+
+# 子进程公共部分：先打补丁再导入 SDK，注册纯 Python 的桩驱动，SSM 请求由 state["account"] 提供
+GEVENT_PRELUDE = textwrap.dedent("""
+    from gevent import monkey
+    monkey.patch_all()
+
+    import json
+    import time
+    from unittest import mock
+
+    import gevent
+    from ssm_rotation_sdk import Config, DbAccount, DbConfig, DynamicSecretRotationDb, SsmAccount
+    from ssm_rotation_sdk import set_concurrency
+    from ssm_rotation_sdk.drivers import Driver, register_driver
+
+    class StubError(Exception):
+        pass
+
+    class StubModule:
+        Error = StubError
+
+    class StubCursor:
+        description = (("user",),)
+        rowcount = -1
+
+        def __init__(self, conn):
+            self.conn = conn
+
+        def execute(self, sql, params=None):
+            # 模拟一次网络往返：让出给其他协程
+            gevent.sleep(0.001)
+
+        def fetchall(self):
+            return [(self.conn.user,)]
+
+        def close(self):
+            pass
+
+    class StubConnection:
+        opened = []
+
+        def __init__(self, user):
+            self.user = user
+            self.closed = False
+            StubConnection.opened.append(self)
+
+        def ping(self):
+            pass
+
+        def cursor(self, **kwargs):
+            return StubCursor(self)
+
+        def commit(self):
+            pass
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            self.closed = True
+
+    class StubDriver(Driver):
+        name = "gevent-stub"
+        cooperative = True
+
+        def __init__(self):
+            Driver.__init__(self)
+            self._module = StubModule
+
+        def connect(self, params):
+            gevent.sleep(0.001)
+            return StubConnection(params["user"])
+
+        def reset_session(self, conn):
+            pass
+
+    register_driver("gevent-stub", StubDriver)
+    state = {"account": DbAccount("user_a", "pwd")}
+
+    def build_config(**params):
+        db_params = {"secret_name": "test", "ip_address": "127.0.0.1", "port": 3306,
+                     "driver": "gevent-stub", "pool_size": 10, "borrow_timeout": 10}
+        db_params.update(params)
+        return Config(params={
+            "db_config": DbConfig(params=db_params),
+            "ssm_service_config": SsmAccount.with_cam_role("role", "ap-guangzhou"),
+            "WATCH_FREQ": 3600,
+        })
+""")
+
+
+def run_gevent(script):
+    env = dict(os.environ)
+    src = os.path.dirname(os.path.dirname(os.path.abspath(ssm_rotation_sdk.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+    proc = subprocess.run([sys.executable, "-c", GEVENT_PRELUDE + textwrap.dedent(script)],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, timeout=120)
+    if proc.returncode != 0:
+        raise AssertionError(proc.stderr.decode("utf-8", "replace"))
+    return json.loads(proc.stdout.decode("utf-8").strip().splitlines()[-1])
+
+
+class TestConcurrencySetting(unittest.TestCase):
+    """验证并发模式的设置与驱动、连接池配置的兼容性检查"""
+
+    def tearDown(self):
+        set_concurrency("threading")
+
+    def test_default_is_threading(self):
+        self.assertFalse(get_concurrency().cooperative)
+        self.assertEqual("threading", get_concurrency().name)
+
+    def test_unknown_concurrency(self):
+        with self.assertRaises(ValueError):
+            set_concurrency("asyncio")
+
+    @unittest.skipUnless(HAS_GEVENT, "gevent is not installed")
+    def test_gevent_requires_monkey_patching(self):
+        from gevent import monkey
+        if monkey.is_module_patched("socket"):
+            self.skipTest("test process is monkey patched")
+        with self.assertRaises(RuntimeError) as ctx:
+            set_concurrency("gevent")
+        self.assertIn("patch_all", str(ctx.exception))
+        self.assertEqual("threading", get_concurrency().name)
+
+    def test_driver_support(self):
+        gevent = concurrency.GeventConcurrency()
+        eventlet = concurrency.EventletConcurrency()
+        threading_mode = concurrency.Concurrency()
+        self.assertTrue(get_driver("mysql-connector").supports_concurrency(threading_mode))
+        self.assertFalse(get_driver("mysql-connector").supports_concurrency(gevent))
+        self.assertFalse(get_driver("mysql-connector-c").supports_concurrency(gevent))
+        self.assertFalse(get_driver("mysqlclient").supports_concurrency(gevent))
+        self.assertTrue(get_driver("mysql-connector-pure").supports_concurrency(gevent))
+        self.assertTrue(get_driver("pymysql").supports_concurrency(eventlet))
+        self.assertTrue(get_driver("psycopg").supports_concurrency(gevent))
+        self.assertFalse(get_driver("psycopg").supports_concurrency(eventlet))
+
+
+@unittest.skipUnless(HAS_GEVENT, "gevent is not installed")
+class TestGeventMode(unittest.TestCase):
+    """在 gevent.monkey.patch_all() 的子进程中验证借出、轮转与 SSM 超时"""
+
+    def test_thousands_of_greenlets_share_small_pool(self):
+        result = run_gevent("""
+            with mock.patch("ssm_rotation_sdk.db.get_current_account",
+                            side_effect=lambda *args: (state["account"], None)):
+                set_concurrency("gevent")
+                db = DynamicSecretRotationDb()
+                err = db.init(build_config())
+                assert err is None, err.message
+                users, errors = [], []
+
+                def borrow():
+                    try:
+                        users.append(db.execute("SELECT 1")[0][0])
+                    except Exception as exc:
+                        errors.append(repr(exc))
+
+                started = time.time()
+                greenlets = [gevent.spawn(borrow) for _ in range(2000)]
+                gevent.sleep(0.05)
+                state["account"] = DbAccount("user_b", "pwd")
+                db._refresh_pool(force=False)
+                gevent.joinall(greenlets, timeout=60)
+                elapsed = time.time() - started
+                stats = db.pool_stats()[0]
+                db.close()
+            print(json.dumps({
+                "users": sorted(set(users)), "count": len(users), "errors": errors[:3],
+                "elapsed": elapsed, "opened": len(StubConnection.opened),
+                "leaked": sum(1 for conn in StubConnection.opened if not conn.closed),
+                "outstanding": stats["outstanding"],
+                "event": type(db._stop_event).__module__,
+            }))
+        """)
+        self.assertEqual([], result["errors"])
+        self.assertEqual(2000, result["count"])
+        self.assertEqual(["user_a", "user_b"], result["users"])
+        self.assertEqual(0, result["outstanding"])
+        self.assertEqual(0, result["leaked"])
+        # 两个连接池各 10 条连接：借出方等待归还而不是各自失败或建连
+        self.assertLessEqual(result["opened"], 20)
+        self.assertTrue(result["event"].startswith("gevent"))
+
+    def test_instance_created_before_set_concurrency(self):
+        result = run_gevent("""
+            db = DynamicSecretRotationDb()
+            with mock.patch("ssm_rotation_sdk.db.get_current_account",
+                            side_effect=lambda *args: (state["account"], None)):
+                set_concurrency("gevent")
+                err = db.init(build_config())
+                assert err is None, err.message
+                ticks = []
+                ticker = gevent.spawn(lambda: [ticks.append(gevent.sleep(0.01)) for _ in range(5)])
+                # Watcher 在协程中等待，不会阻塞事件循环
+                ticker.join(timeout=5)
+                kinds = [type(db._stop_event).__module__, type(db._wakeup).__module__]
+                db.close()
+            print(json.dumps({"ticks": len(ticks), "kinds": kinds}))
+        """)
+        self.assertEqual(5, result["ticks"])
+        self.assertTrue(all(kind.startswith("gevent") for kind in result["kinds"]))
+
+    def test_hung_ssm_request_times_out_without_blocking_hub(self):
+        result = run_gevent("""
+            from gevent.server import StreamServer
+            from ssm_rotation_sdk import Transport, requester
+
+            # 接受连接但从不响应的 SSM 接入点
+            server = StreamServer(("127.0.0.1", 0), lambda sock, address: gevent.sleep(30))
+            server.start()
+            set_concurrency("gevent")
+            requester._HTTP_TIMEOUT = 0.3
+            ssm_acc = (SsmAccount.with_permanent_credential("AKIDtest", "key", "ap-guangzhou")
+                       .with_endpoint("http://127.0.0.1:%d" % server.server_port)
+                       .with_transport(Transport.BUILTIN))
+            ticks = []
+            ticker = gevent.spawn(lambda: [ticks.append(gevent.sleep(0.01)) for _ in range(10)])
+            started = time.time()
+            value, err = requester._get_secret_value("db-secret", ssm_acc)
+            elapsed = time.time() - started
+            ticker.join(timeout=5)
+            server.stop()
+            print(json.dumps({"error": err.message, "elapsed": elapsed, "ticks": len(ticks)}))
+        """)
+        self.assertIn("timed out", result["error"])
+        self.assertLess(result["elapsed"], 5)
+        self.assertEqual(10, result["ticks"])
+
+    def test_rejects_c_extension_driver(self):
+        result = run_gevent("""
+            set_concurrency("gevent")
+            err = build_config(driver="mysql-connector").validate()
+            striped = build_config(driver="gevent-stub", pool_stripes=2, borrow_timeout=None).validate()
+            print(json.dumps({"driver": err.message, "striped": striped.message}))
+        """)
+        self.assertIn("blocks the gevent hub", result["driver"])
+        self.assertIn("pool_stripes", result["striped"])
+
+
+if __name__ == "__main__":
+    unittest.main()
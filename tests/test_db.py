@@ -0,0 +1,898 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""DynamicSecretRotationDb 轮转行为测试（使用桩连接池，不依赖外部服务）"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+import mysql.connector
+
+from ssm_rotation_sdk import (
+    Config,
+    ConnectionUnavailableError,
+    DbAccount,
+    DbConfig,
+    DynamicSecretRotationDb,
+    EVENT_CREDENTIAL_CHANGED,
+    EVENT_POOL_DRAINED,
+    EVENT_POOL_READY,
+    Error,
+    SsmAccount,
+    with_connection,
+)
+from ssm_rotation_sdk.pool import ConnectionBudget
+
+
+class FakeConnection:
+    """模拟驱动连接，记录建连参数与调用次数。"""
+
+    opened = []
+    # 依次在 execute 时抛出的异常
+    failures = []
+    # 建连前等待的闸门，用于模拟耗时的建池过程
+    gate = None
+
+    def __init__(self, **config):
+        if FakeConnection.gate is not None:
+            FakeConnection.gate.wait(5)
+        self.config = config
+        self.closed = False
+        self.pings = 0
+        self.resets = 0
+        self.rollbacks = 0
+        self.in_transaction = False
+        self.cursors = []
+        FakeConnection.opened.append(self)
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+
+    def reset_session(self):
+        self.resets += 1
+
+    def cursor(self, **kwargs):
+        cursor = FakeCursor(self)
+        self.cursors.append(cursor)
+        return cursor
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def commit(self):
+        return None
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.closed = False
+        self.description = None
+        self.rowcount = -1
+
+    def execute(self, sql, params=None):
+        if FakeConnection.failures:
+            raise FakeConnection.failures.pop(0)
+        if sql.upper().startswith("SELECT"):
+            self.description = [("user",)]
+        else:
+            self.rowcount = 1
+
+    def fetchall(self):
+        return [(self.conn.config["user"],)]
+
+    def close(self):
+        self.closed = True
+
+
+def build_config(**db_params):
+    params = {
+        "secret_name": "test",
+        "ip_address": "10.0.0.1",
+        "port": 3306,
+    }
+    params.update(db_params)
+    return Config(params={
+        "db_config": DbConfig(params=params),
+        "ssm_service_config": SsmAccount.with_cam_role("role", "ap-guangzhou"),
+    })
+
+
+class RotationTestCase(unittest.TestCase):
+    """为每个用例替换 SSM 请求与 MySQL 连接池。"""
+
+    def setUp(self):
+        FakeConnection.opened = []
+        FakeConnection.failures = []
+        FakeConnection.gate = None
+        self.account = DbAccount("user_a", "pwd_a")
+        patchers = [
+            mock.patch("ssm_rotation_sdk.db.get_current_account",
+                       side_effect=lambda *args: (self.account, None)),
+            mock.patch("mysql.connector.connect", FakeConnection),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def open_db(self, config):
+        db = DynamicSecretRotationDb()
+        db.config = config
+        self.assertIsNone(config.validate())
+        db._budget = db._build_budget()
+        self.assertIsNone(db._refresh_pool(force=True))
+        self.addCleanup(db.close)
+        return db
+
+
+class TestReadReplicas(RotationTestCase):
+    """验证只读副本的负载均衡与轮转"""
+
+    REPLICAS = [
+        {"ip_address": "10.0.0.2", "port": 3306},
+        {"ip_address": "10.0.0.3", "port": 3306},
+    ]
+
+    def test_validate_replica_requires_address(self):
+        cfg = DbConfig(params={
+            "secret_name": "test", "ip_address": "10.0.0.1", "port": 3306,
+            "replicas": [{"port": 3306}],
+        })
+        err = cfg.validate()
+        self.assertIsNotNone(err)
+        self.assertIn("replicas[0].ip_address", err.message)
+
+    def test_readonly_uses_least_borrowed_replica(self):
+        db = self.open_db(build_config(replicas=self.REPLICAS))
+        first = db.get_conn(readonly=True)
+        second = db.get_conn(readonly=True)
+        self.assertEqual(
+            sorted([first.pool_name, second.pool_name]),
+            ["ssm_pool_r0", "ssm_pool_r1"],
+        )
+        self.assertEqual(db.get_conn().pool_name, "ssm_pool")
+
+    def test_readonly_latency_policy(self):
+        db = self.open_db(build_config(replicas=self.REPLICAS, load_balance="latency"))
+        db.db_conn.replicas[0].latency = 0.02
+        db.db_conn.replicas[1].latency = 0.001
+        conn = db.get_conn(readonly=True)
+        self.assertEqual(conn.config["host"], "10.0.0.3")
+
+    def test_latency_policy_spreads_reads_across_close_replicas(self):
+        replicas = self.REPLICAS + [{"ip_address": "10.0.0.4", "port": 3306}]
+        db = self.open_db(build_config(replicas=replicas, load_balance="latency"))
+        for replica, latency in zip(db.db_conn.replicas, (0.001, 0.0012, 0.05)):
+            replica.latency = latency
+
+        counts = {}
+        for _ in range(200):
+            conn = db.get_conn(readonly=True)
+            counts[conn.config["host"]] = counts.get(conn.config["host"], 0) + 1
+            conn.close()
+        self.assertNotIn("10.0.0.4", counts)
+        self.assertGreater(counts["10.0.0.2"], 50)
+        self.assertGreater(counts["10.0.0.3"], 50)
+
+        # 借出中的连接按借出数分摊
+        held = [db.get_conn(readonly=True) for _ in range(4)]
+        self.assertEqual([2, 2], [replica.pool.outstanding for replica in db.db_conn.replicas[:2]])
+        for conn in held:
+            conn.close()
+
+    def test_latency_probe_times_only_ping(self):
+        db = self.open_db(build_config(replicas=self.REPLICAS, load_balance="latency"))
+        replica = db.db_conn.replicas[0]
+        borrow = replica.pool.get_connection
+
+        def slow_borrow():
+            time.sleep(0.05)
+            return borrow()
+
+        with mock.patch.object(replica.pool, "get_connection", side_effect=slow_borrow):
+            self.assertLess(db._measure_latency(replica), 0.02)
+
+    def test_rotation_rebuilds_and_retires_all_endpoints(self):
+        db = self.open_db(build_config(replicas=self.REPLICAS))
+        old_pools = db.db_conn.pools()
+        self.assertEqual(len(old_pools), 3)
+
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(db._refresh_pool(force=False))
+        new_pools = db.db_conn.pools()
+        self.assertEqual(len(new_pools), 3)
+        self.assertEqual(set(item.pool for item in db._retired_pools), set(old_pools))
+
+        # 旧连接池没有借出中的连接，退休时立即排空
+        self.assertTrue(all(pool.closed for pool in old_pools))
+        users = set(conn.config["user"] for conn in FakeConnection.opened if not conn.closed)
+        self.assertEqual(users, {"user_b"})
+        db._cleanup_retired_pools(force=False)
+        self.assertEqual(db._retired_pools, [])
+
+
+class TestSecretHandling(RotationTestCase):
+    def test_password_only_revealed_at_connect(self):
+        db = self.open_db(build_config())
+        self.assertEqual(FakeConnection.opened[0].config["password"], "pwd_a")
+        self.assertNotIn("password", db.db_conn.pool._connect.args[0])
+
+    def test_rotation_wipes_retired_secret(self):
+        db = self.open_db(build_config())
+        old_account = self.account
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(db._refresh_pool(force=False))
+        self.assertEqual(old_account.password, "")
+        self.assertEqual(self.account.password, "pwd_b")
+
+
+    def test_in_flight_connect_keeps_retired_secret(self):
+        db = self.open_db(build_config(pool_size=2, min_idle=1))
+        old_account = self.account
+        pool = db.db_conn.pool
+        held = db.get_conn()
+        entered, release = threading.Event(), threading.Event()
+        connect = pool._connect
+
+        def slow_connect():
+            entered.set()
+            release.wait(5)
+            return connect()
+
+        pool._connect = slow_connect
+        borrowed = []
+        thread = threading.Thread(target=lambda: borrowed.append(db.get_conn()))
+        thread.start()
+        self.assertTrue(entered.wait(5))
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(db._refresh_pool(force=False))
+        release.set()
+        thread.join(5)
+
+        # 轮转前已开始的建连仍使用旧密码，退休连接池排空后才清零
+        self.assertEqual(borrowed[0].config["password"], "pwd_a")
+        self.assertEqual(old_account.password, "pwd_a")
+        borrowed[0].close()
+        held.close()
+        self.assertEqual(old_account.password, "")
+
+
+class TestCredentialOnly(RotationTestCase):
+    def test_validate_rejects_min_idle(self):
+        err = build_config(credential_only=True, min_idle=1).db_config.validate()
+        self.assertEqual(err.message, "min_idle must be 0 with credential_only")
+
+    def test_pools_keep_no_connections_across_rotation(self):
+        db = self.open_db(build_config(credential_only=True, replicas=TestReadReplicas.REPLICAS))
+        self.assertTrue(all(conn.closed for conn in FakeConnection.opened))
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(db._refresh_pool(force=False))
+        db._maintain_pools()
+        self.assertEqual([pool.idle_count for pool in db.db_conn.pools()], [0, 0, 0])
+        self.assertTrue(all(conn.closed for conn in FakeConnection.opened))
+        # 连接参数仍然可用，get_conn() 按需建连
+        self.assertEqual(db._connect_params()[1]["password"], "pwd_b")
+
+
+class TestRotationEvents(RotationTestCase):
+    def collect_events(self, db, count):
+        events = []
+        done = threading.Event()
+
+        def listener(event):
+            events.append(event)
+            if len(events) >= count:
+                done.set()
+
+        db.subscribe(listener)
+        return events, done
+
+    def test_rotation_emits_changed_ready_and_drained(self):
+        db = self.open_db(build_config())
+        old_pool = db.db_conn.pool
+        events, done = self.collect_events(db, 3)
+        self.account = DbAccount("user_b", "pwd_b")
+        self.account.version_id = "v2"
+        self.assertIsNone(db._refresh_pool(force=False))
+        self.assertTrue(done.wait(5))
+
+        self.assertEqual([event.type for event in events],
+                         [EVENT_CREDENTIAL_CHANGED, EVENT_POOL_READY, EVENT_POOL_DRAINED])
+        changed, ready, drained = events
+        self.assertEqual((changed.user_name, changed.previous_user_name), ("user_b", "user_a"))
+        self.assertEqual((changed.version_id, changed.generation), ("v2", 2))
+        self.assertEqual(ready.pool_name, db.db_conn.pool.pool_name)
+        self.assertEqual((drained.pool_name, drained.user_name, drained.generation),
+                         (old_pool.pool_name, "user_a", 1))
+
+    def test_forced_refresh_with_same_credential_is_not_a_change(self):
+        db = self.open_db(build_config())
+        events, done = self.collect_events(db, 2)
+        self.assertIsNone(db._refresh_pool(force=True))
+        self.assertTrue(done.wait(5))
+        self.assertEqual([event.type for event in events], [EVENT_POOL_READY, EVENT_POOL_DRAINED])
+
+
+class TestPendingPrewarm(RotationTestCase):
+    def setUp(self):
+        RotationTestCase.setUp(self)
+        self.pending = None
+        self.pending_error = Error("ssm GetSecretValue error: [ResourceNotFound] version not found",
+                                   "ResourceNotFound")
+        patcher = mock.patch("ssm_rotation_sdk.db.get_account", side_effect=self.get_pending)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        config = build_config()
+        config.watch_pending = True
+        self.db = self.open_db(config)
+
+    def get_pending(self, secret_name, ssm_acc, version_id):
+        self.assertEqual(version_id, "SSM_Pending")
+        if self.pending is None:
+            return None, self.pending_error
+        return self.pending, None
+
+    def test_pending_pool_is_promoted_without_connecting(self):
+        self.pending = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(self.db._run_refresh(False, True))
+        warm = self.db._warm_cache
+        self.assertEqual(warm.user_name, "user_b")
+        self.assertEqual(self.db.db_conn.user_name, "user_a")
+
+        opened = len(FakeConnection.opened)
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(self.db._refresh_pool(force=False))
+        self.assertIs(self.db.db_conn, warm)
+        self.assertIsNone(self.db._warm_cache)
+        self.assertEqual(len(FakeConnection.opened), opened)
+
+    def test_pending_pool_is_replaced_and_discarded(self):
+        self.pending = DbAccount("user_b", "pwd_b")
+        self.db._run_refresh(False, True)
+        first = self.db._warm_cache
+        self.pending = DbAccount("user_c", "pwd_c")
+        self.db._run_refresh(False, True)
+        self.assertTrue(first.pool.closed)
+        self.assertEqual(self.db._warm_cache.user_name, "user_c")
+
+        self.pending = None
+        self.db._run_refresh(False, True)
+        self.assertIsNone(self.db._warm_cache)
+
+    def test_pending_lookup_failure_keeps_warm_pool(self):
+        self.pending = DbAccount("user_b", "pwd_b")
+        self.db._run_refresh(False, True)
+        warm = self.db._warm_cache
+
+        # 鉴权失败、限流等不表示 SSM_Pending 已不存在
+        self.pending = None
+        self.pending_error = Error("ssm GetSecretValue error: [RequestLimitExceeded] too many requests",
+                                   "RequestLimitExceeded")
+        with self.assertLogs(level="WARNING") as logs:
+            self.db._run_refresh(False, True)
+        self.assertIs(self.db._warm_cache, warm)
+        self.assertFalse(warm.pool.closed)
+        self.assertIn("RequestLimitExceeded", logs.output[0])
+
+    def test_pending_equal_to_current_is_ignored(self):
+        self.pending = DbAccount("user_a", "pwd_a")
+        self.db._run_refresh(False, True)
+        self.assertIsNone(self.db._warm_cache)
+
+
+class TestHotStandby(RotationTestCase):
+    def setUp(self):
+        RotationTestCase.setUp(self)
+        config = build_config(pool_size=3)
+        config.hot_standby = True
+        self.db = self.open_db(config)
+
+    def rotate(self, user, password):
+        self.account = DbAccount(user, password)
+        self.assertIsNone(self.db._refresh_pool(force=False))
+
+    def test_alternating_users_promote_standby(self):
+        pool_a = self.db.db_conn.pool
+        self.rotate("user_b", "pwd_b")
+        pool_b = self.db.db_conn.pool
+        self.assertFalse(pool_a.closed)
+        self.assertIs(self.db._standby_cache.pool, pool_a)
+        self.assertEqual(pool_a.idle_count, 1)
+        self.assertEqual(self.db._retired_pools, [])
+
+        opened = len(FakeConnection.opened)
+        self.rotate("user_a", "pwd_a")
+        self.assertIs(self.db.db_conn.pool, pool_a)
+        self.assertIs(self.db._standby_cache.pool, pool_b)
+        # 提升后只补建收缩掉的连接
+        self.assertEqual(len(FakeConnection.opened) - opened, 2)
+        self.assertEqual(pool_a.idle_count, 3)
+        self.assertEqual(pool_b.idle_count, 1)
+
+    def test_promotion_uses_new_password(self):
+        pool_a = self.db.db_conn.pool
+        self.rotate("user_b", "pwd_b")
+        self.rotate("user_a", "pwd_a2")
+        self.assertIs(self.db.db_conn.pool, pool_a)
+        self.assertEqual(FakeConnection.opened[-1].config["password"], "pwd_a2")
+
+    def test_third_user_retires_standby(self):
+        pool_a = self.db.db_conn.pool
+        self.rotate("user_b", "pwd_b")
+        self.rotate("user_c", "pwd_c")
+        self.assertTrue(pool_a.closed)
+        self.assertEqual(self.db._standby_cache.user_name, "user_b")
+
+
+class TestPreviousFallback(RotationTestCase):
+    def setUp(self):
+        RotationTestCase.setUp(self)
+        # 每次请求 SSM 都返回新的 DbAccount，与真实请求一致（退休连接池会清零旧对象的密码）
+        self.current = ("user_b", "pwd_b")
+        self.previous = ("user_a", "pwd_a")
+        patchers = [
+            mock.patch("ssm_rotation_sdk.db.get_current_account",
+                       side_effect=lambda name, ssm_acc: (DbAccount(*self.current), None)),
+            mock.patch("ssm_rotation_sdk.db.get_account",
+                       side_effect=lambda name, ssm_acc, version: (DbAccount(*self.previous), None)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        config = build_config()
+        config.auth_fallback_window = 60
+        self.current = ("user_a", "pwd_a")
+        self.db = self.open_db(config)
+        self.current = ("user_b", "pwd_b")
+        self.assertIsNone(self.db._refresh_pool(force=False))
+
+    def test_auth_failure_after_rotation_falls_back(self):
+        # 认证失败触发的强制刷新：SSM_Current 仍是 user_b
+        self.assertIsNone(self.db._refresh_pool(force=True))
+        self.assertEqual(self.db.db_conn.user_name, "user_a")
+
+        # 回退窗口内 Watcher 不会切回 user_b，也不会重复建池
+        opened = len(FakeConnection.opened)
+        self.assertIsNone(self.db._refresh_pool(force=False))
+        self.assertEqual(self.db.db_conn.user_name, "user_a")
+        self.assertEqual(len(FakeConnection.opened), opened)
+
+        # 窗口结束后再次尝试新凭据
+        self.db._fallback_until = 0.0
+        self.assertIsNone(self.db._refresh_pool(force=False))
+        self.assertEqual(self.db.db_conn.user_name, "user_b")
+        self.assertIsNone(self.db._failed_conn_key)
+
+    def test_no_fallback_outside_window(self):
+        self.db.db_conn.rotated_at -= 120
+        self.assertIsNone(self.db._refresh_pool(force=True))
+        self.assertEqual(self.db.db_conn.user_name, "user_b")
+
+    def test_no_fallback_when_previous_is_current(self):
+        self.previous = ("user_b", "pwd_b")
+        self.assertIsNone(self.db._refresh_pool(force=True))
+        self.assertEqual(self.db.db_conn.user_name, "user_b")
+        self.assertIsNone(self.db._failed_conn_key)
+
+
+class TestRetiredPoolDrain(RotationTestCase):
+    """验证退休连接池在连接归还时立即断开并及时释放"""
+
+    def rotate(self, db):
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(db._refresh_pool(force=False))
+
+    def test_borrowed_connection_closed_on_return(self):
+        db = self.open_db(build_config(pool_size=2))
+        conn = db.get_conn()
+        raw = conn._entry.conn
+        old_pool = db.db_conn.pool
+        self.rotate(db)
+
+        self.assertTrue(old_pool.closed)
+        self.assertEqual(old_pool.outstanding, 1)
+        self.assertFalse(db._retired_pools[0].drained)
+        self.assertFalse(raw.closed)
+
+        conn.close()
+        self.assertTrue(raw.closed)
+        self.assertTrue(db._retired_pools[0].drained)
+        db._cleanup_retired_pools(force=False)
+        self.assertEqual(db._retired_pools, [])
+
+    def test_deadline_heap_releases_expired_pool(self):
+        db = self.open_db(build_config(pool_size=1))
+        conn = db.get_conn()
+        self.rotate(db)
+        retired = db._retired_pools[0]
+        self.assertEqual(db._next_retire_deadline(), retired.expire_at)
+
+        retired.expire_at = time.time() - 1
+        db._cleanup_retired_pools(force=False)
+        self.assertEqual(db._retired_pools, [])
+        conn.close()
+
+    def test_borrow_from_retired_pool_switches_to_current(self):
+        db = self.open_db(build_config(pool_size=1))
+        old_pool = db.db_conn.pool
+        self.rotate(db)
+        with mock.patch.object(db, "_select_pool", side_effect=[old_pool, db.db_conn.pool]):
+            conn = db.get_conn()
+        self.assertEqual(conn.config["user"], "user_b")
+
+
+class TestConnectionBudget(RotationTestCase):
+    """验证当前池与退休池合计连接数受预算约束"""
+
+    def test_rotation_stays_within_budget(self):
+        config = build_config(pool_size=2)
+        config.max_connections = 3
+        db = self.open_db(config)
+        conn = db.get_conn()
+
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(db._refresh_pool(force=False))
+        stats = db.budget_stats()
+        self.assertEqual(stats["limit"], 3)
+        self.assertLessEqual(stats["peak"], 3)
+        self.assertGreaterEqual(stats["reclaimed"], 1)
+        open_conns = [item for item in FakeConnection.opened if not item.closed]
+        self.assertLessEqual(len(open_conns), 3)
+
+        conn.close()
+        self.assertEqual(db.budget_stats()["in_use"], 2)
+
+    def test_borrow_throttled_when_budget_exhausted(self):
+        config = build_config(pool_size=3, min_idle=1)
+        config.max_connections = 1
+        config.borrow_retry_count = 1
+        db = self.open_db(config)
+        first = db.get_conn()
+        self.assertIsNone(db.get_conn())
+        self.assertGreaterEqual(db.budget_stats()["denied"], 1)
+        first.close()
+        self.assertIsNotNone(db.get_conn())
+
+    def test_conflicting_process_limit_is_rejected(self):
+        self.addCleanup(ConnectionBudget.reset_process)
+        first_config = build_config(pool_size=1)
+        first_config.process_max_connections = 4
+        first = DynamicSecretRotationDb()
+        self.addCleanup(first.close)
+        self.assertIsNone(first.init(first_config))
+
+        second_config = build_config(pool_size=1)
+        second_config.process_max_connections = 10
+        second = DynamicSecretRotationDb()
+        self.addCleanup(second.close)
+        err = second.init(second_config)
+        self.assertIn("process connection budget is already 4", err.message)
+        self.assertEqual(first.budget_stats()["parent"]["limit"], 4)
+
+    def test_process_budget_released_when_last_instance_closes(self):
+        self.addCleanup(ConnectionBudget.reset_process)
+        instances = []
+        for _ in range(2):
+            config = build_config(pool_size=1)
+            config.process_max_connections = 4
+            db = DynamicSecretRotationDb()
+            self.addCleanup(db.close)
+            self.assertIsNone(db.init(config))
+            instances.append(db)
+        self.assertEqual(instances[0].budget_stats()["parent"]["in_use"], 2)
+
+        instances[0].close()
+        self.assertEqual(instances[1].budget_stats()["parent"]["in_use"], 1)
+        instances[1].close()
+
+        # 最后一个实例关闭后可以用新的上限重新初始化
+        config = build_config(pool_size=1)
+        config.process_max_connections = 10
+        db = DynamicSecretRotationDb()
+        self.addCleanup(db.close)
+        self.assertIsNone(db.init(config))
+        stats = db.budget_stats()["parent"]
+        self.assertEqual((stats["limit"], stats["in_use"]), (10, 1))
+
+
+class TestConnectionHelpers(RotationTestCase):
+    """验证上下文管理器与装饰器总是归还连接"""
+
+    def test_connection_returns_and_rolls_back_on_error(self):
+        db = self.open_db(build_config(pool_size=1))
+        with self.assertRaises(ValueError):
+            with db.connection() as conn:
+                raw = conn._entry.conn
+                raise ValueError("boom")
+        self.assertEqual(raw.rollbacks, 1)
+        self.assertEqual(db.db_conn.pool.outstanding, 0)
+
+    def test_cursor_closes_cursor_and_connection(self):
+        db = self.open_db(build_config(pool_size=1))
+        with db.cursor() as cur:
+            cur.execute("SELECT 1")
+        self.assertTrue(cur.closed)
+        self.assertEqual(db.db_conn.pool.outstanding, 0)
+        self.assertEqual(db.pool_stats()[0]["returns"], 2)
+
+    def test_connection_unavailable_raises(self):
+        db = DynamicSecretRotationDb()
+        with self.assertRaises(ConnectionUnavailableError):
+            with db.connection():
+                pass
+
+    def test_with_connection_injects_and_reuses(self):
+        db = self.open_db(build_config(pool_size=1))
+
+        @with_connection(db)
+        def inner(conn=None):
+            return conn
+
+        @with_connection(db)
+        def outer(conn=None):
+            return conn, inner(conn=conn)
+
+        first, second = outer()
+        self.assertIs(first, second)
+        self.assertEqual(db.db_conn.pool.outstanding, 0)
+
+
+class TestSessionInit(RotationTestCase):
+    """验证 session_init 在轮转后的新连接上同样生效"""
+
+    def test_validate_session_init(self):
+        err = build_config(session_init="SET time_zone = '+08:00'").validate()
+        self.assertIn("session_init", err.message)
+
+    def test_session_init_applied_to_rotated_pool(self):
+        executed = []
+        config = build_config(pool_size=1, reset_session="tracked",
+                              session_init=lambda conn: executed.append(conn.config["user"]))
+        db = self.open_db(config)
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(db._refresh_pool(force=True))
+        db.execute("SELECT 1")
+        self.assertEqual(["user_a", "user_b"], executed)
+
+
+class TestThreadAffinity(RotationTestCase):
+    """验证轮转后线程保留的旧凭据连接被断开"""
+
+    def test_rotation_discards_sticky_connections(self):
+        db = self.open_db(build_config(pool_size=1, thread_affinity=True))
+        conn = db.get_conn()
+        old = conn._entry.conn
+        conn.close()
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(db._refresh_pool(force=True))
+        self.assertTrue(old.closed)
+        conn = db.get_conn()
+        self.assertEqual("user_b", conn.config["user"])
+        conn.close()
+
+    def test_validate_affinity_idle_timeout(self):
+        err = build_config(thread_affinity=True, affinity_idle_timeout=0).validate()
+        self.assertIn("affinity_idle_timeout", err.message)
+
+
+class TestStripedPool(RotationTestCase):
+    """验证分片连接池参与轮转"""
+
+    def test_striped_pool_rotates(self):
+        db = self.open_db(build_config(pool_size=4, pool_stripes=2))
+        self.assertEqual(2, len(db.db_conn.pool.stripes))
+        self.assertEqual(4, len(FakeConnection.opened))
+        conn = db.get_conn()
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(db._refresh_pool(force=True))
+        self.assertEqual("user_b", db.execute("SELECT 1")[0][0])
+        conn.close()
+        self.assertTrue(all(item.closed for item in FakeConnection.opened[:4]))
+
+    def test_validate_pool_stripes(self):
+        err = build_config(pool_size=2, pool_stripes=3).validate()
+        self.assertIn("pool_stripes", err.message)
+
+    def test_validate_borrow_timeout_with_stripes(self):
+        err = build_config(pool_size=4, pool_stripes=2, borrow_timeout=1).validate()
+        self.assertIn("borrow_timeout", err.message)
+
+
+class TestConcurrentRotation(RotationTestCase):
+    """验证多线程借出与反复轮转并发时不出错、不泄漏连接（在 python3.13t 上运行时无 GIL 保护）"""
+
+    def run_concurrently(self, config, threads=8, rotations=20):
+        config.max_connections = config.db_config.pool_size * 3
+        db = self.open_db(config)
+        users = ["user_%d" % index for index in range(rotations + 1)]
+        seen = set()
+        errors = []
+        stop = threading.Event()
+        start = threading.Barrier(threads + 1)
+
+        def borrow():
+            start.wait()
+            while not stop.is_set():
+                try:
+                    rows = db.execute("SELECT 1", deadline=2)
+                    seen.add(rows[0][0])
+                except Exception as exc:
+                    errors.append(exc)
+                    return
+                # 让出 CPU，避免有 GIL 时后台建连线程长时间得不到调度
+                time.sleep(0.001)
+
+        workers = [threading.Thread(target=borrow) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        start.wait()
+        for user in users[1:]:
+            self.account = DbAccount(user, "pwd")
+            self.assertIsNone(db._refresh_pool(force=False))
+            time.sleep(0.01)
+        stop.set()
+        for worker in workers:
+            worker.join(5)
+
+        self.assertEqual([], errors)
+        self.assertTrue(seen <= set(users) | {"user_a"})
+        db._cleanup_retired_pools(force=True)
+        current = db.db_conn.pool
+        current.release_sticky(0)
+        self.assertEqual(0, current.outstanding)
+        open_conns = [item for item in FakeConnection.opened if not item.closed]
+        self.assertTrue(all(item.config["user"] == users[-1] for item in open_conns))
+        self.assertEqual(len(open_conns), db.budget_stats()["in_use"])
+        return db
+
+    def test_rotation_under_concurrent_borrow(self):
+        self.run_concurrently(build_config(pool_size=4))
+
+    def test_striped_affinity_rotation_under_concurrent_borrow(self):
+        self.run_concurrently(build_config(pool_size=4, pool_stripes=2, thread_affinity=True))
+
+
+class TestExecuteRetry(RotationTestCase):
+    """验证 execute 在凭据轮转与连接断开时的重试"""
+
+    def test_auth_failure_retries_on_new_pool(self):
+        db = self.open_db(build_config())
+        self.account = DbAccount("user_b", "pwd_b")
+        FakeConnection.failures = [mysql.connector.errors.ProgrammingError(msg="denied", errno=1045)]
+        self.assertEqual(db.execute("SELECT user()"), [("user_b",)])
+        self.assertEqual(db.db_conn.user_name, "user_b")
+
+    def test_connection_lost_not_retried_when_not_idempotent(self):
+        db = self.open_db(build_config())
+        FakeConnection.failures = [mysql.connector.errors.OperationalError(msg="lost", errno=2013)]
+        with self.assertRaises(mysql.connector.errors.OperationalError):
+            db.execute("UPDATE t SET a = a + 1", idempotent=False)
+        self.assertEqual(db.db_conn.pool.outstanding, 0)
+
+    def test_connection_lost_retried_when_idempotent(self):
+        db = self.open_db(build_config())
+        FakeConnection.failures = [mysql.connector.errors.OperationalError(msg="lost", errno=2013)]
+        self.assertEqual(db.execute("UPDATE t SET a = 1"), 1)
+
+    def test_other_errors_are_raised(self):
+        db = self.open_db(build_config())
+        FakeConnection.failures = [mysql.connector.errors.ProgrammingError(msg="syntax", errno=1064)]
+        with self.assertRaises(mysql.connector.errors.ProgrammingError):
+            db.execute("SELEC 1")
+
+    def test_non_driver_error_does_not_leak_connection(self):
+        db = self.open_db(build_config(pool_size=1))
+        FakeConnection.failures = [TypeError("not all arguments converted")]
+        with self.assertRaises(TypeError):
+            db.execute("SELECT %s", ("a", "b"))
+        self.assertEqual(db.db_conn.pool.outstanding, 0)
+        self.assertEqual(db.execute("SELECT user()"), [("user_a",)])
+
+    def test_deadline_bounds_refresh_wait_when_borrowing(self):
+        config = build_config()
+        config.retry_deadline_ms = 2000
+        db = self.open_db(config)
+        gate = threading.Event()
+        self.addCleanup(gate.set)
+        denied = mysql.connector.errors.ProgrammingError(msg="denied", errno=1045)
+
+        with mock.patch.object(db.db_conn.pool, "get_connection", side_effect=denied), \
+                mock.patch.object(db, "_refresh_pool", side_effect=lambda force=False: gate.wait(5)):
+            started = time.time()
+            with self.assertRaises(ConnectionUnavailableError):
+                db.execute("SELECT 1", deadline=0.2)
+            self.assertLess(time.time() - started, 1)
+
+    def test_concurrent_refreshes_share_one_build(self):
+        db = self.open_db(build_config())
+        calls = []
+
+        def slow_refresh(force=False):
+            calls.append(force)
+            time.sleep(0.1)
+            return None
+
+        with mock.patch.object(db, "_refresh_pool", side_effect=slow_refresh):
+            threads = [threading.Thread(target=db._refresh_shared, args=(1,)) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(calls, [True])
+
+
+class TestBackgroundBuild(RotationTestCase):
+    """验证新连接池在后台线程中建立，不阻塞 Watcher 与借出方"""
+
+    def test_watcher_does_not_wait_for_pool_build(self):
+        db = self.open_db(build_config(pool_size=2))
+        self.account = DbAccount("user_b", "pwd_b")
+        FakeConnection.gate = threading.Event()
+
+        started = time.time()
+        db._watch_change()
+        self.assertLess(time.time() - started, 1)
+        self.assertEqual(db.db_conn.user_name, "user_a")
+        conn = db.get_conn()
+        self.assertEqual(conn.config["user"], "user_a")
+        conn.close()
+
+        FakeConnection.gate.set()
+        self.assertIsNone(db._refresh_future.result(timeout=5))
+        self.assertEqual(db.db_conn.user_name, "user_b")
+        self.assertEqual(db.watch_failures, 0)
+
+    def test_stuck_build_counts_as_watch_failure(self):
+        db = self.open_db(build_config(pool_size=1))
+        db.config.pool_build_timeout = 0.05
+        self.account = DbAccount("user_b", "pwd_b")
+        FakeConnection.gate = threading.Event()
+        self.addCleanup(FakeConnection.gate.set)
+
+        db._watch_change()
+        future = db._refresh_future
+        time.sleep(0.1)
+        db._watch_change()
+        self.assertIs(db._refresh_future, future)
+        self.assertEqual(db.watch_failures, 1)
+        self.assertIn("still pending", db.last_error)
+
+        FakeConnection.gate.set()
+        future.result(timeout=5)
+        self.assertEqual(db.watch_failures, 0)
+
+    def test_close_cancels_in_progress_build(self):
+        db = self.open_db(build_config(pool_size=2))
+        self.account = DbAccount("user_b", "pwd_b")
+        FakeConnection.gate = threading.Event()
+        db._watch_change()
+        future = db._refresh_future
+        time.sleep(0.05)
+
+        db.close()
+        FakeConnection.gate.set()
+        self.assertIsNotNone(future.result(timeout=5))
+        self.assertIsNone(db.db_conn)
+        self.assertTrue(all(conn.closed for conn in FakeConnection.opened))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,233 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""驱动后端测试：驱动选择、建连参数与错误分类"""
+
+import unittest
+from unittest import mock
+
+import mysql.connector
+
+from ssm_rotation_sdk import DbConfig, drivers
+from ssm_rotation_sdk.drivers import (
+    DRIVER_MYSQL_CONNECTOR,
+    DRIVER_MYSQL_CONNECTOR_C,
+    DRIVER_PSYCOPG,
+    DRIVER_PYMYSQL,
+    Driver,
+    MySQLConnectorDriver,
+    PsycopgDriver,
+    PyMySQLDriver,
+    driver_names,
+    get_driver,
+    register_driver,
+)
+
+from tests.test_db import FakeConnection, RotationTestCase, build_config
+
+
+class FakeDriverError(Exception):
+    """模拟 PyMySQL / mysqlclient 的异常：错误码位于 args[0]。"""
+
+
+class RecordingDriver(Driver):
+    name = "recording"
+    module_name = "mysql.connector"
+
+    def __init__(self):
+        Driver.__init__(self)
+        self.connects = []
+        self.pings = 0
+
+    def connect(self, params):
+        self.connects.append(params)
+        return FakeConnection(**params)
+
+    def ping(self, conn):
+        self.pings += 1
+
+
+class TestDriverRegistry(unittest.TestCase):
+
+    def test_builtin_names(self):
+        names = driver_names()
+        for name in (DRIVER_MYSQL_CONNECTOR, DRIVER_MYSQL_CONNECTOR_C, DRIVER_PYMYSQL):
+            self.assertIn(name, names)
+
+    def test_instances_are_shared(self):
+        self.assertIs(get_driver(DRIVER_MYSQL_CONNECTOR), get_driver(DRIVER_MYSQL_CONNECTOR))
+
+    def test_driver_instance_passthrough(self):
+        driver = RecordingDriver()
+        self.assertIs(get_driver(driver), driver)
+
+    def test_unknown_driver(self):
+        with self.assertRaises(ValueError):
+            get_driver("oracle")
+
+    def test_register_driver(self):
+        register_driver("recording", RecordingDriver)
+        self.addCleanup(drivers._FACTORIES.pop, "recording", None)
+        self.addCleanup(drivers._instances.pop, "recording", None)
+        self.assertIsInstance(get_driver("recording"), RecordingDriver)
+
+
+class TestDriverBehaviour(unittest.TestCase):
+
+    def test_c_extension_driver_passes_use_pure(self):
+        with mock.patch("mysql.connector.connect") as connect:
+            get_driver(DRIVER_MYSQL_CONNECTOR_C).connect({"user": "u", "password": "p"})
+        connect.assert_called_once_with(user="u", password="p", use_pure=False)
+
+    def test_default_driver_keeps_library_default(self):
+        with mock.patch("mysql.connector.connect") as connect:
+            MySQLConnectorDriver().connect({"user": "u"})
+        connect.assert_called_once_with(user="u")
+
+    def test_pymysql_port_is_int(self):
+        driver = PyMySQLDriver()
+        driver._module = mock.Mock()
+        driver.connect({"host": "h", "port": "3306"})
+        driver._module.connect.assert_called_once_with(host="h", port=3306)
+
+    def test_connect_timeout_only_for_connect_scoped_parameter(self):
+        params = {"host": "h"}
+        self.assertEqual({"host": "h", "connect_timeout": 3}, PyMySQLDriver().with_connect_timeout(params, 2.2))
+        self.assertEqual({"host": "h"}, params)
+        self.assertEqual({"connect_timeout": "9"},
+                         PyMySQLDriver().with_connect_timeout({"connect_timeout": "9"}, 2))
+        self.assertEqual({"connect_timeout": 1}, PsycopgDriver().with_connect_timeout({}, 0))
+        # mysql-connector 的 connection_timeout 同时限制后续读写，不自动设置
+        self.assertEqual(params, MySQLConnectorDriver().with_connect_timeout(params, 2))
+
+    def test_error_code_from_errno(self):
+        driver = get_driver(DRIVER_MYSQL_CONNECTOR)
+        self.assertTrue(driver.is_authentication_error(mysql.connector.Error(msg="x", errno=1045)))
+        self.assertTrue(driver.is_connection_lost(mysql.connector.Error(msg="x", errno=2013)))
+        self.assertFalse(driver.is_connection_lost(mysql.connector.Error(msg="x", errno=1064)))
+
+    def test_error_code_from_args(self):
+        driver = PyMySQLDriver()
+        self.assertTrue(driver.is_authentication_error(FakeDriverError(1698, "denied")))
+        self.assertTrue(driver.is_connection_lost(FakeDriverError(2006, "MySQL server has gone away")))
+        self.assertFalse(driver.is_connection_lost(FakeDriverError("not a code")))
+
+    def test_reset_session_falls_back_to_rollback(self):
+        conn = mock.Mock()
+        PyMySQLDriver().reset_session(conn)
+        conn.rollback.assert_called_once_with()
+
+
+class FakePgError(Exception):
+    """模拟 psycopg 异常：SQLSTATE 位于 sqlstate 属性。"""
+
+    def __init__(self, message, sqlstate=None):
+        Exception.__init__(self, message)
+        self.sqlstate = sqlstate
+
+
+class TestPsycopgDriver(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = PsycopgDriver()
+        self.driver._module = mock.Mock()
+
+    def test_registered(self):
+        self.assertIsInstance(get_driver(DRIVER_PSYCOPG), PsycopgDriver)
+
+    def test_connect_params(self):
+        self.driver.connect({"user": "u", "password": "p", "host": "h", "port": "5432", "database": "app"})
+        self.driver._module.connect.assert_called_once_with(
+            user="u", password="p", host="h", port=5432, dbname="app")
+
+    def test_authentication_error_by_sqlstate(self):
+        self.assertTrue(self.driver.is_authentication_error(FakePgError("denied", "28P01")))
+        self.assertTrue(self.driver.is_authentication_error(FakePgError("denied", "28000")))
+        self.assertFalse(self.driver.is_authentication_error(FakePgError("syntax error", "42601")))
+
+    def test_authentication_error_on_connect(self):
+        exc = FakePgError('connection failed: FATAL:  password authentication failed for user "u"')
+        self.assertTrue(self.driver.is_authentication_error(exc))
+
+    def test_connection_lost(self):
+        self.assertTrue(self.driver.is_connection_lost(FakePgError("x", "08006")))
+        self.assertTrue(self.driver.is_connection_lost(FakePgError("terminating connection", "57P01")))
+        self.assertTrue(self.driver.is_connection_lost(FakePgError("server closed the connection unexpectedly")))
+        self.assertFalse(self.driver.is_connection_lost(FakePgError("x", "23505")))
+
+    def test_reset_session_discards_outside_transaction(self):
+        conn = mock.Mock(autocommit=False)
+        modes = []
+        conn.execute.side_effect = lambda sql: modes.append((sql, conn.autocommit))
+        self.driver.reset_session(conn)
+        conn.rollback.assert_called_once_with()
+        self.assertEqual([("DISCARD ALL", True)], modes)
+        self.assertFalse(conn.autocommit)
+
+    def test_ping_ends_implicit_transaction(self):
+        conn = mock.Mock(autocommit=False)
+        conn.info.transaction_status = self.driver._module.pq.TransactionStatus.IDLE
+        self.driver.ping(conn)
+        conn.execute.assert_called_once_with("SELECT 1")
+        conn.rollback.assert_called_once_with()
+
+
+class TestDriverConfig(RotationTestCase):
+
+    def test_validate_unknown_driver(self):
+        err = DbConfig(params={"secret_name": "s", "ip_address": "h", "port": 3306,
+                               "driver": "oracle"}).validate()
+        self.assertIn("unsupported driver", err.message)
+
+    def test_validate_missing_driver_module(self):
+        driver = RecordingDriver()
+        driver.module_name = "ssm_rotation_sdk_missing_driver"
+        err = DbConfig(params={"secret_name": "s", "ip_address": "h", "port": 3306,
+                               "driver": driver}).validate()
+        self.assertIn("not installed", err.message)
+
+    def test_pool_uses_configured_driver(self):
+        driver = RecordingDriver()
+        db = self.open_db(build_config(pool_size=2, driver=driver))
+        self.assertEqual(2, len(driver.connects))
+        self.assertEqual("pwd_a", driver.connects[0]["password"])
+        self.assertGreaterEqual(driver.pings, 1)
+        conn = db.get_conn()
+        self.assertEqual("user_a", conn.config["user"])
+        conn.close()
+
+    def test_connect_timeout_from_remaining_build_time(self):
+        driver = RecordingDriver()
+        driver.CONNECT_TIMEOUT_PARAM = "connect_timeout"
+        config = build_config(pool_size=1, driver=driver)
+        config.pool_build_timeout = 7
+        self.open_db(config)
+        self.assertEqual(7, driver.connects[0]["connect_timeout"])
+
+    def test_connect_params_are_translated_for_driver(self):
+        driver = PsycopgDriver()
+        driver._module = mock.Mock(Error=Exception)
+        driver._module.connect.side_effect = lambda **params: FakeConnection(**params)
+        driver.ping = driver.reset_session = mock.Mock()
+        db = self.open_db(build_config(pool_size=1, db_name="app", driver=driver))
+        self.assertEqual("app", FakeConnection.opened[0].config["dbname"])
+        _, params = db._connect_params()
+        self.assertEqual("app", params["dbname"])
+        self.assertNotIn("database", params)
+
+
+if __name__ == "__main__":
+    unittest.main()
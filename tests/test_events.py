@@ -0,0 +1,87 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""轮转事件派发器的单元测试"""
+
+import threading
+import unittest
+
+from ssm_rotation_sdk.events import (
+    EVENT_CREDENTIAL_CHANGED,
+    EVENT_POOL_READY,
+    EventDispatcher,
+    RotationEvent,
+)
+
+
+class TestEventDispatcher(unittest.TestCase):
+    def build_dispatcher(self, **kwargs):
+        dispatcher = EventDispatcher("TestEvents", **kwargs)
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def test_delivers_subscribed_types_only(self):
+        dispatcher = self.build_dispatcher()
+        received = []
+        done = threading.Event()
+
+        @dispatcher.subscribe
+        def on_all(event):
+            received.append(("all", event.type))
+            if event.type == EVENT_POOL_READY:
+                done.set()
+
+        dispatcher.subscribe(lambda event: received.append(("changed", event.type)),
+                             events=[EVENT_CREDENTIAL_CHANGED])
+        dispatcher.emit(RotationEvent(EVENT_CREDENTIAL_CHANGED))
+        dispatcher.emit(RotationEvent(EVENT_POOL_READY))
+        self.assertTrue(done.wait(5))
+        self.assertEqual(received, [
+            ("all", EVENT_CREDENTIAL_CHANGED),
+            ("changed", EVENT_CREDENTIAL_CHANGED),
+            ("all", EVENT_POOL_READY),
+        ])
+
+    def test_slow_listener_does_not_block_emit(self):
+        dispatcher = self.build_dispatcher(max_pending=2)
+        gate = threading.Event()
+        dispatcher.subscribe(lambda event: gate.wait(5))
+        for _ in range(10):
+            dispatcher.emit(RotationEvent(EVENT_POOL_READY))
+        # 第一个事件正在派发，最多再排队两个，其余被丢弃
+        self.assertGreaterEqual(dispatcher.dropped, 7)
+        gate.set()
+
+    def test_failing_listener_does_not_stop_others(self):
+        dispatcher = self.build_dispatcher()
+        done = threading.Event()
+        dispatcher.subscribe(lambda event: 1 / 0)
+        dispatcher.subscribe(lambda event: done.set())
+        dispatcher.emit(RotationEvent(EVENT_POOL_READY))
+        self.assertTrue(done.wait(5))
+
+    def test_unsubscribe_and_unknown_type(self):
+        dispatcher = self.build_dispatcher()
+        listener = dispatcher.subscribe(lambda event: None)
+        dispatcher.unsubscribe(listener)
+        dispatcher.emit(RotationEvent(EVENT_POOL_READY))
+        self.assertIsNone(dispatcher._worker)
+        with self.assertRaises(ValueError):
+            dispatcher.subscribe(listener, events=["unknown"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,756 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""ConnectionPool 单元测试（使用桩连接，不依赖外部服务）"""
+
+import threading
+import time
+import unittest
+
+from ssm_rotation_sdk.pool import (
+    BudgetExhaustedError,
+    ConnectionBudget,
+    ConnectionPool,
+    PoolError,
+    PoolExhaustedError,
+    StripedConnectionPool,
+)
+
+
+class StubCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append(sql)
+
+    def close(self):
+        return None
+
+
+class StubConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.pings = 0
+        self.resets = 0
+        self.rollbacks = 0
+        self.commits = 0
+        self.in_transaction = False
+        self.executed = []
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.alive:
+            raise RuntimeError("connection lost")
+
+    def reset_session(self):
+        self.resets += 1
+
+    def cursor(self):
+        return StubCursor(self)
+
+    def commit(self):
+        self.commits += 1
+        self.in_transaction = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class StubFactory:
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self):
+        conn = StubConnection()
+        self.opened.append(conn)
+        return conn
+
+
+def build_pool(pool_size=2, **kwargs):
+    factory = StubFactory()
+    pool = ConnectionPool(factory, pool_size=pool_size, pool_name="test", **kwargs)
+    pool.fill()
+    return pool, factory
+
+
+class TestConnectionPool(unittest.TestCase):
+    """验证借出、归还与关闭"""
+
+    def test_fill_and_exhaust(self):
+        pool, factory = build_pool(pool_size=2)
+        self.assertEqual(len(factory.opened), 2)
+        first = pool.get_connection()
+        second = pool.get_connection()
+        self.assertEqual(pool.outstanding, 2)
+        with self.assertRaises(PoolExhaustedError):
+            pool.get_connection()
+        first.close()
+        first.close()
+        self.assertEqual(pool.outstanding, 1)
+        second.close()
+        self.assertEqual(pool.idle_count, 2)
+
+    def test_returned_proxy_is_unusable(self):
+        pool, _ = build_pool()
+        conn = pool.get_connection()
+        conn.close()
+        with self.assertRaises(PoolError):
+            conn.cursor()
+
+    def test_close_disconnects_idle_and_returned(self):
+        pool, factory = build_pool(pool_size=2)
+        conn = pool.get_connection()
+        self.assertEqual(pool.close(), 1)
+        conn.close()
+        self.assertTrue(all(item.closed for item in factory.opened))
+        with self.assertRaises(PoolError):
+            pool.get_connection()
+
+    def test_drain_calls_back_when_last_connection_returned(self):
+        pool, factory = build_pool(pool_size=2)
+        conn = pool.get_connection()
+        drained = []
+        pool.drain(on_drained=lambda: drained.append(True))
+        self.assertEqual(pool.idle_count, 0)
+        self.assertEqual(drained, [])
+        conn.close()
+        self.assertEqual(drained, [True])
+        self.assertTrue(all(item.closed for item in factory.opened))
+
+
+class TestValidationPolicy(unittest.TestCase):
+    """验证借出校验与会话重置策略"""
+
+    def test_validate_always_replaces_dead_connection(self):
+        pool, factory = build_pool(pool_size=1, validation=ConnectionPool.VALIDATE_ALWAYS)
+        factory.opened[0].alive = False
+        conn = pool.get_connection()
+        self.assertEqual(len(factory.opened), 2)
+        self.assertTrue(factory.opened[0].closed)
+        conn.close()
+
+    def test_validate_idle_skips_recently_used(self):
+        pool, factory = build_pool(pool_size=1, validation_idle_ms=60000)
+        pool.get_connection().close()
+        self.assertEqual(factory.opened[0].pings, 0)
+
+        pool.validation_idle = 0
+        pool.get_connection().close()
+        self.assertEqual(factory.opened[0].pings, 1)
+
+    def test_reset_dirty_skips_unused_connection(self):
+        pool, factory = build_pool(pool_size=1, reset_session=ConnectionPool.RESET_DIRTY)
+        conn = pool.get_connection()
+        conn.ping()
+        conn.close()
+        self.assertEqual(factory.opened[0].resets, 0)
+
+        conn = pool.get_connection()
+        conn.cursor()
+        conn.close()
+        self.assertEqual(factory.opened[0].resets, 1)
+
+    def test_reset_never(self):
+        pool, factory = build_pool(pool_size=1, reset_session=ConnectionPool.RESET_NEVER)
+        conn = pool.get_connection()
+        conn.cursor()
+        conn.close()
+        self.assertEqual(factory.opened[0].resets, 0)
+
+    def test_validate_idle_removes_broken_and_replenishes(self):
+        pool, factory = build_pool(pool_size=2, validation_idle_ms=0)
+        factory.opened[0].alive = False
+        self.assertEqual(pool.validate_idle(), 1)
+        self.assertEqual(pool.idle_count, 2)
+        self.assertEqual(len(factory.opened), 3)
+
+
+class TestSessionInit(unittest.TestCase):
+    """验证 session_init 与 RESET_TRACKED 会话跟踪"""
+
+    INIT = ["SET time_zone = '+08:00'", "SET SESSION sql_mode = 'STRICT_ALL_TABLES'"]
+
+    def test_session_init_runs_once_per_physical_connection(self):
+        pool, factory = build_pool(pool_size=1, session_init=self.INIT,
+                                   reset_session=ConnectionPool.RESET_TRACKED)
+        for _ in range(3):
+            conn = pool.get_connection()
+            conn.cursor().execute("SELECT 1")
+            conn.close()
+        stub = factory.opened[0]
+        self.assertEqual(stub.executed[:2], self.INIT)
+        self.assertEqual(stub.executed.count(self.INIT[0]), 1)
+        self.assertEqual(stub.commits, 1)
+        self.assertEqual(stub.resets, 0)
+
+    def test_session_init_reapplied_after_reset(self):
+        pool, factory = build_pool(pool_size=1, session_init=self.INIT)
+        pool.get_connection().close()
+        stub = factory.opened[0]
+        self.assertEqual(stub.resets, 1)
+        self.assertEqual(stub.executed.count(self.INIT[0]), 2)
+
+    def test_session_init_callable(self):
+        calls = []
+        build_pool(pool_size=2, session_init=calls.append)
+        self.assertEqual(len(calls), 2)
+
+    def test_session_init_failure_closes_connection(self):
+        def fail(conn):
+            raise RuntimeError("init failed")
+        budget = ConnectionBudget(limit=1)
+        factory = StubFactory()
+        pool = ConnectionPool(factory, pool_size=1, session_init=fail, budget=budget)
+        with self.assertRaises(RuntimeError):
+            pool.get_connection()
+        self.assertTrue(factory.opened[0].closed)
+        self.assertEqual(budget.stats()["in_use"], 0)
+
+    def test_invalid_session_init(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool(StubFactory(), session_init="SET time_zone = '+08:00'")
+
+    def test_tracked_resets_after_session_change(self):
+        pool, factory = build_pool(pool_size=1, reset_session=ConnectionPool.RESET_TRACKED)
+        stub = factory.opened[0]
+        for sql in ("SET @x = 1", "USE other", "/* hint */ set names utf8mb4",
+                    "SELECT GET_LOCK('job', 1)", "SELECT 1; SET autocommit = 0"):
+            conn = pool.get_connection()
+            conn.cursor().execute(sql)
+            conn.close()
+        self.assertEqual(stub.resets, 5)
+
+    def test_tracked_rolls_back_open_transaction(self):
+        pool, factory = build_pool(pool_size=1, reset_session=ConnectionPool.RESET_TRACKED)
+        stub = factory.opened[0]
+        conn = pool.get_connection()
+        conn.cursor().execute("UPDATE t SET a = 1")
+        stub.in_transaction = True
+        conn.close()
+        self.assertEqual((stub.resets, stub.rollbacks), (0, 1))
+
+        conn = pool.get_connection()
+        conn.cursor().execute("INSERT INTO t VALUES (1)")
+        conn.commit()
+        conn.close()
+        self.assertEqual((stub.resets, stub.rollbacks), (0, 1))
+
+    def test_tracked_marks_unknown_attributes_dirty(self):
+        pool, factory = build_pool(pool_size=1, reset_session=ConnectionPool.RESET_TRACKED)
+        conn = pool.get_connection()
+        conn.reset_session
+        conn.close()
+        self.assertEqual(factory.opened[0].resets, 1)
+
+    def test_tracked_resets_after_attribute_assignment(self):
+        pool, factory = build_pool(pool_size=1, reset_session=ConnectionPool.RESET_TRACKED)
+        stub = factory.opened[0]
+        conn = pool.get_connection()
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.arraysize = 100
+        self.assertTrue(stub.autocommit)
+        self.assertEqual(cursor.arraysize, 100)
+        conn.close()
+        self.assertEqual(stub.resets, 1)
+        with self.assertRaises(PoolError):
+            conn.autocommit = False
+
+
+class TestThreadAffinity(unittest.TestCase):
+    """验证线程保留连接的复用、接管、空闲释放与关闭"""
+
+    def run_in_thread(self, func):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(func()))
+        thread.start()
+        thread.join()
+        return result[0]
+
+    def test_same_thread_reuses_sticky_connection(self):
+        pool, factory = build_pool(pool_size=2, thread_affinity=True)
+        first = pool.get_connection()
+        raw = first._entry.conn
+        first.close()
+        self.assertEqual(pool.stats()["sticky"], 1)
+        self.assertEqual(pool.outstanding, 1)
+        second = pool.get_connection()
+        self.assertIs(second._entry.conn, raw)
+        self.assertEqual(pool.stats()["sticky"], 0)
+        second.close()
+
+    def test_sticky_connection_is_per_thread(self):
+        pool, _ = build_pool(pool_size=2, thread_affinity=True)
+        conn = pool.get_connection()
+        mine = conn._entry.conn
+        conn.close()
+
+        def borrow():
+            other = pool.get_connection()
+            raw = other._entry.conn
+            other.close()
+            return raw
+
+        self.assertIsNot(self.run_in_thread(borrow), mine)
+        self.assertEqual(pool.stats()["sticky"], 2)
+
+    def test_exhausted_pool_steals_sticky_connection(self):
+        pool, _ = build_pool(pool_size=1, thread_affinity=True)
+        pool.get_connection().close()
+
+        def borrow():
+            conn = pool.get_connection()
+            conn.close()
+            return pool.outstanding
+
+        self.assertEqual(self.run_in_thread(borrow), 1)
+        self.assertEqual(pool.stats()["sticky"], 1)
+
+    def test_release_sticky_after_idle(self):
+        pool, _ = build_pool(pool_size=1, thread_affinity=True, affinity_idle_timeout=60)
+        pool.get_connection().close()
+        self.assertEqual(pool.release_sticky(), 0)
+        self.assertEqual(pool.release_sticky(max_idle=0), 1)
+        self.assertEqual((pool.outstanding, pool.idle_count), (0, 1))
+
+    def test_close_discards_sticky_and_drains(self):
+        pool, factory = build_pool(pool_size=2, thread_affinity=True)
+        pool.get_connection().close()
+        drained = []
+        pool.drain(lambda: drained.append(True))
+        self.assertEqual(drained, [True])
+        self.assertTrue(all(conn.closed for conn in factory.opened))
+        self.assertEqual(pool.stats()["size"], 0)
+
+    def test_sticky_borrow_validates_and_replaces_dead_connection(self):
+        pool, factory = build_pool(pool_size=1, thread_affinity=True,
+                                   validation=ConnectionPool.VALIDATE_ALWAYS)
+        pool.get_connection().close()
+        factory.opened[0].alive = False
+        conn = pool.get_connection()
+        self.assertIs(conn._entry.conn, factory.opened[1])
+        conn.close()
+
+
+class TestStripedPool(unittest.TestCase):
+    """验证分片连接池共享 pool_size、跨分片借用与排空"""
+
+    def build(self, pool_size=8, stripes=4, **kwargs):
+        factory = StubFactory()
+        pool = StripedConnectionPool(factory, pool_size=pool_size, stripes=stripes, pool_name="test", **kwargs)
+        pool.fill()
+        return pool, factory
+
+    def test_fill_spreads_min_idle_across_stripes(self):
+        pool, factory = self.build(pool_size=6, stripes=4)
+        self.assertEqual(len(factory.opened), 6)
+        self.assertEqual([stripe.idle_count for stripe in pool.stripes], [2, 2, 1, 1])
+        self.assertEqual(pool.min_idle, 6)
+
+    def test_borrow_steals_from_neighbours_and_respects_pool_size(self):
+        pool, factory = self.build(pool_size=4, stripes=4)
+        conns = [pool.get_connection() for _ in range(4)]
+        self.assertEqual(len(factory.opened), 4)
+        with self.assertRaises(PoolExhaustedError) as ctx:
+            pool.get_connection()
+        self.assertNotIsInstance(ctx.exception, BudgetExhaustedError)
+        for conn in conns:
+            conn.close()
+        self.assertEqual((pool.outstanding, pool.idle_count), (0, 4))
+
+    def test_creates_in_own_stripe_when_all_idle_taken(self):
+        pool, factory = self.build(pool_size=4, stripes=2, min_idle=0)
+        conn = pool.get_connection()
+        self.assertEqual(len(factory.opened), 1)
+        self.assertEqual(pool.stats()["size"], 1)
+        conn.close()
+
+    def test_outer_budget_exhaustion_is_reported(self):
+        budget = ConnectionBudget(limit=2)
+        pool, _ = self.build(pool_size=4, stripes=2, budget=budget)
+        conns = [pool.get_connection() for _ in range(2)]
+        with self.assertRaises(BudgetExhaustedError):
+            pool.get_connection()
+        for conn in conns:
+            conn.close()
+
+    def test_concurrent_borrow_never_exceeds_pool_size(self):
+        pool, factory = self.build(pool_size=4, stripes=4, min_idle=0)
+        errors = []
+
+        def worker():
+            for _ in range(200):
+                try:
+                    conn = pool.get_connection()
+                except PoolExhaustedError:
+                    continue
+                except Exception as exc:
+                    errors.append(exc)
+                    return
+                conn.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(factory.opened), 4)
+        self.assertEqual(pool.outstanding, 0)
+
+    def test_drain_waits_for_all_stripes(self):
+        pool, factory = self.build(pool_size=4, stripes=2)
+        conns = [pool.get_connection() for _ in range(3)]
+        drained = []
+        pool.drain(lambda: drained.append(True))
+        conns[0].close()
+        conns[1].close()
+        self.assertEqual(drained, [])
+        conns[2].close()
+        self.assertEqual(drained, [True])
+        self.assertTrue(all(conn.closed for conn in factory.opened))
+
+    def test_invalid_stripes(self):
+        with self.assertRaises(ValueError):
+            StripedConnectionPool(StubFactory(), pool_size=2, stripes=3)
+
+
+class TestBorrowTimeout(unittest.TestCase):
+    """验证连接全部借出时等待归还"""
+
+    def test_waiter_receives_returned_connection(self):
+        pool, _ = build_pool(pool_size=1, borrow_timeout=5)
+        conn = pool.get_connection()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(pool.get_connection()))
+        waiter.start()
+        time.sleep(0.05)
+        self.assertEqual(1, len(pool._waiters))
+        conn.close()
+        waiter.join(5)
+        self.assertEqual(1, len(result))
+        self.assertEqual(0, len(pool._waiters))
+        result[0].close()
+
+    def test_timeout_raises_exhausted(self):
+        pool, _ = build_pool(pool_size=1, borrow_timeout=0.05)
+        conn = pool.get_connection()
+        started = time.time()
+        with self.assertRaises(PoolExhaustedError):
+            pool.get_connection()
+        self.assertGreaterEqual(time.time() - started, 0.05)
+        self.assertEqual(0, len(pool._waiters))
+        conn.close()
+
+    def test_discarded_connection_frees_slot_for_waiter(self):
+        pool, factory = build_pool(pool_size=1, borrow_timeout=5)
+        conn = pool.get_connection()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(pool.get_connection()))
+        waiter.start()
+        time.sleep(0.05)
+        conn.invalidate()
+        waiter.join(5)
+        self.assertEqual(2, len(factory.opened))
+        result[0].close()
+
+    def test_close_wakes_waiters(self):
+        pool, _ = build_pool(pool_size=1, borrow_timeout=5)
+        conn = pool.get_connection()
+        errors = []
+
+        def borrow():
+            try:
+                pool.get_connection()
+            except PoolError as exc:
+                errors.append(exc)
+
+        waiter = threading.Thread(target=borrow)
+        waiter.start()
+        time.sleep(0.05)
+        pool.close()
+        waiter.join(5)
+        self.assertIn("closed", str(errors[0]))
+        conn.close()
+
+    def test_sticky_connection_handed_to_waiter(self):
+        pool, _ = build_pool(pool_size=1, borrow_timeout=5, thread_affinity=True)
+        conn = pool.get_connection()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(pool.get_connection()))
+        waiter.start()
+        time.sleep(0.05)
+        conn.close()
+        waiter.join(5)
+        self.assertEqual(1, len(result))
+        self.assertEqual(0, pool.stats()["sticky"])
+        result[0].close()
+
+    def test_striped_pool_rejects_borrow_timeout(self):
+        with self.assertRaises(ValueError):
+            StripedConnectionPool(StubFactory(), pool_size=4, stripes=2, borrow_timeout=1)
+
+
+class TestConcurrentBorrow(unittest.TestCase):
+    """验证多线程借出与后台维护并发时计数一致（在 python3.13t 上运行时无 GIL 保护）"""
+
+    def run_concurrently(self, pool, factory, budget, threads=16, seconds=0.3):
+        errors = []
+        stop = threading.Event()
+        # 全部线程就绪后再开始，避免忙碌的线程拖慢后续线程的启动
+        start = threading.Barrier(threads + 2)
+
+        def borrow():
+            start.wait()
+            while not stop.is_set():
+                try:
+                    conn = pool.get_connection()
+                except PoolExhaustedError:
+                    continue
+                except Exception as exc:
+                    errors.append(exc)
+                    return
+                conn.cursor().execute("SELECT 1")
+                conn.close()
+
+        def maintain():
+            start.wait()
+            while not stop.is_set():
+                pool.release_sticky(0)
+                pool.recycle()
+                pool.stats()
+
+        workers = [threading.Thread(target=borrow) for _ in range(threads)]
+        workers.append(threading.Thread(target=maintain))
+        for worker in workers:
+            worker.start()
+        start.wait()
+        time.sleep(seconds)
+        stop.set()
+        for worker in workers:
+            worker.join(5)
+
+        self.assertEqual([], errors)
+        # 线程保留的连接计入 outstanding，放回共享队列后应全部归还
+        pool.release_sticky(0)
+        self.assertEqual(0, pool.outstanding)
+        open_conns = [conn for conn in factory.opened if not conn.closed]
+        self.assertEqual(len(open_conns), pool.stats()["size"])
+        self.assertEqual(len(open_conns), budget.stats()["in_use"])
+        pool.close()
+        self.assertTrue(all(conn.closed for conn in factory.opened))
+        self.assertEqual(0, budget.stats()["in_use"])
+
+    def test_pool_counts_consistent(self):
+        factory = StubFactory()
+        budget = ConnectionBudget(limit=8)
+        pool = ConnectionPool(factory, pool_size=8, pool_name="test", budget=budget, thread_affinity=True)
+        pool.fill()
+        self.run_concurrently(pool, factory, budget)
+
+    def test_striped_pool_counts_consistent(self):
+        factory = StubFactory()
+        budget = ConnectionBudget(limit=8)
+        pool = StripedConnectionPool(factory, pool_size=8, stripes=4, pool_name="test", budget=budget,
+                                     thread_affinity=True)
+        pool.fill()
+        self.run_concurrently(pool, factory, budget)
+
+
+class TestRecycle(unittest.TestCase):
+    """验证最长存活时间、空闲超时与抖动回收"""
+
+    def test_recycle_replaces_expired_idle_connections(self):
+        pool, factory = build_pool(pool_size=2, max_lifetime=60)
+        pool._idle[0].created_at -= 61
+        self.assertEqual(pool.recycle(), 1)
+        self.assertTrue(factory.opened[0].closed)
+        self.assertEqual(pool.idle_count, 2)
+        self.assertEqual(len(factory.opened), 3)
+
+    def test_expired_connection_closed_on_return(self):
+        pool, factory = build_pool(pool_size=1, max_lifetime=60)
+        conn = pool.get_connection()
+        pool._idle.clear()
+        conn._entry.created_at -= 61
+        conn.close()
+        self.assertTrue(factory.opened[0].closed)
+        self.assertEqual(pool.outstanding, 0)
+
+    def test_idle_timeout_shrinks_to_min_idle(self):
+        pool, factory = build_pool(pool_size=3, idle_timeout=30, min_idle=1)
+        for conn in [pool.get_connection() for _ in range(3)]:
+            conn.close()
+        for entry in pool._idle:
+            entry.last_used -= 31
+        self.assertEqual(pool.recycle(), 3)
+        self.assertEqual(pool.idle_count, 1)
+
+    def test_jitter_spreads_expiry(self):
+        pool, _ = build_pool(pool_size=20, max_lifetime=100, lifetime_jitter=0.5)
+        jitters = set(entry.jitter for entry in pool._idle)
+        self.assertGreater(len(jitters), 1)
+        self.assertTrue(all(0.0 <= value <= 0.5 for value in jitters))
+
+
+class TestLeakDetection(unittest.TestCase):
+    """验证持有时长统计与泄漏检测"""
+
+    def test_stats_record_hold_time(self):
+        pool, _ = build_pool(pool_size=1)
+        conn = pool.get_connection()
+        conn._entry.borrowed_at -= 2
+        conn.close()
+        stats = pool.stats()
+        self.assertEqual(stats["returns"], 1)
+        self.assertGreaterEqual(stats["hold_time_max"], 2)
+
+    def test_detect_leaks_reports_once_with_stack(self):
+        pool, _ = build_pool(pool_size=1, leak_detection_threshold=5)
+        conn = pool.get_connection()
+        self.assertEqual(pool.detect_leaks(), 0)
+        conn._entry.borrowed_at -= 6
+        with self.assertLogs(level="WARNING") as logs:
+            self.assertEqual(pool.detect_leaks(), 1)
+        self.assertIn("test_detect_leaks_reports_once_with_stack", logs.output[0])
+        self.assertEqual(pool.detect_leaks(), 0)
+        conn.close()
+
+    def test_detect_leaks_covers_sticky_borrow(self):
+        pool, _ = build_pool(pool_size=1, leak_detection_threshold=5, thread_affinity=True)
+        pool.get_connection().close()
+        conn = pool.get_connection()
+        self.assertEqual(pool.stats()["sticky"], 0)
+        conn._entry.borrowed_at -= 6
+        with self.assertLogs(level="WARNING") as logs:
+            self.assertEqual(pool.detect_leaks(), 1)
+        self.assertIn("test_detect_leaks_covers_sticky_borrow", logs.output[0])
+        with self.assertLogs(level="INFO") as logs:
+            conn.close()
+        self.assertIn("previously reported leaked connection", logs.output[0])
+        self.assertEqual(pool.detect_leaks(), 0)
+        self.assertEqual(pool._sticky_borrowed, set())
+
+
+class TestParallelFill(unittest.TestCase):
+    """验证并行建连"""
+
+    def test_fill_opens_connections_concurrently(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_connect():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+            return StubConnection()
+
+        pool = ConnectionPool(slow_connect, pool_size=8, connect_concurrency=4)
+        pool.fill()
+        self.assertEqual(pool.idle_count, 8)
+        self.assertEqual(max(peak), 4)
+
+    def test_fill_failure_releases_reserved_slots(self):
+        opened = []
+
+        def flaky_connect():
+            if len(opened) >= 2:
+                raise RuntimeError("access denied")
+            conn = StubConnection()
+            opened.append(conn)
+            return conn
+
+        pool = ConnectionPool(flaky_connect, pool_size=5, connect_concurrency=3)
+        with self.assertRaises(RuntimeError):
+            pool.fill()
+        self.assertEqual(pool.stats()["size"], pool.idle_count)
+
+    def test_fill_deadline(self):
+        pool = ConnectionPool(StubConnection, pool_size=2, connect_concurrency=2)
+        with self.assertRaises(PoolError):
+            pool.fill(deadline=time.time() - 1)
+        self.assertEqual(pool.stats()["size"], 0)
+
+
+class TestConnectionBudget(unittest.TestCase):
+    """验证连接预算的限流与空闲连接回收"""
+
+    def test_new_pool_reclaims_idle_connections_from_other_pools(self):
+        budget = ConnectionBudget(3)
+        old = ConnectionPool(StubFactory(), pool_size=2, budget=budget)
+        old.fill()
+        new = ConnectionPool(StubFactory(), pool_size=2, budget=budget)
+        new.fill()
+        self.assertEqual(new.idle_count, 2)
+        self.assertEqual(old.idle_count, 1)
+        stats = budget.stats()
+        self.assertEqual(stats["in_use"], 3)
+        self.assertEqual(stats["reclaimed"], 1)
+
+    def test_fill_throttled_without_idle_to_reclaim(self):
+        budget = ConnectionBudget(1)
+        old = ConnectionPool(StubFactory(), pool_size=1, budget=budget)
+        old.fill()
+        borrowed = old.get_connection()
+        new = ConnectionPool(StubFactory(), pool_size=2, budget=budget)
+        new.fill()
+        self.assertEqual(new.idle_count, 0)
+        with self.assertRaises(BudgetExhaustedError):
+            new.get_connection()
+        borrowed.close()
+        old.close()
+        new.get_connection().close()
+        self.assertEqual(budget.stats()["in_use"], 1)
+
+    def test_parent_budget_is_shared(self):
+        parent = ConnectionBudget(2, name="process")
+        first = ConnectionPool(StubFactory(), pool_size=2, budget=ConnectionBudget(None, parent=parent))
+        second = ConnectionPool(StubFactory(), pool_size=2, budget=ConnectionBudget(None, parent=parent))
+        first.fill()
+        held = [first.get_connection(), first.get_connection()]
+        second.fill()
+        self.assertEqual(second.idle_count, 0)
+        self.assertEqual(parent.stats()["in_use"], 2)
+        for conn in held:
+            conn.close()
+
+    def test_process_budget_released_by_last_user(self):
+        self.addCleanup(ConnectionBudget.reset_process)
+        first = ConnectionBudget.process(4)
+        self.assertIs(ConnectionBudget.process(4), first)
+        ConnectionBudget.release_process(first)
+        with self.assertRaises(ValueError):
+            ConnectionBudget.process(8)
+        ConnectionBudget.release_process(first)
+        second = ConnectionBudget.process(8)
+        self.assertIsNot(second, first)
+        # 已被替换的旧预算释放时不影响新预算
+        ConnectionBudget.release_process(first)
+        self.assertIs(ConnectionBudget.process(8), second)
+
+
+if __name__ == "__main__":
+    unittest.main()
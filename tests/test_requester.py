@@ -0,0 +1,171 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""内置 SSM HTTP 客户端的单元测试（使用本地 HTTP 服务代替 SSM 接入点）"""
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from ssm_rotation_sdk import SsmAccount, Transport
+from ssm_rotation_sdk import requester
+from ssm_rotation_sdk.requester import get_current_account, _get_secret_value
+
+
+class FakeSsmHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((dict(self.headers), body))
+        params = json.loads(body.decode("utf-8"))
+        secret = self.server.secrets.get((params["SecretName"], params["VersionId"]))
+        if secret is None:
+            response = {"Error": {"Code": "ResourceNotFound", "Message": "secret not found"},
+                        "RequestId": "req-1"}
+        else:
+            response = {"SecretName": params["SecretName"], "VersionId": params["VersionId"],
+                        "SecretString": secret, "SecretBinary": "", "RequestId": "req-1"}
+        data = json.dumps({"Response": response}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeSsmServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestBuiltinTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeSsmServer(("127.0.0.1", 0), FakeSsmHandler)
+        self.server.connections = 0
+        self.server.requests = []
+        self.server.secrets = {
+            ("db-secret", "SSM_Current"): json.dumps({"UserName": "user_a", "Password": "pwd_a"}),
+            ("db-secret", "SSM_Previous"): json.dumps({"UserName": "user_b", "Password": "pwd_b"}),
+        }
+        thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.endpoint = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.addCleanup(self.close_clients)
+
+    def close_clients(self):
+        with requester._http_clients_lock:
+            for client in requester._http_clients.values():
+                client.close()
+            requester._http_clients.clear()
+
+    def build_account(self):
+        return (SsmAccount.with_permanent_credential("AKIDtest", "secret-key", "ap-guangzhou")
+                .with_endpoint(self.endpoint)
+                .with_transport(Transport.BUILTIN))
+
+    def test_get_current_account(self):
+        account, err = get_current_account("db-secret", self.build_account())
+        self.assertIsNone(err)
+        self.assertEqual(account.user_name, "user_a")
+        self.assertEqual(account.password, "pwd_a")
+
+        headers, _ = self.server.requests[0]
+        self.assertEqual(headers["X-TC-Action"], "GetSecretValue")
+        self.assertEqual(headers["X-TC-Version"], "2019-09-23")
+        self.assertEqual(headers["X-TC-Region"], "ap-guangzhou")
+        self.assertNotIn("X-TC-Token", headers)
+
+    def test_signature_matches_tencentcloud_sdk(self):
+        from tencentcloud.common.sign import Sign
+        payload = b'{"SecretName": "db-secret"}'
+        headers = requester._tc3_headers("GetSecretValue", payload, "ssm.tencentcloudapi.com",
+                                         "ap-guangzhou", "AKIDtest", "secret-key", timestamp=1551113065)
+        canonical_request = ("POST\n/\n\ncontent-type:application/json; charset=utf-8\n"
+                             "host:ssm.tencentcloudapi.com\n\ncontent-type;host\n"
+                             + requester._sha256_hex(payload))
+        string_to_sign = "TC3-HMAC-SHA256\n1551113065\n2019-02-25/ssm/tc3_request\n" + \
+            requester._sha256_hex(canonical_request.encode("utf-8"))
+        expected = Sign.sign_tc3("secret-key", "2019-02-25", "ssm", string_to_sign)
+        self.assertEqual(
+            headers["Authorization"],
+            "TC3-HMAC-SHA256 Credential=AKIDtest/2019-02-25/ssm/tc3_request, "
+            "SignedHeaders=content-type;host, Signature=" + expected)
+
+    def test_keep_alive_connection_is_reused(self):
+        ssm_acc = self.build_account()
+        for _ in range(3):
+            self.assertIsNone(get_current_account("db-secret", ssm_acc)[1])
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_reconnects_after_server_closes_connection(self):
+        ssm_acc = self.build_account()
+        self.assertIsNone(get_current_account("db-secret", ssm_acc)[1])
+        # 模拟服务端关闭空闲连接
+        requester._get_http_client(self.endpoint)._idle[0].sock.close()
+        self.assertIsNone(get_current_account("db-secret", ssm_acc)[1])
+        self.assertEqual(self.server.connections, 2)
+
+    def test_retry_uses_new_connection_when_all_idle_are_stale(self):
+        ssm_acc = self.build_account()
+        self.assertIsNone(get_current_account("db-secret", ssm_acc)[1])
+        client = requester._get_http_client(self.endpoint)
+        extra = client._new_connection()
+        extra.connect()
+        client._release(extra)
+        self.assertEqual(len(client._idle), 2)
+        for conn in client._idle:
+            conn.sock.close()
+        self.assertIsNone(get_current_account("db-secret", ssm_acc)[1])
+        self.assertEqual(len(client._idle), 1)
+
+    def test_version_and_temporary_token(self):
+        ssm_acc = (SsmAccount.with_temporary_credential("AKIDtmp", "key", "token-1", "ap-guangzhou")
+                   .with_endpoint(self.endpoint)
+                   .with_transport(Transport.BUILTIN))
+        value, err = _get_secret_value("db-secret", ssm_acc, "SSM_Previous")
+        self.assertIsNone(err)
+        self.assertEqual(value.version_id, "SSM_Previous")
+        self.assertIn("user_b", value.secret_string)
+        self.assertEqual(self.server.requests[0][0]["X-TC-Token"], "token-1")
+
+    def test_api_error_is_returned(self):
+        account, err = get_current_account("missing", self.build_account())
+        self.assertIsNone(account)
+        self.assertIn("ResourceNotFound", err.message)
+        self.assertEqual(err.code, "ResourceNotFound")
+
+    def test_missing_region(self):
+        ssm_acc = self.build_account()
+        ssm_acc.region = None
+        value, err = _get_secret_value("db-secret", ssm_acc)
+        self.assertIsNone(value)
+        self.assertIn("region is required", err.message)
+
+
+if __name__ == "__main__":
+    unittest.main()
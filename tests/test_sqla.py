@@ -0,0 +1,97 @@
+#
+# Copyright 2017-2026 Tencent Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""SQLAlchemy 集成测试（使用 SQLite 内存库代替 MySQL 驱动）"""
+
+import sqlite3
+import unittest
+from unittest import mock
+
+import mysql.connector
+
+from ssm_rotation_sdk import ConnectionUnavailableError, DbAccount
+
+from test_db import FakeConnection, RotationTestCase, build_config
+
+try:
+    import sqlalchemy
+    from sqlalchemy.pool import QueuePool
+    from ssm_rotation_sdk.sqla import create_engine
+except ImportError:
+    sqlalchemy = None
+
+
+@unittest.skipIf(sqlalchemy is None, "SQLAlchemy is not installed")
+class TestSqlAlchemyAdapter(RotationTestCase):
+    def setUp(self):
+        RotationTestCase.setUp(self)
+        self.db = self.open_db(build_config(db_name="app", credential_only=True))
+        self.engine = create_engine(self.db, "sqlite://", poolclass=QueuePool, pool_size=2)
+        self.addCleanup(self.engine.dispose)
+        self.connect_params = []
+        self.auth_failures = 0
+        patcher = mock.patch.object(self.engine.dialect, "connect", self.fake_connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_connect(self, *cargs, **cparams):
+        if self.auth_failures:
+            self.auth_failures -= 1
+            raise mysql.connector.Error(msg="Access denied", errno=1045)
+        self.connect_params.append(cparams)
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    def query(self):
+        with self.engine.connect() as conn:
+            return conn.execute(sqlalchemy.text("select 1")).scalar()
+
+    def test_connects_with_current_credential(self):
+        self.assertEqual(self.query(), 1)
+        params = self.connect_params[0]
+        self.assertEqual((params["user"], params["password"]), ("user_a", "pwd_a"))
+        self.assertEqual((params["host"], params["port"], params["database"]), ("10.0.0.1", 3306, "app"))
+
+    def test_rotation_replaces_pooled_connections(self):
+        engine = self.engine
+        self.query()
+        self.query()
+        self.assertEqual(len(self.connect_params), 1)
+
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertIsNone(self.db._refresh_pool(force=False))
+        self.assertEqual(self.query(), 1)
+        self.assertIs(self.engine, engine)
+        self.assertEqual([params["user"] for params in self.connect_params], ["user_a", "user_b"])
+
+    def test_authentication_failure_refreshes_once(self):
+        self.auth_failures = 1
+        self.account = DbAccount("user_b", "pwd_b")
+        self.assertEqual(self.query(), 1)
+        self.assertEqual(self.connect_params[0]["user"], "user_b")
+
+    def test_credential_only_db_keeps_no_connections(self):
+        self.assertEqual(self.query(), 1)
+        self.assertEqual(self.db.db_conn.pool.idle_count, 0)
+        self.assertTrue(all(conn.closed for conn in FakeConnection.opened))
+
+    def test_closed_db_refuses_to_connect(self):
+        self.db.close()
+        with self.assertRaises(ConnectionUnavailableError):
+            self.query()
+
+
+if __name__ == "__main__":
+    unittest.main()